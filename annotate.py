@@ -0,0 +1,145 @@
+"""
+Vector annotation layer for the draw tool.
+
+Strokes, shapes, text and fills are recorded as a list of commands in
+full-resolution image coordinates instead of being rasterised into a
+full-size layer as they happen. The draw window renders each new command
+onto a preview-size layer; Apply replays the whole list once at full
+resolution. Because the list is resolution independent it can be rendered
+at any size and round-trips through JSON (``to_dict`` / ``from_dict``).
+"""
+from dataclasses import dataclass, asdict, field
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+import engine
+
+FONT_CANDIDATES = ("arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf")
+
+_fonts = {}
+
+
+def get_font(size):
+    size = max(1, int(round(size)))
+    font = _fonts.get(size)
+    if font is None:
+        for name in FONT_CANDIDATES:
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except Exception:
+                continue
+        else:
+            font = ImageFont.load_default()
+        _fonts[size] = font
+    return font
+
+
+@dataclass
+class Command:
+    """
+    One drawing operation. ``kind`` is "stroke" (freehand polyline),
+    "line", "rectangle", "ellipse", "text" or "fill"; ``points`` are
+    full-resolution (x, y) pairs.
+    """
+    kind: str
+    points: list
+    color: str = "#ff0000"
+    width: int = 3
+    text: str = ""
+    size: int = 36
+    tolerance: int = 0
+
+    def box(self, scale=1.0):
+        """Bounding box (x0, y0, x1, y1) of the command at ``scale``, or None if unknown (fill)."""
+        if self.kind == "fill":
+            return None
+        xs = [x * scale for x, _ in self.points]
+        ys = [y * scale for _, y in self.points]
+        if self.kind == "text":
+            x, y = xs[0], ys[0]
+            left, top, right, bottom = get_font(self.size * scale).getbbox(self.text)
+            return int(x + left), int(y + top), int(np.ceil(x + right)) + 1, int(np.ceil(y + bottom)) + 1
+        pad = _scaled_width(self.width, scale) // 2 + 2
+        return (int(min(xs)) - pad, int(min(ys)) - pad,
+                int(np.ceil(max(xs))) + pad + 1, int(np.ceil(max(ys))) + pad + 1)
+
+
+def _scaled_width(width, scale):
+    return max(1, int(round(width * scale)))
+
+
+def draw_command(layer, cmd, scale=1.0, start=0):
+    """
+    Rasterise ``cmd`` onto the RGBA ``layer`` at ``scale``. For strokes,
+    ``start`` skips the segments already drawn. Returns the touched box
+    (x0, y0, x1, y1) or None.
+    """
+    pts = [(x * scale, y * scale) for x, y in cmd.points]
+    width = _scaled_width(cmd.width, scale)
+    if cmd.kind == "fill":
+        pixels = np.array(layer)
+        x, y = pts[0]
+        box = engine.bucket_fill(pixels, int(x), int(y), cmd.color, cmd.tolerance)
+        if box is not None:
+            x0, y0, x1, y1 = box
+            layer.paste(Image.fromarray(pixels[y0:y1, x0:x1], "RGBA"), (x0, y0))
+        return box
+
+    draw = ImageDraw.Draw(layer)
+    if cmd.kind == "stroke":
+        # one line per segment, like the freehand tool always drew
+        for i in range(max(1, start), len(pts)):
+            draw.line((pts[i - 1], pts[i]), fill=cmd.color, width=width)
+        if start > 0:
+            return Command("line", cmd.points[start - 1:], width=cmd.width).box(scale)
+    elif cmd.kind == "line":
+        draw.line(pts, fill=cmd.color, width=width)
+    elif cmd.kind == "rectangle":
+        draw.rectangle(_corners(pts), outline=cmd.color, width=width)
+    elif cmd.kind == "ellipse":
+        draw.ellipse(_corners(pts), outline=cmd.color, width=width)
+    elif cmd.kind == "text":
+        draw.text(pts[0], cmd.text, fill=cmd.color, font=get_font(cmd.size * scale))
+    else:
+        raise ValueError(f"Unknown annotation command: {cmd.kind}")
+    return cmd.box(scale)
+
+
+def _corners(pts):
+    (x0, y0), (x1, y1) = pts
+    return [min(x0, x1), min(y0, y1), max(x0, x1), max(y0, y1)]
+
+
+@dataclass
+class Annotation:
+    """Ordered command list over an image of ``size`` = (w, h) full-resolution pixels."""
+    size: tuple
+    commands: list = field(default_factory=list)
+
+    def add(self, cmd):
+        self.commands.append(cmd)
+        return cmd
+
+    def render(self, scale=1.0):
+        """Transparent RGBA layer with every command, at ``scale`` x full size."""
+        w, h = self.size
+        layer = Image.new("RGBA", (max(1, round(w * scale)), max(1, round(h * scale))), (0, 0, 0, 0))
+        for cmd in self.commands:
+            draw_command(layer, cmd, scale)
+        return layer
+
+    def composite(self, img):
+        """``img`` (full size) with the annotations on top."""
+        if not self.commands:
+            return img.convert("RGBA")
+        return Image.alpha_composite(img.convert("RGBA"), self.render())
+
+    def to_dict(self):
+        return {"size": list(self.size), "commands": [asdict(c) for c in self.commands]}
+
+    @classmethod
+    def from_dict(cls, d):
+        commands = [Command(**dict(c, points=[tuple(p) for p in c["points"]])) for c in d.get("commands", [])]
+        return cls(tuple(d["size"]), commands)
@@ -0,0 +1,127 @@
+"""
+BALR batch mode.
+
+Apply a saved preset (slider values + transforms, see "Save Preset" in the
+editor) to every image in a folder, spread over a process pool:
+
+    python batch.py INPUT_DIR OUTPUT_DIR --preset look.json [--workers N] [--format jpg]
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from PIL import Image
+
+import engine
+import tiles
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".tif", ".tiff")
+
+
+def find_images(folder):
+    return sorted(
+        os.path.join(folder, name) for name in os.listdir(folder)
+        if name.lower().endswith(IMAGE_EXTENSIONS) and os.path.isfile(os.path.join(folder, name))
+    )
+
+
+def output_path(src, out_dir, fmt=None):
+    base, ext = os.path.splitext(os.path.basename(src))
+    return os.path.join(out_dir, base + ("." + fmt.lower().lstrip(".") if fmt else ext))
+
+
+def save_array(arr, path):
+    img = engine.to_image(arr)
+    if path.lower().endswith((".jpg", ".jpeg", ".bmp")):
+        img = img.convert("RGB")
+    img.save(path)
+
+
+def process_file(src, dst, preset_dict):
+    """Worker entry point. Returns (src, megapixels, seconds)."""
+    start = time.perf_counter()
+    preset = engine.Preset.from_dict(preset_dict)
+    with Image.open(src) as img:
+        pixels = img.width * img.height
+        # large images stream through memory-mapped tiles (adjustments only)
+        if pixels > tiles.LARGE_IMAGE_PIXELS and not preset.has_geometry():
+            tiled = tiles.TiledImage.from_image(img)
+        else:
+            tiled = None
+            arr = engine.to_array(img)
+    if tiled is not None:
+        out = tiles.render_tiled(tiled, preset.adjustments)
+        tiled.close()
+        out.save(dst)
+        out.close()
+    else:
+        save_array(engine.render_preset(arr, preset), dst)
+    return src, pixels / 1e6, time.perf_counter() - start
+
+
+def same_folder(a, b):
+    return os.path.normcase(os.path.realpath(a)) == os.path.normcase(os.path.realpath(b))
+
+
+def run_batch(in_dir, out_dir, preset, workers=None, fmt=None, log=print):
+    """Returns (done, failed, megapixels, seconds)."""
+    if same_folder(in_dir, out_dir):
+        # outputs keep the source names, so this would overwrite the originals
+        raise ValueError("output folder must differ from the input folder")
+    files = find_images(in_dir)
+    if not files:
+        log(f"No images found in {in_dir}")
+        return 0, 0, 0.0, 0.0
+    os.makedirs(out_dir, exist_ok=True)
+    preset_dict = preset.to_dict()
+    workers = workers or os.cpu_count() or 1
+
+    done, failed, total_mp = 0, 0, 0.0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(process_file, src, output_path(src, out_dir, fmt), preset_dict): src
+            for src in files
+        }
+        for fut in as_completed(futures):
+            src = futures[fut]
+            try:
+                _, mp, secs = fut.result()
+            except Exception as e:
+                failed += 1
+                log(f"[{done + failed}/{len(files)}] FAILED {os.path.basename(src)}: {e}")
+                continue
+            done += 1
+            total_mp += mp
+            log(f"[{done + failed}/{len(files)}] {os.path.basename(src)} ({mp:.1f} MP, {secs:.2f}s)")
+    elapsed = time.perf_counter() - start
+
+    rate = total_mp / elapsed if elapsed > 0 else 0.0
+    log(f"Processed {done} image(s), {failed} failed, {total_mp:.1f} MP in {elapsed:.2f}s "
+        f"-> {rate:.2f} MP/s with {workers} worker(s)")
+    return done, failed, total_mp, elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply a BALR preset to every image in a folder.")
+    parser.add_argument("input_dir")
+    parser.add_argument("output_dir")
+    parser.add_argument("--preset", required=True, help="preset JSON saved from the editor")
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    parser.add_argument("--format", default=None, help="output extension, e.g. png or jpg (default: keep)")
+    args = parser.parse_args(argv)
+
+    if not os.path.isdir(args.input_dir):
+        parser.error(f"not a directory: {args.input_dir}")
+    preset = engine.Preset.load(args.preset)
+    try:
+        done, failed, _, _ = run_batch(args.input_dir, args.output_dir, preset, args.workers, args.format)
+    except ValueError as e:
+        parser.error(str(e))
+    return 0 if done and not failed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Vibrance benchmark: array implementation vs the old per-pixel colorsys loop.
+
+    python benchmarks/bench_vibrance.py [--mp 2] [--vibrance 40]
+
+The legacy loop costs ~5 s per megapixel, so keep --mp modest unless you
+want to wait (24 MP is a couple of minutes).
+"""
+import argparse
+import colorsys
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import engine  # noqa: E402
+
+
+def legacy_vibrance(arr, vibrance_value):
+    """The original per-pixel implementation, kept as the reference."""
+    img_rgb = Image.fromarray(arr).convert("RGB")
+    factor = vibrance_value / 100.0 * 0.5
+
+    def adjust_vibrance_pixel(r, g, b, f):
+        h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
+        adjustment = f * (1 - s) ** 1.5
+        new_s = np.clip(s + adjustment, 0, 1)
+        r_out, g_out, b_out = colorsys.hsv_to_rgb(h, new_s, v)
+        return int(r_out * 255), int(g_out * 255), int(b_out * 255)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)  # getdata() on newer Pillow
+        pixels = img_rgb.getdata()
+    new_img_list = [adjust_vibrance_pixel(r, g, b, factor) for r, g, b in pixels]
+    new_img = Image.new("RGB", img_rgb.size)
+    new_img.putdata(new_img_list)
+    return np.array(new_img.convert("RGBA"))
+
+
+def synthetic_image(megapixels, seed=0):
+    """Smooth gradients + noise + a few flat gray patches, RGBA uint8."""
+    rng = np.random.default_rng(seed)
+    w = int(np.sqrt(megapixels * 1e6 * 3 / 2))
+    h = int(megapixels * 1e6 / w)
+    yy, xx = np.mgrid[0:h, 0:w].astype(np.float32)
+    img = np.empty((h, w, 4), np.uint8)
+    img[..., 0] = (xx / w * 255).astype(np.uint8)
+    img[..., 1] = (yy / h * 255).astype(np.uint8)
+    img[..., 2] = rng.integers(0, 256, (h, w), dtype=np.uint8)
+    img[..., 3] = 255
+    img[: h // 8, : w // 8, :3] = 128
+    return img
+
+
+def timed(fn, *args, repeat=1):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return out, best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mp", type=float, default=2.0, help="image size in megapixels")
+    parser.add_argument("--vibrance", type=float, default=40.0)
+    args = parser.parse_args(argv)
+
+    img = synthetic_image(args.mp)
+    mp = img.shape[0] * img.shape[1] / 1e6
+    print(f"image: {img.shape[1]}x{img.shape[0]} ({mp:.1f} MP), vibrance={args.vibrance}")
+
+    fast, t_fast = timed(engine.adjust_vibrance, img, args.vibrance, repeat=3)
+    print(f"vectorized : {t_fast * 1000:9.1f} ms  ({mp / t_fast:8.1f} MP/s)")
+
+    ref, t_ref = timed(legacy_vibrance, img, args.vibrance)
+    print(f"per-pixel  : {t_ref * 1000:9.1f} ms  ({mp / t_ref:8.3f} MP/s)")
+
+    diff = np.abs(fast[..., :3].astype(np.int16) - ref[..., :3].astype(np.int16))
+    print(f"speedup    : {t_ref / t_fast:9.1f}x")
+    print(f"max |diff| : {diff.max()} (pixels off by >0: {np.count_nonzero(diff.max(axis=2)) / diff[..., 0].size:.2%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
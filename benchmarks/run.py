@@ -0,0 +1,216 @@
+"""
+Benchmark every engine operation on synthetic images, headless.
+
+    python benchmarks/run.py [--mp 1 12 24 50] [--ops vibrance morph_] [--repeat 3] [--out results.json]
+
+Each benchmark is timed ``--repeat`` times (best wall time is reported),
+then run once more under tracemalloc for the peak of memory allocated
+while it ran. Results are printed as they finish and written as JSON
+(stdout unless --out is given). Needs no display and no network: only
+engine, frequency and history are imported, never the Tk app.
+
+tracemalloc sees NumPy arrays (OpenCV outputs included) but not Pillow's
+internal buffers, so peaks of the PIL-based operations are a lower bound.
+Keep --mp within RAM: the 50 MP cases need a few GB.
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from functools import partial
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from bench_vibrance import synthetic_image
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import engine  # noqa: E402
+import frequency  # noqa: E402
+from history import SnapshotStack  # noqa: E402
+
+DEFAULT_SIZES = (1, 12, 24, 50)
+
+# every slider off its default, so the full chain runs every stage
+FULL_CHAIN = engine.AdjustmentParams(
+    exposure=20, highlights=-20, shadows=25, contrast=15, brightness=5,
+    blacks=5, whites=-5, hue=10, tint=8, saturation=12, temperature=-10,
+    vibrance=30, blur=2, noise=6, vignette=40, gamma=1.1,
+)
+
+
+# ---------- benchmark setups: fn(img) -> zero-argument callable ----------
+def _bucket_fill(img):
+    # worst case: a flat frame, so the fill covers every pixel; alternate the
+    # color so each run repaints the whole image instead of changing nothing
+    pixels = np.full_like(img, 128)
+    colors = itertools.cycle(("#ff0000", "#808080"))
+    return lambda: engine.bucket_fill(pixels, 0, 0, next(colors))
+
+
+def _spectrum(method, *args, color=True):
+    def setup(img):
+        spectrum = frequency.Spectrum(img, color)
+        return partial(getattr(spectrum, method), *args)
+    return setup
+
+
+def _save_undo(spill):
+    # what save_state + undo do to the history: two snapshots pushed, both
+    # popped back. With no RAM budget the second push spills the first to
+    # disk (only the newest stays in RAM), so every run writes one memmap
+    # and restores one from it.
+    def setup(img):
+        pil = Image.fromarray(img)
+        stack = SnapshotStack(ram_budget=0 if spill else 512 * 1024 * 1024)
+
+        def run():
+            stack.append(pil)
+            stack.append(pil)
+            stack.pop()
+            out = stack.pop()
+            assert stack.disk_bytes == 0 and not stack
+            return out
+        return run
+    return setup
+
+
+def _cached_chain(img):
+    # a slider tweak at the end of the chain: only vignette re-runs
+    cache = engine.StageCache(max_bytes=img.nbytes * 20)
+    engine.apply_all_adjustments(img, FULL_CHAIN, cache, "bench")
+    tweaks = itertools.cycle((30, 50))
+
+    def run():
+        params = engine.AdjustmentParams(**dict(FULL_CHAIN.to_dict(), vignette=next(tweaks)))
+        return engine.apply_all_adjustments(img, params, cache, "bench")
+    return run
+
+
+def _call(fn, *args):
+    return lambda img: partial(fn, img, *args)
+
+
+BENCHMARKS = {
+    "adjust_exposure": _call(engine.adjust_exposure, 30),
+    "adjust_contrast": _call(engine.adjust_contrast, 30),
+    "adjust_brightness": _call(engine.adjust_brightness, 20),
+    "adjust_levels": _call(engine.adjust_levels, 10, -10),
+    "adjust_highlights_shadows": _call(engine.adjust_highlights_shadows, -30, 30),
+    "adjust_temperature": _call(engine.adjust_temperature, 30),
+    "adjust_tint": _call(engine.adjust_tint, 20),
+    "adjust_hue": _call(engine.adjust_hue, 30),
+    "adjust_saturation": _call(engine.adjust_saturation, 30),
+    "adjust_vibrance": _call(engine.adjust_vibrance, 40),
+    "gaussian_blur": _call(engine.gaussian_blur, 3),
+    "add_noise": _call(engine.add_noise, 20),
+    "add_vignette": _call(engine.add_vignette, 0.5),
+    "apply_all_adjustments": _call(engine.apply_all_adjustments, FULL_CHAIN),
+    "apply_all_adjustments_cached": _cached_chain,
+}
+for _op in engine.MORPH_OPERATIONS:
+    BENCHMARKS[f"morph_{_op}"] = _call(engine.apply_morphology, _op, 5)
+BENCHMARKS["morph_dilation_ellipse"] = _call(engine.apply_morphology, "dilation", 5, "ellipse")
+for _name in ("sobel", "prewitt", "laplacian"):
+    BENCHMARKS[f"filter_{_name}"] = _call(engine.apply_filter, _name)
+BENCHMARKS.update({
+    "fft_forward": lambda img: partial(frequency.Spectrum, img, True),
+    "fft_lowpass_ideal": _spectrum("filter", 0.05, "ideal"),
+    "fft_lowpass_gaussian": _spectrum("filter", 0.05, "gaussian"),
+    "fft_highpass_butterworth": _spectrum("filter", 0.05, "butterworth", True),
+    "fft_magnitude": _spectrum("magnitude"),
+    "fft_inverse": _spectrum("inverse"),
+    "bucket_fill": _bucket_fill,
+    "history_save_undo": _save_undo(spill=False),
+    "history_save_undo_spilled": _save_undo(spill=True),
+})
+
+
+def measure(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = run()
+        best = min(best, time.perf_counter() - start)
+        del out
+    gc.collect()
+    tracemalloc.start()
+    try:
+        out = run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del out
+    return best, peak
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--mp", type=float, nargs="+", default=list(DEFAULT_SIZES),
+                        help="image sizes in megapixels")
+    parser.add_argument("--ops", nargs="+", help="only benchmarks whose name contains one of these")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (best is kept)")
+    parser.add_argument("--out", help="write the JSON report here instead of stdout")
+    parser.add_argument("--list", action="store_true", help="list the benchmark names and exit")
+    args = parser.parse_args(argv)
+
+    names = [n for n in BENCHMARKS if not args.ops or any(s in n for s in args.ops)]
+    if args.list:
+        print("\n".join(names))
+        return 0
+    if not names:
+        parser.error("no benchmark matches --ops")
+
+    results = []
+    for mp in args.mp:
+        img = synthetic_image(mp)
+        h, w = img.shape[:2]
+        real_mp = h * w / 1e6
+        print(f"image: {w}x{h} ({real_mp:.1f} MP)", file=sys.stderr)
+        for name in names:
+            run = BENCHMARKS[name](img)
+            seconds, peak = measure(run, max(1, args.repeat))
+            del run
+            results.append({
+                "op": name,
+                "megapixels": round(real_mp, 3),
+                "width": w,
+                "height": h,
+                "seconds": round(seconds, 6),
+                "mp_per_s": round(real_mp / seconds, 3),
+                "peak_bytes": peak,
+            })
+            print(f"  {name:30s} {seconds * 1000:10.1f} ms {real_mp / seconds:9.1f} MP/s "
+                  f"{peak / 2 ** 20:9.1f} MB peak", file=sys.stderr)
+        del img
+        gc.collect()
+
+    report = {"environment": environment(), "repeat": args.repeat, "results": results}
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
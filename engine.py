@@ -0,0 +1,967 @@
+"""
+BALR processing engine.
+
+Pure image operations with no Tk / matplotlib dependency, so they can run
+headless (render servers, batch jobs). Every public function takes an RGBA
+uint8 NumPy array (plus plain parameters) and returns a new RGBA uint8 array.
+"""
+import json
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict, field, fields, replace
+
+import numpy as np
+import cv2
+from PIL import Image, ImageEnhance, ImageFilter, ImageOps
+
+import profiling
+
+
+# ===========================================================
+# PARAMETERS
+# ===========================================================
+@dataclass
+class AdjustmentParams:
+    """Slider values of the live adjustment pipeline (same ranges as the UI)."""
+    exposure: float = 0.0
+    highlights: float = 0.0
+    shadows: float = 0.0
+    contrast: float = 0.0
+    brightness: float = 0.0
+    blacks: float = 0.0
+    whites: float = 0.0
+    hue: float = 0.0
+    tint: float = 0.0
+    saturation: float = 0.0
+    temperature: float = 0.0
+    vibrance: float = 0.0
+    blur: float = 0.0
+    noise: float = 0.0
+    vignette: float = 0.0
+    gamma: float = 1.0
+
+    @classmethod
+    def from_dict(cls, values):
+        names = {f.name for f in fields(cls)}
+        return cls(**{k: float(v) for k, v in values.items() if k in names})
+
+    def to_dict(self):
+        return asdict(self)
+
+    def scaled(self, scale):
+        """Params for rendering at ``scale`` x the full resolution (blur is in pixels)."""
+        return replace(self, blur=self.blur * scale)
+
+
+DEFAULT_TRANSFORM = {"resize": 100, "rotate": 0, "scale_x": 100, "scale_y": 100}
+
+PERSPECTIVE_KEYS = (
+    "Top Left X", "Top Left Y",
+    "Top Right X", "Top Right Y",
+    "Bottom Left X", "Bottom Left Y",
+    "Bottom Right X", "Bottom Right Y",
+)
+
+
+@dataclass
+class Preset:
+    """A saved set of slider values: adjustments + transform + perspective."""
+    adjustments: AdjustmentParams = field(default_factory=AdjustmentParams)
+    transform: dict = field(default_factory=lambda: dict(DEFAULT_TRANSFORM))
+    perspective: dict = field(default_factory=lambda: dict.fromkeys(PERSPECTIVE_KEYS, 0.0))
+
+    @classmethod
+    def from_dict(cls, values):
+        preset = cls(adjustments=AdjustmentParams.from_dict(values.get("adjustments", {})))
+        for k, v in values.get("transform", {}).items():
+            if k in preset.transform:
+                preset.transform[k] = float(v)
+        for k, v in values.get("perspective", {}).items():
+            if k in preset.perspective:
+                preset.perspective[k] = float(v)
+        return preset
+
+    def to_dict(self):
+        return {
+            "adjustments": self.adjustments.to_dict(),
+            "transform": dict(self.transform),
+            "perspective": dict(self.perspective),
+        }
+
+    def has_geometry(self):
+        """True if the preset moves pixels (transform / perspective), not just recolors them."""
+        return (any(float(self.transform[k]) != v for k, v in DEFAULT_TRANSFORM.items())
+                or any(self.perspective.values()))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_dict(json.load(f))
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+
+def render_preset(arr, preset):
+    """Transform -> perspective (one warp) -> adjustments, the same order as the editor."""
+    if preset.has_geometry():
+        arr = apply_geometry(arr, preset.transform, preset.perspective)
+    return apply_all_adjustments(arr, preset.adjustments)
+
+
+# ===========================================================
+# CONVERSION
+# ===========================================================
+def to_array(img):
+    """PIL image (any mode) -> RGBA uint8 array."""
+    return np.array(img.convert("RGBA"))
+
+
+def to_image(arr):
+    """RGBA uint8 array -> PIL image."""
+    return Image.fromarray(arr)
+
+
+def _rgba(img):
+    return np.array(img.convert("RGBA"))
+
+
+def _enhance(arr, enhancer, factor):
+    return np.array(enhancer(Image.fromarray(arr)).enhance(factor))
+
+
+def _out(arr, out):
+    """Destination of an ``out=`` helper: ``out`` holding arr's pixels (may be ``arr`` itself), or a copy."""
+    if out is None:
+        return arr.copy()
+    if out is not arr:
+        out[...] = arr
+    return out
+
+
+def _bands(arr, rows=None):
+    """Row bands of ``arr`` (views), to keep float temporaries small."""
+    rows = rows or _BAND_ROWS
+    for y0 in range(0, arr.shape[0], rows):
+        yield arr[y0:y0 + rows]
+
+
+def _channel_lut(arr, tables, out=None):
+    """Per-channel uint8[256] tables for R, G, B (None = unchanged); alpha passes through."""
+    lut = np.repeat(_IDENTITY[:, None], 4, axis=1)
+    for c, table in enumerate(tables):
+        if table is not None:
+            lut[:, c] = table
+    lut = lut.reshape(256, 1, 4)
+    if out is None:
+        return cv2.LUT(arr, lut)
+    return cv2.LUT(arr, lut, dst=out)
+
+
+# ===========================================================
+# ADJUSTMENTS PIPELINE
+# ===========================================================
+def pipeline_stages(params, luma_mean=None, frame=None):
+    """
+    The active stages of the adjustment pipeline, in order, as
+    ``(name, values, fn)``. ``values`` are the params the stage reads, which
+    is what the stage cache keys on.
+
+    ``luma_mean`` and ``frame`` are for rendering part of a larger image
+    (see tiles.py): contrast then pivots on the whole image's mean gray, and
+    the vignette is placed by ``frame`` = (full_h, full_w, y0, x0).
+    """
+    p = params
+    stages = []
+
+    # Tone: exposure, contrast, brightness, blacks/whites and gamma are one LUT.
+    # Highlights/Shadows mixes channels, so it splits the LUT in two.
+    if p.highlights != 0 or p.shadows != 0:
+        stages.append(("exposure", (p.exposure,), lambda a: apply_tone(a, p, post=False, out=a)))
+        stages.append(("highlights_shadows", (p.highlights, p.shadows),
+                       lambda a: adjust_highlights_shadows(a, p.highlights, p.shadows, out=a)))
+        stages.append(("tone", (p.contrast, p.brightness, p.blacks, p.whites, p.gamma),
+                       lambda a: apply_tone(a, p, pre=False, luma_mean=luma_mean, out=a)))
+    else:
+        stages.append(("tone", (p.exposure, p.contrast, p.brightness, p.blacks, p.whites, p.gamma),
+                       lambda a: apply_tone(a, p, luma_mean=luma_mean, out=a)))
+
+    # Color
+    if p.hue != 0:
+        stages.append(("hue", (p.hue,), lambda a: adjust_hue(a, p.hue, out=a)))
+    if p.tint != 0:
+        stages.append(("tint", (p.tint,), lambda a: adjust_tint(a, p.tint, out=a)))
+    if p.vibrance != 0:
+        stages.append(("vibrance", (p.vibrance,), lambda a: adjust_vibrance(a, p.vibrance, out=a)))
+    if p.saturation != 0:
+        stages.append(("saturation", (p.saturation,), lambda a: adjust_saturation(a, p.saturation, out=a)))
+    if p.temperature != 0:
+        stages.append(("temperature", (p.temperature,), lambda a: adjust_temperature(a, p.temperature, out=a)))
+
+    # Filters
+    if p.blur > 0:
+        stages.append(("blur", (p.blur,), lambda a: gaussian_blur(a, p.blur)))
+    if p.noise > 0:
+        stages.append(("noise", (p.noise,), lambda a: add_noise(a, p.noise, out=a)))
+    if p.vignette > 0:
+        stages.append(("vignette", (p.vignette,), lambda a: add_vignette(a, p.vignette / 100, frame, out=a)))
+    return stages
+
+
+class Cancelled(Exception):
+    """Raised by a ``cancel`` check to abandon a render that is no longer wanted."""
+
+
+@dataclass
+class RenderStats:
+    """What one apply_all_adjustments call did; pass one in as ``stats`` to collect it."""
+    stages_run: int = 0
+    stages_cached: int = 0
+    allocations: int = 0      # full-size arrays allocated by the pipeline
+    bytes_allocated: int = 0
+
+    def allocated(self, arr):
+        self.allocations += 1
+        self.bytes_allocated += arr.nbytes
+
+
+def apply_all_adjustments(arr, params, cache=None, source_key=None, cancel=None, stats=None,
+                          luma_mean=None, frame=None):
+    """
+    Run the adjustment pipeline over ``arr``.
+
+    The pass works on one uint8 working buffer: it is copied from ``arr``
+    (or the cached stage it resumes from) once and every stage that can
+    runs in place on it. Only stages that cannot (blur) allocate a new one.
+
+    With a ``cache`` (StageCache) and a ``source_key`` identifying ``arr``
+    (e.g. the image version), every stage output is memoized under the source
+    key plus the values of all stages up to it. A rerun starts from the
+    deepest cached stage, so only the stages downstream of a changed slider
+    execute. Cached results are read-only.
+
+    ``cancel`` is an optional callable polled between stages; when it returns
+    True the render stops with ``Cancelled`` (stages already run stay cached).
+    ``stats`` (a RenderStats) counts stages and full-size allocations.
+    ``luma_mean`` / ``frame`` render ``arr`` as a crop of a larger image (see
+    pipeline_stages); the cache key does not include them.
+    """
+    stages = pipeline_stages(params, luma_mean, frame)
+    img = arr
+    start = 0
+    keys = []
+    if cache is not None and source_key is not None:
+        key = (source_key,)
+        for name, values, _ in stages:
+            key = key + ((name,) + values,)
+            keys.append(key)
+        for i in range(len(stages) - 1, -1, -1):
+            hit = cache.get(keys[i])
+            if hit is not None:
+                img, start = hit, i + 1
+                break
+
+    if stats is None:
+        stats = RenderStats()
+    stats.stages_cached = start
+    if start == len(stages):
+        return img
+
+    h, w = img.shape[:2]
+    with profiling.span("apply_all_adjustments", "pipeline", size=f"{w}x{h}", cached=start):
+        # the source and cached arrays are never written, only this copy
+        buf = img.copy()
+        stats.allocated(buf)
+        for i in range(start, len(stages)):
+            if cancel is not None and cancel():
+                raise Cancelled()
+            with profiling.span(stages[i][0], "pipeline"):
+                out = stages[i][2](buf)
+            if out is not buf:
+                stats.allocated(out)
+                buf = out
+            stats.stages_run += 1
+            if keys:
+                snapshot = buf.copy()
+                stats.allocated(snapshot)
+                cache.put(keys[i], snapshot)
+    return buf
+
+
+class StageCache:
+    """LRU of pipeline stage outputs, capped by total array bytes. Thread-safe."""
+
+    def __init__(self, max_bytes=256 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        with self._lock:
+            arr = self._items.get(key)
+            if arr is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return arr
+
+    def put(self, key, arr):
+        if arr.nbytes > self.max_bytes:
+            return
+        arr.setflags(write=False)
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._items[key] = arr
+            self.nbytes += arr.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self._items.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+
+# ===========================================================
+# TONE CURVE (fused LUT)
+# ===========================================================
+# Every stage below maps one uint8 value to another and is applied the same
+# way to R, G and B, so the whole chain compiles into a single 256-entry
+# table. Each stage re-quantizes to uint8 exactly like the per-image passes
+# did (PIL blend truncates, levels/gamma cast with astype), so the composed
+# table gives the same pixels in one cv2.LUT sweep.
+_IDENTITY = np.arange(256, dtype=np.uint8)
+
+# PIL "L" weights, used to predict ImageEnhance.Contrast's mean gray
+_LUMA_WEIGHTS = np.array([19595, 38470, 7471], dtype=np.float64) / 65536
+
+_BAND_ROWS = 512
+
+
+def _blend_stage(t, degenerate, factor):
+    # Image.blend(degenerate, img, factor) on uint8 data
+    out = degenerate + np.float32(factor) * (t.astype(np.float32) - degenerate)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+def _levels_stage(t, blacks, whites):
+    if blacks != 0:
+        adjustment = blacks / 100 * 50
+        t = np.where(t < 128, np.clip(t + adjustment, 0, 255), t).astype(np.uint8)
+    if whites != 0:
+        adjustment = whites / 100 * 50
+        t = np.where(t > 128, np.clip(t + adjustment, 0, 255), t).astype(np.uint8)
+    return t
+
+
+def _gamma_stage(t, gamma):
+    table = ((np.arange(256) / 255.0) ** (1.0 / gamma) * 255).astype(np.uint8)
+    return table[t]
+
+
+def _pre_table(params):
+    if params.exposure == 0:
+        return _IDENTITY
+    return _blend_stage(_IDENTITY, 0, np.power(2, params.exposure / 100))
+
+
+def channel_histograms(arr):
+    """R, G, B counts as a (3, 256) float array; sums across tiles."""
+    return np.stack([cv2.calcHist([arr], [c], None, [256], [0, 256]).ravel() for c in range(3)])
+
+
+def _luma_mean_from_histograms(hists, pre):
+    """Mean of the PIL "L" image of pre[pixels], given channel_histograms of the pixels."""
+    n = float(hists[0].sum())
+    means = (hists @ pre.astype(np.float64)) / n
+    return int(float(np.dot(_LUMA_WEIGHTS, means)) + 0.5)
+
+
+def _luma_mean(arr, pre):
+    return _luma_mean_from_histograms(channel_histograms(arr), pre)
+
+
+def tone_luma_mean(hists, params, pre=True):
+    """The ``luma_mean`` tone_table wants, from channel_histograms of the tone stage's input."""
+    return _luma_mean_from_histograms(hists, _pre_table(params) if pre else _IDENTITY)
+
+
+def tone_table(params, pre=True, post=True, luma_mean=None, arr=None):
+    """
+    Compile the tone sliders into one uint8[256] table.
+
+    ``pre`` is exposure, ``post`` is contrast -> brightness -> levels -> gamma.
+    Contrast needs the mean gray of its input; pass ``luma_mean`` or the
+    source ``arr`` (the pre part is folded into the histogram mean).
+    """
+    pre_t = _pre_table(params) if pre else _IDENTITY
+    t = pre_t
+    if not post:
+        return t
+    if params.contrast != 0:
+        if luma_mean is None:
+            luma_mean = _luma_mean(arr, pre_t)
+        t = _blend_stage(t, luma_mean, 1 + (params.contrast / 100))
+    if params.brightness != 0:
+        t = _blend_stage(t, 0, 1 + (params.brightness / 100))
+    if params.blacks != 0 or params.whites != 0:
+        t = _levels_stage(t, params.blacks, params.whites)
+    if params.gamma != 1.0:
+        t = _gamma_stage(t, params.gamma)
+    return t
+
+
+def apply_tone(arr, params, pre=True, post=True, luma_mean=None, out=None):
+    """
+    One cv2.LUT pass over RGB; alpha is left alone. Without ``out``, returns
+    ``arr`` itself if nothing changes.
+    """
+    table = tone_table(params, pre, post, luma_mean, arr)
+    if np.array_equal(table, _IDENTITY):
+        return arr if out is None else _out(arr, out)
+    return _channel_lut(arr, (table, table, table), out)
+
+
+# ===========================================================
+# ADJUSTMENT HELPERS
+# ===========================================================
+# Helpers taking ``out=`` write the result there (``out=arr`` works in place)
+# and otherwise return a new array. RGB is adjusted, alpha is kept.
+def adjust_temperature(arr, temperature, out=None):
+    # per-channel shift + clip + truncate, i.e. one LUT (float32 like the array version was)
+    v = np.arange(256, dtype=np.float32)
+    if temperature > 0:
+        tables = (
+            np.clip(v + temperature * 2.55, 0, 255).astype(np.uint8),
+            np.clip(v + temperature * 1.27, 0, 255).astype(np.uint8),
+            None,
+        )
+    else:
+        tables = (None, None, np.clip(v - temperature * 2.55, 0, 255).astype(np.uint8))
+    return _channel_lut(arr, tables, out)
+
+
+def adjust_hue(arr, shift_degrees, out=None):
+    out = _out(arr, out)
+    shift_pil_units = np.uint8(int(shift_degrees * (255 / 360)) % 256)
+    for band in _bands(out):
+        hsv = np.array(Image.fromarray(band).convert("HSV"))
+        hsv[:, :, 0] += shift_pil_units  # uint8 wraps around, i.e. % 256
+        band[:, :, :3] = np.asarray(Image.fromarray(hsv, mode="HSV").convert("RGB"))
+    return out
+
+
+def adjust_tint(arr, tint_value, out=None):
+    adj_factor = tint_value / 100.0 * 50
+    v = np.arange(256)
+    up = np.clip(v + adj_factor, 0, 255).astype(np.uint8)
+    down = np.clip(v - adj_factor, 0, 255).astype(np.uint8)
+    return _channel_lut(arr, (up, down, up), out)
+
+
+def adjust_vibrance(arr, vibrance_value, band_rows=512, out=None):
+    """
+    Saturation-weighted boost: s' = clip(s + f * (1 - s) ** 1.5, 0, 1) in HSV.
+
+    With hue and value fixed every channel is v * (1 - s * k) for a hue-only k,
+    so the new channel is v - (v - c) * s' / s and no HSV round trip is needed.
+    Grays (s == 0) have hue 0 in colorsys and come out as (v, v(1-s'), v(1-s')).
+    Runs as OpenCV array ops over row bands to keep the float temporaries small.
+    """
+    if vibrance_value == 0:
+        return arr if out is None else _out(arr, out)
+    factor = vibrance_value / 100.0 * 0.5
+    if out is None:
+        out = np.empty_like(arr)
+    for y0 in range(0, arr.shape[0], band_rows):
+        band = np.ascontiguousarray(arr[y0:y0 + band_rows])
+        r, g, b, a = cv2.split(band)
+        v = cv2.max(cv2.max(r, g), b)
+        chroma = cv2.subtract(v, cv2.min(cv2.min(r, g), b))
+        vf = cv2.multiply(v, 1.0, dtype=cv2.CV_32F)
+        s = cv2.divide(chroma, cv2.max(v, 1), dtype=cv2.CV_32F)
+        t = cv2.subtract(1.0, s)
+        new_s = cv2.scaleAdd(cv2.multiply(t, cv2.sqrt(t)), factor, s)
+        new_s = cv2.min(cv2.max(new_s, 0.0), 1.0)
+        ratio = cv2.divide(new_s, cv2.max(s, 1e-6))  # v - c is 0 wherever s is 0
+        fade = None
+        if factor > 0:
+            gray = cv2.compare(chroma, 0, cv2.CMP_EQ)
+            fade = cv2.multiply(gray, vf, scale=min(factor, 1.0) / 255.0, dtype=cv2.CV_32F)
+        channels = []
+        for i, c in enumerate((r, g, b)):
+            res = cv2.subtract(vf, cv2.multiply(cv2.subtract(vf, c, dtype=cv2.CV_32F), ratio))
+            if fade is not None and i > 0:
+                res = cv2.subtract(res, fade)
+            # -0.4999 turns OpenCV's rounding into the truncation int() used to do
+            channels.append(cv2.subtract(res, 0.4999, dtype=cv2.CV_8U))
+        out[y0:y0 + band_rows] = cv2.merge(channels + [a])
+    return out
+
+
+def adjust_saturation(arr, saturation, out=None):
+    out = _out(arr, out)
+    for band in _bands(out):
+        band[:, :, :3] = _enhance(band, ImageEnhance.Color, 1 + (saturation / 100))[:, :, :3]
+    return out
+
+
+def adjust_highlights_shadows(arr, highlights, shadows, out=None):
+    out = _out(arr, out)
+    for band in _bands(out):
+        img_array = band[:, :, :3].astype(np.float32) / np.float32(255)
+        luminance = (np.float32(0.2126) * img_array[:, :, 0] + np.float32(0.7152) * img_array[:, :, 1]
+                     + np.float32(0.0722) * img_array[:, :, 2])
+        if shadows != 0:
+            shadow_mask = 1 / (1 + np.exp((luminance - np.float32(0.25)) / np.float32(0.1)))
+            shadow_adj = np.float32(shadows / 100.0 * 0.5) * shadow_mask
+            for i in range(3):
+                img_array[:, :, i] = np.clip(img_array[:, :, i] + shadow_adj, 0, 1)
+        if highlights != 0:
+            highlight_mask = 1 / (1 + np.exp((np.float32(0.75) - luminance) / np.float32(0.1)))
+            highlight_adj = np.float32(highlights / 100.0 * 0.5) * highlight_mask
+            for i in range(3):
+                img_array[:, :, i] = np.clip(img_array[:, :, i] + highlight_adj, 0, 1)
+        band[:, :, :3] = img_array * 255
+    return out
+
+
+def adjust_exposure(arr, exposure):
+    return apply_tone(arr, AdjustmentParams(exposure=exposure))
+
+
+def adjust_contrast(arr, contrast):
+    return apply_tone(arr, AdjustmentParams(contrast=contrast))
+
+
+def adjust_brightness(arr, brightness):
+    return apply_tone(arr, AdjustmentParams(brightness=brightness))
+
+
+def adjust_levels(arr, blacks, whites):
+    return apply_tone(arr, AdjustmentParams(blacks=blacks, whites=whites))
+
+
+def gaussian_blur(arr, radius):
+    return np.array(Image.fromarray(arr).filter(ImageFilter.GaussianBlur(radius=radius)))
+
+
+def add_noise(arr, amount, out=None):
+    out = _out(arr, out)
+    rng = np.random.default_rng()
+    for band in _bands(out):
+        noise = (rng.standard_normal(band.shape[:2] + (3,), dtype=np.float32) * amount).astype(np.int16)
+        noise += band[:, :, :3]
+        band[:, :, :3] = np.clip(noise, 0, 255, out=noise)
+    return out
+
+
+def add_vignette(arr, strength, frame=None, out=None):
+    """``frame`` = (full_h, full_w, y0, x0) when ``arr`` is a tile of a larger image."""
+    height, width = arr.shape[:2]
+    full_h, full_w, y0, x0 = frame or (height, width, 0, 0)
+    x = np.linspace(-1, 1, full_w, dtype=np.float32)[x0:x0 + width]
+    y = np.linspace(-1, 1, full_h, dtype=np.float32)[y0:y0 + height]
+    out = _out(arr, out)
+    for i, band in enumerate(_bands(out)):
+        yb = y[i * _BAND_ROWS:(i + 1) * _BAND_ROWS]
+        radius = np.sqrt(x[None, :] ** 2 + yb[:, None] ** 2)
+        vignette = np.clip(1 - (radius * np.float32(strength)), 0, 1)
+        band[:, :, :3] = band[:, :, :3] * vignette[:, :, None]  # apply ke RGB saja
+    return out
+
+
+# ===========================================================
+# GEOMETRY
+# ===========================================================
+def _translate(tx, ty):
+    return np.array([[1, 0, tx], [0, 1, ty], [0, 0, 1]], np.float64)
+
+
+def _scale(sx, sy):
+    return np.diag([sx, sy, 1.0])
+
+
+def perspective_matrix(width, height, values):
+    """Homography moving the image corners by the offsets in ``values``."""
+    w, h = width, height
+    src_pts = np.float32([[0, 0], [w, 0], [0, h], [w, h]])
+    tl_x = values["Top Left X"];     tl_y = values["Top Left Y"]
+    tr_x = values["Top Right X"];    tr_y = values["Top Right Y"]
+    bl_x = values["Bottom Left X"];  bl_y = values["Bottom Left Y"]
+    br_x = values["Bottom Right X"]; br_y = values["Bottom Right Y"]
+    dst_pts = np.float32([
+        [0 + tl_x, 0 + tl_y],
+        [w + tr_x, 0 + tr_y],
+        [0 + bl_x, h + bl_y],
+        [w + br_x, h + br_y],
+    ])
+    return cv2.getPerspectiveTransform(src_pts, dst_pts)
+
+
+def geometry_matrix(width, height, transform=None, perspective=None):
+    """
+    Resize -> rotate (expanding the canvas) -> scale x/y -> perspective as
+    one 3x3 matrix, plus the output size. Coordinates are continuous (the
+    image spans [0, w] x [0, h]); sizes are rounded the way the old
+    step-by-step PIL version rounded them.
+    """
+    M = np.eye(3)
+    w, h = width, height
+    if transform is not None:
+        r = transform["resize"] / 100.0
+        if r != 1.0:
+            nw, nh = int(w * r), int(h * r)
+            M = _scale(nw / w, nh / h) @ M
+            w, h = nw, nh
+
+        angle = transform["rotate"]
+        if angle != 0:
+            # counter-clockwise like PIL's rotate(expand=True)
+            # (cos, sin rounded like PIL, so quarter turns stay exact)
+            t = np.radians(angle)
+            c, s = np.round(np.cos(t), 15), np.round(np.sin(t), 15)
+            rot = np.array([[c, s, 0], [-s, c, 0], [0, 0, 1]])
+            if angle % 90 == 0:
+                # quarter turns just transpose, like PIL's fast path
+                nw, nh = (h, w) if angle % 180 else (w, h)
+            else:
+                # bounding box of the corners rotated about the centre, in
+                # absolute coordinates as PIL computes it
+                corners = rot[:2, :2] @ np.array([[-w, w, w, -w], [-h, -h, h, h]]) / 2
+                corners = np.round(corners + np.array([[w / 2], [h / 2]]), 6)
+                nw = int(np.ceil(corners[0].max()) - np.floor(corners[0].min()))
+                nh = int(np.ceil(corners[1].max()) - np.floor(corners[1].min()))
+            M = _translate(nw / 2, nh / 2) @ rot @ _translate(-w / 2, -h / 2) @ M
+            w, h = nw, nh
+
+        sx, sy = transform["scale_x"] / 100.0, transform["scale_y"] / 100.0
+        if sx != 1.0 or sy != 1.0:
+            nw, nh = int(w * sx), int(h * sy)
+            M = _scale(nw / w, nh / h) @ M
+            w, h = nw, nh
+
+    if perspective is not None and any(perspective.values()):
+        M = perspective_matrix(w, h, perspective) @ M
+    return M, (max(1, w), max(1, h))
+
+
+def apply_geometry(arr, transform=None, perspective=None, scale=1.0):
+    """
+    Transform and perspective in a single resample. ``values`` are in
+    full-resolution pixels; for a preview proxy pass its ``scale`` and the
+    full-size matrix is conjugated by it, so the proxy comes out like a
+    shrunk copy of the full-size result.
+
+    Pixels pulled from outside the source are transparent. Strong
+    downscales are area-prefiltered first, so the warp itself never
+    minifies by more than 2x.
+    """
+    h, w = arr.shape[:2]
+    full_w, full_h = (w, h) if scale == 1.0 else (round(w / scale), round(h / scale))
+    M, (out_w, out_h) = geometry_matrix(full_w, full_h, transform, perspective)
+    if np.allclose(M, np.eye(3)) and (out_w, out_h) == (full_w, full_h):
+        return arr.copy()
+    if scale != 1.0:
+        M = _scale(scale, scale) @ M @ _scale(full_w / w, full_h / h)
+        out_w, out_h = max(1, round(out_w * scale)), max(1, round(out_h * scale))
+    else:
+        M = M @ _scale(full_w / w, full_h / h)
+
+    # area-prefilter any source axis the warp shrinks by more than 2x
+    fx, fy = _axis_scales(M, out_w / 2, out_h / 2)
+    kx = 2 ** int(np.floor(np.log2(1 / fx))) if fx < 0.5 else 1
+    ky = 2 ** int(np.floor(np.log2(1 / fy))) if fy < 0.5 else 1
+    if kx > 1 or ky > 1:
+        pw, ph = max(1, w // kx), max(1, h // ky)
+        arr = cv2.resize(arr, (pw, ph), interpolation=cv2.INTER_AREA)
+        M = M @ _scale(w / pw, h / ph)
+
+    # continuous -> pixel-centre coordinates
+    M = _translate(-0.5, -0.5) @ M @ _translate(0.5, 0.5)
+    flags = cv2.INTER_CUBIC
+    if abs(M[2, 0]) < 1e-12 and abs(M[2, 1]) < 1e-12:
+        out = cv2.warpAffine(arr, M[:2] / M[2, 2], (out_w, out_h), flags=flags,
+                             borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+    else:
+        out = cv2.warpPerspective(arr, M, (out_w, out_h), flags=flags,
+                                  borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0, 0))
+    return out
+
+
+def _axis_scales(M, x, y):
+    """How much the warp stretches the source x and y axes around output (x, y)."""
+    inv = np.linalg.inv(M)
+    p = inv @ np.array([x, y, 1.0])
+    d = p[2]
+    # Jacobian of output -> source, inverted to source -> output
+    jac = (inv[:2, :2] * d - np.outer(p[:2], inv[2, :2])) / (d * d)
+    fwd = np.linalg.inv(jac)
+    return np.hypot(fwd[0, 0], fwd[1, 0]), np.hypot(fwd[0, 1], fwd[1, 1])
+
+
+def apply_transforms(arr, values):
+    return apply_geometry(arr, transform=values)
+
+
+def apply_perspective(arr, values, scale=1.0):
+    return apply_geometry(arr, perspective=values, scale=scale)
+
+
+def reflect(arr, direction):
+    if direction == "horizontal":
+        return arr[:, ::-1].copy()
+    if direction == "vertical":
+        return arr[::-1].copy()
+    return arr.copy()
+
+
+def crop(arr, box):
+    x1, y1, x2, y2 = box
+    return arr[y1:y2, x1:x2].copy()
+
+
+# ===========================================================
+# MORPHOLOGY
+# ===========================================================
+MORPH_OPERATIONS = ("erosion", "dilation", "opening", "closing", "gradient", "mean", "median", "max", "min")
+
+
+MORPH_SHAPES = {
+    "rect": cv2.MORPH_RECT,
+    "ellipse": cv2.MORPH_ELLIPSE,
+    "cross": cv2.MORPH_CROSS,
+}
+
+_MORPH_EX = {
+    "opening": cv2.MORPH_OPEN,
+    "closing": cv2.MORPH_CLOSE,
+}
+
+
+def structuring_element(shape, kernel_size):
+    if shape not in MORPH_SHAPES:
+        raise ValueError(f"Unknown structuring element: {shape}")
+    return cv2.getStructuringElement(MORPH_SHAPES[shape], (kernel_size, kernel_size))
+
+
+def apply_morphology(arr, operation, kernel_size, shape="rect"):
+    """
+    ``operation`` over all four channels (alpha included) at once.
+    A rect element is passed as an all-ones kernel, which OpenCV runs as
+    separate row and column passes (O(k) per pixel instead of O(k^2)).
+    Median is always square; mean with ellipse/cross averages over the element.
+    """
+    kernel_size = max(1, int(kernel_size))
+    if kernel_size % 2 == 0:
+        kernel_size += 1
+    kernel = structuring_element(shape, kernel_size)
+
+    if operation in ("erosion", "min"):
+        return cv2.erode(arr, kernel)
+    if operation in ("dilation", "max"):
+        return cv2.dilate(arr, kernel)
+    if operation in _MORPH_EX:
+        return cv2.morphologyEx(arr, _MORPH_EX[operation], kernel)
+    if operation == "gradient":
+        # dilate - erode on the colors; alpha keeps the dilated coverage so
+        # an opaque image doesn't come out fully transparent
+        dilated = cv2.dilate(arr, kernel)
+        out = cv2.subtract(dilated, cv2.erode(arr, kernel))
+        out[:, :, 3] = dilated[:, :, 3]
+        return out
+    if operation == "mean":
+        if shape == "rect":
+            return cv2.blur(arr, (kernel_size, kernel_size))
+        return cv2.filter2D(arr, -1, kernel.astype(np.float32) / kernel.sum())
+    if operation == "median":
+        return cv2.medianBlur(arr, kernel_size)
+    raise ValueError(f"Unknown morphology operation: {operation}")
+
+
+# ===========================================================
+# FILTERS
+# ===========================================================
+def apply_filter(arr, filter_name):
+    img = Image.fromarray(arr)
+    if filter_name == "grayscale":
+        img = ImageOps.grayscale(img)
+    elif filter_name == "sepia":
+        return apply_sepia(arr)
+    elif filter_name == "edge":
+        img = img.filter(ImageFilter.FIND_EDGES)
+    elif filter_name == "emboss":
+        img = img.filter(ImageFilter.EMBOSS)
+    elif filter_name == "sharpen":
+        img = img.filter(ImageFilter.SHARPEN)
+    elif filter_name == 'sobel':
+        return apply_sobel(arr)
+    elif filter_name == 'prewitt':
+        return apply_prewitt(arr)
+    elif filter_name == 'laplacian':
+        return apply_laplacian(arr)
+    return _rgba(img)
+
+
+def _gray(arr):
+    return np.array(Image.fromarray(arr).convert('L'), dtype=np.float64)
+
+
+def apply_sobel(arr):
+    img_array = _gray(arr)
+
+    # Apply Sobel operators
+    sobel_x = cv2.Sobel(img_array, cv2.CV_64F, 1, 0, ksize=3)
+    sobel_y = cv2.Sobel(img_array, cv2.CV_64F, 0, 1, ksize=3)
+
+    # Calculate magnitude
+    magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
+
+    # Normalize to 0-255
+    magnitude = cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX)
+    return _rgba(Image.fromarray(magnitude.astype(np.uint8)))
+
+
+def apply_prewitt(arr):
+    img_array = _gray(arr)
+
+    # Prewitt kernels
+    kernel_x = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]])
+    kernel_y = np.array([[-1, -1, -1], [0, 0, 0], [1, 1, 1]])
+
+    # Apply Prewitt operators
+    prewitt_x = cv2.filter2D(img_array, cv2.CV_64F, kernel_x)
+    prewitt_y = cv2.filter2D(img_array, cv2.CV_64F, kernel_y)
+
+    # Calculate magnitude
+    magnitude = np.sqrt(prewitt_x**2 + prewitt_y**2)
+
+    # Normalize to 0-255
+    magnitude = cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX)
+    return _rgba(Image.fromarray(magnitude.astype(np.uint8)))
+
+
+def apply_laplacian(arr):
+    img_array = _gray(arr)
+
+    # Apply Laplacian, take absolute value and normalize
+    laplacian = cv2.Laplacian(img_array, cv2.CV_64F, ksize=3)
+    laplacian = np.absolute(laplacian)
+    laplacian = cv2.normalize(laplacian, None, 0, 255, cv2.NORM_MINMAX)
+    return _rgba(Image.fromarray(laplacian.astype(np.uint8)))
+
+
+def apply_sepia(arr):
+    img_array = arr[:, :, :3]
+    sepia_filter = np.array([[0.393, 0.769, 0.189],
+                             [0.349, 0.686, 0.168],
+                             [0.272, 0.534, 0.131]])
+    sepia_img = img_array.dot(sepia_filter.T)
+    sepia_img = np.clip(sepia_img, 0, 255).astype(np.uint8)
+    return _rgba(Image.fromarray(sepia_img))
+
+
+# ===========================================================
+# ENHANCEMENT
+# ===========================================================
+def auto_enhance(arr):
+    img = Image.fromarray(arr).convert("RGB")
+    img = ImageOps.autocontrast(img, cutoff=2)
+
+    img_np = np.array(img).astype(np.float32)
+    mean_per_channel = img_np.mean(axis=(0, 1), keepdims=True)
+    img_np = np.clip(img_np / (mean_per_channel / 128), 0, 255).astype(np.uint8)
+    img = Image.fromarray(img_np)
+
+    img = ImageEnhance.Color(img).enhance(1.4)
+    img = ImageEnhance.Contrast(img).enhance(1.3)
+    img = ImageEnhance.Brightness(img).enhance(1.1)
+    img = ImageEnhance.Sharpness(img).enhance(1.2)
+
+    gamma = 1.05
+    lut = [pow(x / 255.0, 1 / gamma) * 255 for x in range(256)]
+    img = img.point(lut * 3)
+    return _rgba(img)
+
+
+def gamma_correction(arr, gamma):
+    return apply_tone(arr, AdjustmentParams(gamma=gamma))
+
+
+def global_threshold(arr, value):
+    gray = cv2.cvtColor(arr, cv2.COLOR_RGBA2GRAY)
+    _, thresh = cv2.threshold(gray, int(value), 255, cv2.THRESH_BINARY)
+    return _rgba(Image.fromarray(thresh))
+
+
+def adaptive_threshold(arr):
+    gray = cv2.cvtColor(arr, cv2.COLOR_RGBA2GRAY)
+    adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 11, 2)
+    return _rgba(Image.fromarray(adaptive))
+
+
+def smoothing(arr, kernel_size):
+    k = int(kernel_size)
+    if k % 2 == 0:
+        k += 1
+    return cv2.GaussianBlur(arr, (k, k), 0)
+
+
+def sharpen(arr):
+    return _rgba(Image.fromarray(arr).filter(ImageFilter.SHARPEN))
+
+
+def denoise(arr):
+    return _rgba(Image.fromarray(arr).filter(ImageFilter.GaussianBlur(radius=1.5)))
+
+
+def boost_detail(arr):
+    return _rgba(Image.fromarray(arr).filter(ImageFilter.DETAIL))
+
+
+# ===========================================================
+# DRAWING
+# ===========================================================
+def bucket_fill(pixels, x, y, color, tolerance=0):
+    """
+    Flood-fill ``pixels`` (RGBA array) in place from (x, y).
+
+    Pixels whose every channel is within ``tolerance`` of the seed pixel
+    and that are 4-connected to it get ``color``. The region is found by
+    cv2.floodFill (scanline) on an inRange match map, so only the filled
+    bounding box is written. Returns that box as (x0, y0, x1, y1), or None
+    if nothing changed.
+    """
+    h, w = pixels.shape[:2]
+    if not (0 <= x < w and 0 <= y < h):
+        return None
+    target = pixels[y, x].astype(np.int16)
+    fill_rgb = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
+    fill = np.array(fill_rgb + [255], dtype=np.uint8)
+    if tolerance <= 0 and np.all(target == fill):
+        return None
+    lo = np.clip(target - tolerance, 0, 255).astype(np.float64)
+    hi = np.clip(target + tolerance, 0, 255).astype(np.float64)
+    match = cv2.inRange(pixels, lo, hi)
+    mask = np.zeros((h + 2, w + 2), np.uint8)
+    flags = 4 | cv2.FLOODFILL_MASK_ONLY | cv2.FLOODFILL_FIXED_RANGE | (1 << 8)
+    _, _, _, (x0, y0, bw, bh) = cv2.floodFill(match, mask, (int(x), int(y)), 0, 0, 0, flags)
+    region = mask[y0 + 1:y0 + bh + 1, x0 + 1:x0 + bw + 1].view(bool)
+    if pixels.flags.c_contiguous:
+        # one uint32 per RGBA pixel: a masked 2-D copy instead of a boolean gather
+        np.copyto(pixels.view(np.uint32)[y0:y0 + bh, x0:x0 + bw, 0], fill.view(np.uint32)[0], where=region)
+    else:
+        np.copyto(pixels[y0:y0 + bh, x0:x0 + bw], fill, where=region[..., None])
+    return x0, y0, x0 + bw, y0 + bh
@@ -0,0 +1,175 @@
+"""
+Frequency-domain filtering for the Frequency tab.
+
+A Spectrum is the forward DFT of an image's R, G, B channels (or its gray
+version), taken once with cv2.dft at OpenCV's optimal padded size and kept
+in CCS-packed form: a real input gives a real float32 array the size of the
+padded image, half the memory of a full complex spectrum. Filtering
+multiplies each plane by a radial transfer function laid out in the same
+packing and runs only the inverse DFT, so moving the radius or switching
+the filter shape never repeats the forward transform.
+
+Cutoffs are in cycles per pixel of the array the Spectrum was built from
+(0.5 = Nyquist); a display proxy at ``scale`` x full size previews a
+full-size cutoff ``c`` with ``c / scale``.
+"""
+import threading
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+from PIL import Image
+
+FILTER_SHAPES = ("ideal", "gaussian", "butterworth")
+BUTTERWORTH_ORDER = 2
+
+
+def _packed_frequencies(ph, pw):
+    """Radial frequency (cycles/pixel) of each element of a CCS-packed (ph, pw) spectrum."""
+    rows = np.arange(ph)
+    fy = np.minimum(rows, ph - rows) / ph
+    fx = ((np.arange(pw) + 1) // 2) / pw
+    d = np.hypot(fy[:, None], fx[None, :])
+    # the first column (and the last when pw is even) packs the purely
+    # vertical frequencies down the rows as re/im pairs
+    fy_packed = ((rows + 1) // 2) / ph
+    d[:, 0] = fy_packed
+    if pw % 2 == 0:
+        d[:, -1] = np.hypot(fy_packed, 0.5)
+    return d.astype(np.float32)
+
+
+def transfer(freqs, cutoff, shape="ideal", high=False):
+    """Low-pass (or 1 - low-pass) response at radial frequencies ``freqs``."""
+    cutoff = max(float(cutoff), 1e-6)
+    if shape == "ideal":
+        low = (freqs <= cutoff).astype(np.float32)
+    elif shape == "gaussian":
+        low = np.exp(-(freqs * freqs) / np.float32(2 * cutoff * cutoff))
+    elif shape == "butterworth":
+        low = 1 / (1 + (freqs / np.float32(cutoff)) ** (2 * BUTTERWORTH_ORDER))
+    else:
+        raise ValueError(f"Unknown filter shape: {shape}")
+    return 1 - low if high else low
+
+
+def _mirror_magnitude(plane):
+    """|F| over the full (ph, pw) plane from a CCS-packed real spectrum."""
+    ph, pw = plane.shape
+    half = np.empty((ph, pw // 2 + 1), np.float32)
+    k = (pw - 1) // 2
+    half[:, 1:k + 1] = np.hypot(plane[:, 1:2 * k:2], plane[:, 2:2 * k + 1:2])
+
+    def packed_column(col):
+        mag = np.empty(ph, np.float32)
+        mag[0] = abs(col[0])
+        m = (ph - 1) // 2
+        mag[1:m + 1] = np.hypot(col[1:2 * m:2], col[2:2 * m + 1:2])
+        if ph % 2 == 0:
+            mag[ph // 2] = abs(col[ph - 1])
+        mag[ph - m:] = mag[1:m + 1][::-1]  # F(-u, v) = conj F(u, v) on these columns
+        return mag
+
+    half[:, 0] = packed_column(plane[:, 0])
+    if pw % 2 == 0:
+        half[:, -1] = packed_column(plane[:, -1])
+
+    full = np.empty((ph, pw), np.float32)
+    full[:, :half.shape[1]] = half
+    # Hermitian symmetry: |F(u, v)| = |F(-u, -v)|
+    rest = np.arange(half.shape[1], pw)
+    full[:, rest] = half[(-np.arange(ph)) % ph][:, pw - rest]
+    return full
+
+
+class Spectrum:
+    """Cached forward DFT of an RGBA array; ``color=False`` works on its gray version."""
+
+    def __init__(self, arr, color=True):
+        h, w = arr.shape[:2]
+        self.size = (h, w)
+        self.color = color
+        self.alpha = np.array(arr[:, :, 3])
+        ph, pw = cv2.getOptimalDFTSize(h), cv2.getOptimalDFTSize(w)
+        if color:
+            channels = [arr[:, :, i] for i in range(3)]
+        else:
+            channels = [np.asarray(Image.fromarray(arr).convert("L"))]
+        self.planes = []
+        for channel in channels:
+            # reflect into the padding so the borders don't ring
+            padded = cv2.copyMakeBorder(np.ascontiguousarray(channel), 0, ph - h, 0, pw - w, cv2.BORDER_REFLECT)
+            self.planes.append(cv2.dft(np.float32(padded)))
+        self.freqs = _packed_frequencies(ph, pw)
+
+    @property
+    def nbytes(self):
+        return sum(p.nbytes for p in self.planes) + self.freqs.nbytes + self.alpha.nbytes
+
+    def _assemble(self, channels):
+        h, w = self.size
+        out = np.empty((h, w, 4), np.uint8)
+        for i in range(3):
+            out[:, :, i] = channels[i if self.color else 0]
+        out[:, :, 3] = self.alpha
+        return out
+
+    def filter(self, cutoff, shape="ideal", high=False):
+        """
+        Low- or high-pass at ``cutoff`` (cycles/pixel). High-pass keeps the
+        magnitude of the result, an edge map on black, like the old filter.
+        """
+        h, w = self.size
+        mask = transfer(self.freqs, cutoff, shape, high)
+        channels = []
+        for plane in self.planes:
+            back = cv2.idft(plane * mask, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[:h, :w]
+            channels.append(cv2.convertScaleAbs(back) if high else np.clip(back, 0, 255).astype(np.uint8))
+        return self._assemble(channels)
+
+    def inverse(self):
+        """The image back from the spectrum (gray when ``color=False``)."""
+        h, w = self.size
+        channels = [cv2.convertScaleAbs(cv2.idft(p, flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE)[:h, :w])
+                    for p in self.planes]
+        return self._assemble(channels)
+
+    def magnitude(self):
+        """Centered log-magnitude spectrum, each channel scaled to 0..255, at image size."""
+        h, w = self.size
+        channels = []
+        for plane in self.planes:
+            mag = 20 * np.log(np.fft.fftshift(_mirror_magnitude(plane)) + 1)
+            mag = np.uint8(mag / max(float(mag.max()), 1e-6) * 255)
+            if mag.shape != (h, w):
+                mag = cv2.resize(mag, (w, h), interpolation=cv2.INTER_AREA)
+            channels.append(mag)
+        return self._assemble(channels)
+
+
+class SpectrumCache:
+    """The last few Spectrum objects by key (e.g. image version). Thread-safe."""
+
+    def __init__(self, entries=2):
+        self.entries = entries
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, arr, color=True):
+        """Spectrum for ``key``, computed from ``arr`` on a miss."""
+        key = (key, color)
+        with self._lock:
+            spectrum = self._items.get(key)
+            if spectrum is not None:
+                self._items.move_to_end(key)
+                return spectrum
+        spectrum = Spectrum(arr, color)
+        with self._lock:
+            self._items[key] = spectrum
+            while len(self._items) > self.entries:
+                self._items.popitem(last=False)
+        return spectrum
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
@@ -0,0 +1,157 @@
+"""
+Undo/redo snapshot storage.
+
+Snapshots are kept as raw pixel buffers (optionally zlib level-1 compressed)
+instead of PNG files. Newest snapshots stay in RAM up to a byte budget; older
+ones spill to memory-mapped temp files, so the depth is bounded by RAM + disk
+rather than a fixed count.
+"""
+import os
+import shutil
+import tempfile
+import weakref
+import zlib
+
+import numpy as np
+from PIL import Image
+
+import profiling
+
+
+class _Snapshot:
+    __slots__ = ("shape", "dtype", "data", "path", "compressed", "nbytes", "tag")
+
+    def __init__(self, shape, dtype, data, compressed, tag=None):
+        self.shape = shape
+        self.dtype = dtype
+        self.data = data          # bytes / ndarray while in RAM, None once spilled
+        self.path = None          # memmap file once spilled
+        self.compressed = compressed
+        self.nbytes = len(data) if compressed else data.nbytes
+        self.tag = tag            # caller's data kept with the pixels (dropped together)
+
+
+class SnapshotStack:
+    """
+    Stack of image snapshots with list-like ``append`` / ``pop`` / ``clear``.
+
+    ``ram_budget`` caps the bytes held in memory; the oldest snapshots beyond it
+    are written to ``spill_dir`` (a private temp dir by default) and read back
+    through ``np.memmap``. ``disk_budget`` caps the spilled bytes; past it the
+    oldest snapshots are dropped.
+
+    A snapshot can carry a ``tag`` (e.g. the edit-recipe cursor it belongs
+    to); ``pop_tagged`` returns it with the image.
+    """
+
+    def __init__(self, ram_budget=512 * 1024 * 1024, disk_budget=4 * 1024 * 1024 * 1024,
+                 compress=False, spill_dir=None):
+        self.ram_budget = ram_budget
+        self.disk_budget = disk_budget
+        self.compress = compress
+        self._spill_dir = spill_dir
+        self._items = []          # oldest first
+        self.ram_bytes = 0
+        self.disk_bytes = 0
+        self._finalizer = None
+
+    def __len__(self):
+        return len(self._items)
+
+    def __bool__(self):
+        return bool(self._items)
+
+    # ---------- public ----------
+    def append(self, img, tag=None):
+        with profiling.span("snapshot", "history", depth=len(self._items) + 1):
+            arr = np.array(img)
+            if self.compress:
+                snap = _Snapshot(arr.shape, arr.dtype, zlib.compress(arr.tobytes(), 1), True, tag)
+            else:
+                snap = _Snapshot(arr.shape, arr.dtype, arr, False, tag)
+            self._items.append(snap)
+            self.ram_bytes += snap.nbytes
+            self._enforce_budgets()
+
+    def pop(self):
+        return self.pop_tagged()[0]
+
+    def pop_tagged(self):
+        """The newest snapshot as (image, tag)."""
+        snap = self._items.pop()
+        tag = snap.tag
+        with profiling.span("restore", "history", spilled=snap.path is not None):
+            arr = self._load(snap)
+            self._release(snap)
+            return Image.fromarray(arr), tag
+
+    def clear(self):
+        for snap in self._items:
+            self._release(snap)
+        self._items.clear()
+
+    # ---------- internals ----------
+    def _load(self, snap):
+        if snap.path is not None:
+            if snap.compressed:
+                mm = np.memmap(snap.path, dtype=np.uint8, mode="r", shape=(snap.nbytes,))
+                raw = zlib.decompress(mm)
+                del mm
+                return np.frombuffer(raw, dtype=snap.dtype).reshape(snap.shape)
+            mm = np.memmap(snap.path, dtype=snap.dtype, mode="r", shape=snap.shape)
+            arr = np.array(mm)
+            del mm
+            return arr
+        if snap.compressed:
+            return np.frombuffer(zlib.decompress(snap.data), dtype=snap.dtype).reshape(snap.shape)
+        return snap.data
+
+    def _release(self, snap):
+        if snap.path is not None:
+            self.disk_bytes -= snap.nbytes
+            try:
+                os.remove(snap.path)
+            except OSError:
+                pass
+            snap.path = None
+        else:
+            self.ram_bytes -= snap.nbytes
+        snap.data = None
+
+    def _spill(self, snap):
+        with profiling.span("spill", "history", bytes=snap.nbytes):
+            self._write_spill(snap)
+
+    def _write_spill(self, snap):
+        directory = self._ensure_dir()
+        fd, path = tempfile.mkstemp(suffix=".snap", dir=directory)
+        os.close(fd)
+        if snap.compressed:
+            mm = np.memmap(path, dtype=np.uint8, mode="w+", shape=(snap.nbytes,))
+            mm[:] = np.frombuffer(snap.data, dtype=np.uint8)
+        else:
+            mm = np.memmap(path, dtype=snap.dtype, mode="w+", shape=snap.shape)
+            mm[:] = snap.data
+        mm.flush()
+        del mm
+        self.ram_bytes -= snap.nbytes
+        self.disk_bytes += snap.nbytes
+        snap.data = None
+        snap.path = path
+
+    def _enforce_budgets(self):
+        # the newest snapshot always stays in RAM
+        for snap in self._items[:-1]:
+            if self.ram_bytes <= self.ram_budget:
+                break
+            if snap.path is None:
+                self._spill(snap)
+        while self.disk_bytes > self.disk_budget and len(self._items) > 1:
+            self._release(self._items.pop(0))
+
+    def _ensure_dir(self):
+        if self._spill_dir is None:
+            self._spill_dir = tempfile.mkdtemp(prefix="balr-history-")
+            self._finalizer = weakref.finalize(self, shutil.rmtree, self._spill_dir, True)
+        os.makedirs(self._spill_dir, exist_ok=True)
+        return self._spill_dir
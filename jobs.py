@@ -0,0 +1,107 @@
+"""
+Background job runner for the Tk window.
+
+Heavy engine work runs on worker threads; results are handed back to the Tk
+thread by polling a queue from ``after()`` (Tk itself must only be touched
+from the main thread). Jobs submitted on the same ``channel`` supersede each
+other: the older one is cancelled and its result is dropped.
+"""
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from engine import Cancelled
+
+
+class Job:
+    def __init__(self, channel=None):
+        self.channel = channel
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def check(self):
+        """Raise Cancelled if the job was cancelled; for use between work steps."""
+        if self._cancelled.is_set():
+            raise Cancelled()
+
+
+class JobRunner:
+    def __init__(self, root, max_workers=2, poll_ms=15):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="balr-job")
+        self._results = queue.Queue()
+        self._latest = {}
+        self._pending = 0
+        self._poll_id = None
+
+    def submit(self, fn, *args, channel=None, on_done=None, on_error=None, on_finally=None):
+        """
+        Run ``fn(job, *args)`` on a worker thread.
+
+        ``on_done(result)`` / ``on_error(exc)`` run on the Tk thread unless the
+        job was cancelled; ``on_finally()`` always runs there.
+        """
+        job = Job(channel)
+        if channel is not None:
+            prev = self._latest.get(channel)
+            if prev is not None:
+                prev.cancel()
+            self._latest[channel] = job
+        self._pending += 1
+        callbacks = (on_done, on_error, on_finally)
+        self._pool.submit(self._run, job, fn, args, callbacks)
+        self._schedule_poll()
+        return job
+
+    def cancel(self, channel):
+        job = self._latest.pop(channel, None)
+        if job is not None:
+            job.cancel()
+
+    def shutdown(self):
+        for job in self._latest.values():
+            job.cancel()
+        self._pool.shutdown(wait=False)
+
+    # ---------- internals ----------
+    def _run(self, job, fn, args, callbacks):
+        try:
+            job.check()
+            outcome = (True, fn(job, *args))
+        except BaseException as e:  # delivered to on_error on the Tk thread
+            outcome = (False, e)
+        self._results.put((job, outcome, callbacks))
+
+    def _schedule_poll(self):
+        if self._poll_id is None:
+            self._poll_id = self.root.after(self.poll_ms, self._poll)
+
+    def _poll(self):
+        self._poll_id = None
+        while True:
+            try:
+                job, (ok, value), (on_done, on_error, on_finally) = self._results.get_nowait()
+            except queue.Empty:
+                break
+            self._pending -= 1
+            if self._latest.get(job.channel) is job:
+                del self._latest[job.channel]
+            try:
+                if job.is_cancelled() or isinstance(value, Cancelled):
+                    pass
+                elif ok:
+                    if on_done is not None:
+                        on_done(value)
+                elif on_error is not None:
+                    on_error(value)
+            finally:
+                if on_finally is not None:
+                    on_finally()
+        if self._pending > 0:
+            self._schedule_poll()
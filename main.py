@@ -3,15 +3,23 @@ import os
 import sys
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox, simpledialog
-from PIL import Image, ImageTk, ImageFilter, ImageOps, ImageEnhance, ImageDraw, ImageFont
+from PIL import Image, ImageTk
 import numpy as np
-import cv2
-import requests
 from io import BytesIO
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from matplotlib.figure import Figure
-import colorsys
-from collections import deque
+
+import annotate
+import engine
+import frequency
+import profiling
+import remote
+from pyramid import Pyramid
+from viewer import ZoomViewer
+import tiles
+from history import SnapshotStack
+from recipe import Recipe, Step, SIDECAR_SUFFIX, cached_digest, same_file, sidecar_path
+from jobs import JobRunner
 
 
 # ===========================================================
@@ -39,18 +47,35 @@ class AdvancedImageProcessor(tk.Tk):
         # ====== STATE ======
         self.original_image = None
         self.current_image = None
-        self.preview_image_tk = None
 
-        # Undo/Redo (simpan sebagai PNG bytes)
-        self.undo_stack = deque(maxlen=5)
-        self.redo_stack = deque(maxlen=5)
+        # Undo/Redo (raw snapshots, spill ke disk kalau RAM budget habis)
+        self.undo_stack = SnapshotStack(ram_budget=512 * 1024 * 1024)
+        self.redo_stack = SnapshotStack(ram_budget=256 * 1024 * 1024)
+
+        # Non-destructive recipe of committed edits; each snapshot is tagged with its cursor
+        self.recipe = None
+        self._recipe_cache = engine.StageCache(max_bytes=512 * 1024 * 1024)
 
         # Transform values
         self.transform_values = {"resize": 100, "rotate": 0, "scale_x": 100, "scale_y": 100}
 
-        # Store slider refs & debounce map
+        # Memoized pipeline stages for the live preview
+        self._stage_cache = engine.StageCache(max_bytes=256 * 1024 * 1024)
+
+        # Worker threads for engine work; results come back via after()
+        self.jobs = JobRunner(self)
+
+        # Pooled HTTP client for the remote AI endpoints
+        self.remote = remote.RemoteClient(cache=remote.ResultCache())
+
+        # Store slider refs & debounce / live-throttle maps
         self.slider_widgets = {}
         self._debounce_after_ids = {}
+        self._throttle_after_ids = {}
+        self._throttle_pending = {}
+
+        # Pyramid of the image under a trailing geometry step, for its previews
+        self._geometry_pyramid = None
 
         # API Key placeholder
         self.api_key = ""
@@ -72,9 +97,38 @@ class AdvancedImageProcessor(tk.Tk):
         self.blur_var = tk.DoubleVar(value=0)
         self.noise_var = tk.DoubleVar(value=0)
         self.vignette_var = tk.DoubleVar(value=0)
+        self.gamma_var = tk.DoubleVar(value=1.0)
+
+        # slider key -> var, same names as engine.AdjustmentParams
+        self.adjust_vars = {
+            "exposure": self.exposure_var,
+            "highlights": self.highlights_var,
+            "shadows": self.shadows_var,
+            "contrast": self.contrast_var,
+            "brightness": self.brightness_var,
+            "blacks": self.blacks_var,
+            "whites": self.whites_var,
+            "hue": self.hue_var,
+            "tint": self.tint_var,
+            "saturation": self.saturation_var,
+            "temperature": self.temperature_var,
+            "vibrance": self.vibrance_var,
+            "blur": self.blur_var,
+            "noise": self.noise_var,
+            "vignette": self.vignette_var,
+            "gamma": self.gamma_var,
+        }
 
         # Morphology
         self.kernel_size_var = tk.IntVar(value=3)
+        self.morph_shape_var = tk.StringVar(value="rect")
+        self.morph_op = None  # operation being previewed
+
+        # Frequency domain
+        self.freq_color_var = tk.BooleanVar(value=True)
+        self.freq_shape_var = tk.StringVar(value="ideal")
+        self.freq_mode = None  # "low" / "high" being previewed
+        self._spectra = frequency.SpectrumCache(entries=2)  # proxy + full size
 
         # Perspective values
         self.perspective_values = {
@@ -170,6 +224,7 @@ class AdvancedImageProcessor(tk.Tk):
 
         add_btn("open", "Open", self.open_image)
         add_btn("save", "Save", self.save_image)
+        add_btn("preset", "Save Preset", self.save_preset)
         add_btn("gen", "Generate AI Image", self.generate_ai_image)
         add_btn("reset", "Reset", self.reset_image)
         add_btn("undo", "Undo", self.undo)
@@ -243,8 +298,10 @@ class AdvancedImageProcessor(tk.Tk):
         self.center_frame = tk.Frame(content, bg="#0f1826", highlightthickness=3, highlightbackground="#4c86a8")
         self.center_frame.grid(row=0, column=2, sticky="nsew", padx=4, pady=10)
 
-        self.image_label = tk.Label(self.center_frame, bg="#0f1826")
-        self.image_label.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        # fit-to-window preview; wheel zooms in and then only the visible region is rendered
+        self.viewer = ZoomViewer(self.center_frame, self.jobs, self._viewer_pyramid, self._roi_renderer,
+                                 on_fit=self.update_image_preview)
+        self.viewer.canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
 
         # Right toggle
         right_toggle_col = tk.Frame(content, bg="#0b1220", width=26)
@@ -267,8 +324,19 @@ class AdvancedImageProcessor(tk.Tk):
         self.hist_ax.set_facecolor("#0f1826")
         self.hist_ax.tick_params(colors="white")
         self.hist_ax.set_title("Histogram", color="white", fontsize=10)
+        self.hist_ax.set_xlim([0, 256])
+        self.hist_ax.set_ylim([0, 1.05])
+        # lines are created once and only get new y data (blitted, see _draw_histogram)
+        self.hist_lines = [
+            self.hist_ax.plot(np.arange(256), np.zeros(256), color=c, animated=True)[0]
+            for c in ("r", "g", "b")
+        ]
         self.hist_canvas = FigureCanvasTkAgg(fig, master=hist_group)
         self.hist_canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True, padx=8, pady=8)
+        self._hist_bg = None
+        self._hist_pending = None
+        self._hist_after_id = None
+        self.hist_canvas.mpl_connect("draw_event", self._on_hist_draw)
 
         # Controls (tabs)
         control_box = tk.Frame(self.right_wrap, bg="#0b1220")
@@ -324,6 +392,12 @@ class AdvancedImageProcessor(tk.Tk):
         # Set awal state toolbar
         self._update_toolbar_state(has_image=False)
 
+        # F12: per-stage timing overlay, Ctrl+Shift+T: export the session trace
+        self._hud_items = None
+        self._hud_after_id = None
+        self.bind("<F12>", lambda e: self.toggle_timing_hud())
+        self.bind("<Control-T>", lambda e: self.export_trace())
+
     # ---------- COLLAPSE TOGGLES ----------
     def toggle_left_panel(self):
         if not self.left_collapsed:
@@ -349,6 +423,53 @@ class AdvancedImageProcessor(tk.Tk):
             self.right_toggle_btn.configure(text="▶")
         self.update_image_preview()
 
+    # ---------- TIMING HUD ----------
+    def toggle_timing_hud(self):
+        canvas = self.viewer.canvas
+        if self._hud_items is not None:
+            if self._hud_after_id is not None:
+                self.after_cancel(self._hud_after_id)
+                self._hud_after_id = None
+            for item in self._hud_items:
+                canvas.delete(item)
+            self._hud_items = None
+            return
+        box = canvas.create_rectangle(0, 0, 0, 0, fill="#0b1220", outline="#2ca7a4", stipple="gray75")
+        text = canvas.create_text(0, 0, anchor=tk.NE, fill="white", font=("Consolas", 9))
+        self._hud_items = (box, text)
+        self._refresh_timing_hud()
+
+    def _refresh_timing_hud(self):
+        # last / mean of the recent spans per stage, twice a second
+        self._hud_after_id = self.after(500, self._refresh_timing_hud)
+        canvas = self.viewer.canvas
+        box, text = self._hud_items
+        rows = [f"{name[:24]:<24} {last:8.1f} {mean:8.1f}" for _, name, last, mean in profiling.tracer.summary()]
+        if not profiling.tracer.enabled:
+            rows = ["tracing off (BALR_TRACE=0)"]
+        header = f"{'stage':<24} {'last ms':>8} {'avg ms':>8}"
+        canvas.itemconfigure(text, text="\n".join([header] + (rows or ["(nothing yet)"])))
+        canvas.coords(text, canvas.winfo_width() - 12, 12)
+        x0, y0, x1, y1 = canvas.bbox(text)
+        canvas.coords(box, x0 - 6, y0 - 4, x1 + 6, y1 + 4)
+        canvas.tag_raise(box)
+        canvas.tag_raise(text)
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(
+            title="Export timing trace",
+            defaultextension=".json",
+            initialfile="balr-trace.json",
+            filetypes=[("Chrome trace", "*.json")],
+        )
+        if not path:
+            return
+        try:
+            profiling.tracer.export(path)
+            messagebox.showinfo("Success", f"Trace saved to:\n{path}")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to export trace:\n{e}")
+
     # ---------- helpers: scrollable area ----------
     def _make_vscroll_area(self, parent, width=None, bg="#0b1220", return_canvas=False):
         """
@@ -409,16 +530,20 @@ class AdvancedImageProcessor(tk.Tk):
         tf = ttk.Labelframe(parent, text="Transform")
         tf.pack(fill=tk.X, padx=6, pady=6)
 
-        self._add_slider_with_entry(tf, "Resize (%)", "resize", 10, 200, 100, lambda v: self.update_transform("resize", v))
-        self._add_slider_with_entry(tf, "Rotate (°)", "rotate", -180, 180, 0, lambda v: self.update_transform("rotate", v))
+        self._add_slider_with_entry(tf, "Resize (%)", "resize", 10, 200, 100, lambda v: self.update_transform("resize", v),
+                                    live=lambda v: self.preview_transform("resize", v))
+        self._add_slider_with_entry(tf, "Rotate (°)", "rotate", -180, 180, 0, lambda v: self.update_transform("rotate", v),
+                                    live=lambda v: self.preview_transform("rotate", v))
 
         ttk.Button(tf, text="Crop (Interactive)", style="Accent.TButton",
                    command=self.interactive_crop).pack(fill=tk.X, padx=4, pady=4)
         ttk.Button(tf, text="Draw / Annotate (Interactive)", style="Accent.TButton",
                    command=self.interactive_draw).pack(fill=tk.X, padx=4, pady=4)
 
-        self._add_slider_with_entry(tf, "Scale X (%)", "scale_x", 10, 200, 100, lambda v: self.update_transform("scale_x", v))
-        self._add_slider_with_entry(tf, "Scale Y (%)", "scale_y", 10, 200, 100, lambda v: self.update_transform("scale_y", v))
+        self._add_slider_with_entry(tf, "Scale X (%)", "scale_x", 10, 200, 100, lambda v: self.update_transform("scale_x", v),
+                                    live=lambda v: self.preview_transform("scale_x", v))
+        self._add_slider_with_entry(tf, "Scale Y (%)", "scale_y", 10, 200, 100, lambda v: self.update_transform("scale_y", v),
+                                    live=lambda v: self.preview_transform("scale_y", v))
 
         ttk.Button(tf, text="Flip Horizontal", style="Accent.TButton",
                    command=lambda: self.reflect("horizontal")).pack(fill=tk.X, padx=4, pady=4)
@@ -436,7 +561,8 @@ class AdvancedImageProcessor(tk.Tk):
             "Bottom Right X", "Bottom Right Y",
         ]
         for key in corners:
-            self._add_slider_with_entry(pf, key, key, -1000, 1000, 0, lambda v, k=key: self.update_perspective(k, v))
+            self._add_slider_with_entry(pf, key, key, -1000, 1000, 0, lambda v, k=key: self.update_perspective(k, v),
+                                        live=lambda v, k=key: self.preview_perspective(k, v))
 
     def _build_basic_tab(self, parent):
         self._add_slider_with_entry(parent, "Exposure", "exposure", -100, 100, 0, self._adjust_preview)
@@ -473,6 +599,7 @@ class AdvancedImageProcessor(tk.Tk):
             v = _to_odd(k_slider.get())
             if self.kernel_size_var.get() != v:
                 self.kernel_size_var.set(v)
+                self._throttle("kernel_size", self.preview_morphology)
             k_entry.delete(0, tk.END)
             k_entry.insert(0, str(v))
 
@@ -483,6 +610,7 @@ class AdvancedImageProcessor(tk.Tk):
                 v = 3
             k_slider.set(v)
             self.kernel_size_var.set(v)
+            self.preview_morphology()
 
         k_slider.configure(command=_sync_from_scale)
         k_entry.bind("<Return>", _sync_from_entry)
@@ -490,21 +618,36 @@ class AdvancedImageProcessor(tk.Tk):
 
         self.slider_widgets["kernel_size"] = (k_slider, k_entry, self.kernel_size_var, 3)
 
-        for text, op, title in [
-            ("Erosion",  'erosion',  "Applying Erosion..."),
-            ("Dilation", 'dilation', "Applying Dilation..."),
-            ("Opening",  'opening',  "Applying Opening..."),
-            ("Closing",  'closing',  "Applying Closing..."),
-            ("Gradient", 'gradient', "Applying Gradient..."),
-            ("Mean", 'mean', "Applying Mean Morphology..."),
-            ("Median", 'median', "Applying Median Morphology..."),
-            ("Max", 'max', "Applying Max Morphology..."),
-            ("Min", 'min', "Applying Min Morphology...")
+        ttk.Label(parent, text="Structuring Element:").pack(pady=5)
+        shape_box = ttk.Combobox(parent, textvariable=self.morph_shape_var, state="readonly",
+                                 values=list(engine.MORPH_SHAPES))
+        shape_box.pack(fill=tk.X, padx=10, pady=(0, 8))
+        shape_box.bind("<<ComboboxSelected>>", lambda e: self.preview_morphology())
+
+        # op buttons preview live on the proxy; Apply commits at full resolution
+        for text, op in [
+            ("Erosion",  'erosion'),
+            ("Dilation", 'dilation'),
+            ("Opening",  'opening'),
+            ("Closing",  'closing'),
+            ("Gradient", 'gradient'),
+            ("Mean", 'mean'),
+            ("Median", 'median'),
+            ("Max", 'max'),
+            ("Min", 'min')
         ]:
             ttk.Button(parent, text=text, style="Accent.TButton",
-                       command=lambda op=op, title=title: self._with_overlay(self.apply_morphology, op, title=title)
+                       command=lambda op=op: self.preview_morphology(op)
                        ).pack(fill=tk.X, padx=10, pady=4)
 
+        ttk.Separator(parent, orient="horizontal").pack(fill=tk.X, pady=10)
+        self.morph_status = ttk.Label(parent, text="Pick an operation to preview")
+        self.morph_status.pack(pady=(0, 6))
+        ttk.Button(parent, text="Apply", style="Accent.TButton",
+                   command=self.apply_morphology).pack(fill=tk.X, padx=10, pady=4)
+        ttk.Button(parent, text="Cancel Preview", style="Accent.TButton",
+                   command=self.cancel_morphology).pack(fill=tk.X, padx=10, pady=4)
+
     def _build_filters_tab(self, parent):
         self._add_slider_with_entry(parent, "Blur", "blur", 0, 20, 0, self._adjust_preview)
         self._add_slider_with_entry(parent, "Noise", "noise", 0, 100, 0, self._adjust_preview)
@@ -514,64 +657,84 @@ class AdvancedImageProcessor(tk.Tk):
         ttk.Label(parent, text="Quick Filters").pack(pady=(0, 6))
 
         ttk.Button(parent, text="Grayscale", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "grayscale", title="Applying Grayscale...")
+                   command=lambda: self.apply_filter("grayscale", title="Applying Grayscale...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Sepia", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "sepia", title="Applying Sepia...")
+                   command=lambda: self.apply_filter("sepia", title="Applying Sepia...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Edge Detection", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "edge", title="Detecting Edges...")
+                   command=lambda: self.apply_filter("edge", title="Detecting Edges...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Emboss", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "emboss", title="Applying Emboss...")
+                   command=lambda: self.apply_filter("emboss", title="Applying Emboss...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Sharpen", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "sharpen", title="Sharpening...")
+                   command=lambda: self.apply_filter("sharpen", title="Sharpening...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Sobel", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "sobel", title="Applying Sobel...")
+                   command=lambda: self.apply_filter("sobel", title="Applying Sobel...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Prewitt", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "prewitt", title="Applying Prewitt...")
+                   command=lambda: self.apply_filter("prewitt", title="Applying Prewitt...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Laplacian", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self.apply_filter, "laplacian", title="Applying Laplacian...")
+                   command=lambda: self.apply_filter("laplacian", title="Applying Laplacian...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         
     def _build_frequency_tab(self, parent):
         ttk.Label(parent, text="Apply Frequency Transformations:").pack(anchor="w", padx=10, pady=(4, 6))
+        ttk.Checkbutton(parent, text="Per-channel color", variable=self.freq_color_var,
+                        command=self.preview_pass_filter).pack(anchor="w", padx=10, pady=(0, 6))
         ttk.Button(parent, text="Fourier Transform (FFT)", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._apply_fft, title="Computing FFT...")
+                   command=lambda: self._apply_fft(title="Computing FFT...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Inverse FFT", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._apply_ifft, title="Computing Inverse FFT...")
+                   command=lambda: self._apply_ifft(title="Computing Inverse FFT...")
                    ).pack(fill=tk.X, padx=10, pady=4)
+
+        ttk.Separator(parent, orient="horizontal").pack(fill=tk.X, pady=10)
+        ttk.Label(parent, text="Filter Shape:").pack(pady=5)
+        shape_box = ttk.Combobox(parent, textvariable=self.freq_shape_var, state="readonly",
+                                 values=list(frequency.FILTER_SHAPES))
+        shape_box.pack(fill=tk.X, padx=10, pady=(0, 8))
+        shape_box.bind("<<ComboboxSelected>>", lambda e: self.preview_pass_filter())
+        self.freq_radius_var = self._add_slider_with_entry(
+            parent, "Radius (% of Nyquist)", "freq_radius", 1, 100, 10,
+            lambda v: self.preview_pass_filter(), live=lambda v: self.preview_pass_filter())
+
+        # pass filters preview live on the proxy; Apply commits at full resolution
         ttk.Button(parent, text="High Pass Filter", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._apply_high_pass, title="Applying High Pass...")
+                   command=lambda: self.preview_pass_filter("high")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Low Pass Filter", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._apply_low_pass, title="Applying Low Pass...")
+                   command=lambda: self.preview_pass_filter("low")
                    ).pack(fill=tk.X, padx=10, pady=4)
+        self.freq_status = ttk.Label(parent, text="Pick a filter to preview")
+        self.freq_status.pack(pady=(6, 6))
+        ttk.Button(parent, text="Apply", style="Accent.TButton",
+                   command=self.apply_pass_filter).pack(fill=tk.X, padx=10, pady=4)
+        ttk.Button(parent, text="Cancel Preview", style="Accent.TButton",
+                   command=self.cancel_pass_filter).pack(fill=tk.X, padx=10, pady=4)
 
     def _build_enhancement_tab(self, parent):
         ttk.Label(parent, text="Apply Enhancement Techniques:").pack(anchor="w", padx=10, pady=(4, 6))
         ttk.Button(parent, text="Auto Enhance", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._auto_enhance, title="Auto Enhancing...")
+                   command=lambda: self._auto_enhance(title="Auto Enhancing...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Sharpen", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._sharpen_image, title="Sharpening...")
+                   command=lambda: self._sharpen_image(title="Sharpening...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Denoise", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._denoise_image, title="Denoising...")
+                   command=lambda: self._denoise_image(title="Denoising...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Button(parent, text="Detail Boost", style="Accent.TButton",
-                   command=lambda: self._with_overlay(self._boost_detail, title="Boosting Detail...")
+                   command=lambda: self._boost_detail(title="Boosting Detail...")
                    ).pack(fill=tk.X, padx=10, pady=4)
         ttk.Separator(parent).pack(fill=tk.X, padx=10, pady=8)
         ttk.Label(parent, text="Additional Enhancements:").pack(anchor="w", padx=10, pady=(4, 6))
 
         # === Gamma Correction ===
-        self._add_slider_with_entry(parent, "Gamma", "gamma", 0.1, 3.0, 1.0, None)
+        self._add_slider_with_entry(parent, "Gamma", "gamma", 0.1, 3.0, 1.0, self._adjust_preview)
         ttk.Button(parent, text="Apply Gamma Correction", style="Accent.TButton",
                    command=self._apply_gamma_correction).pack(fill=tk.X, padx=10, pady=(4, 8))
 
@@ -588,7 +751,7 @@ class AdvancedImageProcessor(tk.Tk):
         self._add_slider_with_entry(parent, "Smoothing Kernel", "smooth_kernel", 1, 15, 5, None)
         ttk.Button(parent, text="Apply Smoothing", style="Accent.TButton",
                    command=self._apply_smoothing).pack(fill=tk.X, padx=10, pady=(4, 8))
-    def _auto_enhance(self):
+    def _auto_enhance(self, title="Auto Enhancing..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
@@ -599,30 +762,7 @@ class AdvancedImageProcessor(tk.Tk):
         )
         if not confirm:
             return
-        self.save_state()
-        img = self.current_image.convert("RGB")
-        img = ImageOps.autocontrast(img, cutoff=2)
-
-        img_np = np.array(img).astype(np.float32)
-        mean_per_channel = img_np.mean(axis=(0, 1), keepdims=True)
-        img_np = np.clip(img_np / (mean_per_channel / 128), 0, 255).astype(np.uint8)
-        img = Image.fromarray(img_np)
-
-        img = ImageEnhance.Color(img).enhance(1.4)
-
-        img = ImageEnhance.Contrast(img).enhance(1.3)
-
-        img = ImageEnhance.Brightness(img).enhance(1.1)
-
-        img = ImageEnhance.Sharpness(img).enhance(1.2)
-
-        gamma = 1.05
-        lut = [pow(x / 255.0, 1 / gamma) * 255 for x in range(256)]
-        img = img.point(lut * 3)
-
-        self.current_image = img.convert("RGBA")
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        self._run_job(title, engine.auto_enhance, step=Step("auto_enhance"))
 
     def _apply_gamma_correction(self):
         if self.current_image is None:
@@ -633,17 +773,10 @@ class AdvancedImageProcessor(tk.Tk):
         if not confirm:
             return
 
-        gamma = float(self.slider_widgets.get("gamma", [None, None, None, 1.0])[2].get())
-        invGamma = 1.0 / gamma
-        table = np.array([(i / 255.0) ** invGamma * 255 for i in np.arange(256)]).astype("uint8")
-
-        img_array = np.array(self.current_image)
-        corrected = cv2.LUT(img_array, table)
-
-        self.save_state()
-        self.current_image = Image.fromarray(corrected).convert("RGBA")
-        self.update_image_preview()
-        self._update_toolbar_state()
+        # gamma is previewed live as part of the tone LUT; this bakes it in
+        gamma = float(self.gamma_var.get())
+        self._run_job("Applying Gamma Correction...", engine.gamma_correction, gamma,
+                      on_commit=lambda: self.gamma_var.set(1.0), step=Step("gamma", {"gamma": gamma}))
 
     def _apply_global_threshold(self):
         if self.current_image is None:
@@ -655,13 +788,7 @@ class AdvancedImageProcessor(tk.Tk):
             return
 
         val = int(self.slider_widgets.get("threshold", [None, None, None, 127])[2].get())
-        gray = cv2.cvtColor(np.array(self.current_image), cv2.COLOR_RGBA2GRAY)
-        _, thresh = cv2.threshold(gray, val, 255, cv2.THRESH_BINARY)
-
-        self.save_state()
-        self.current_image = Image.fromarray(thresh).convert("RGBA")
-        self.update_image_preview()
-        self._update_toolbar_state()
+        self._run_job("Applying Threshold...", engine.global_threshold, val, step=Step("threshold", {"value": val}))
 
     def _apply_adaptive_threshold(self):
         if self.current_image is None:
@@ -672,14 +799,7 @@ class AdvancedImageProcessor(tk.Tk):
         if not confirm:
             return
 
-        gray = cv2.cvtColor(np.array(self.current_image), cv2.COLOR_RGBA2GRAY)
-        adaptive = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-                                         cv2.THRESH_BINARY, 11, 2)
-
-        self.save_state()
-        self.current_image = Image.fromarray(adaptive).convert("RGBA")
-        self.update_image_preview()
-        self._update_toolbar_state()
+        self._run_job("Applying Adaptive Threshold...", engine.adaptive_threshold, step=Step("adaptive_threshold"))
 
 
     def _apply_smoothing(self):
@@ -692,15 +812,7 @@ class AdvancedImageProcessor(tk.Tk):
             return
 
         k = int(self.slider_widgets.get("smooth_kernel", [None, None, None, 5])[2].get())
-        if k % 2 == 0:
-            k += 1
-
-        result = cv2.GaussianBlur(np.array(self.current_image), (k, k), 0)
-
-        self.save_state()
-        self.current_image = Image.fromarray(result).convert("RGBA")
-        self.update_image_preview()
-        self._update_toolbar_state()
+        self._run_job("Smoothing...", engine.smoothing, k, step=Step("smoothing", {"kernel_size": k}))
 
     def _cycle_tab(self, nb, step):
         try:
@@ -719,43 +831,68 @@ class AdvancedImageProcessor(tk.Tk):
     # HISTOGRAM
     # =========================
     def _update_histogram(self, img=None):
+        # throttled: the preview is shown first, the histogram follows on a timer
         if img is None:
             img = self.current_image
         if img is None:
             return
-        img_array = np.array(img.convert("RGB"))
-        self.hist_ax.clear()
-        colors = ("r", "g", "b")
-        for i, color in enumerate(colors):
-            hist = cv2.calcHist([img_array], [i], None, [256], [0, 256])
-            self.hist_ax.plot(hist, color=color)
-        self.hist_ax.set_xlim([0, 256])
-        self.hist_ax.set_facecolor("#0f1826")
-        self.hist_ax.tick_params(colors="white")
-        self.hist_ax.set_title("Histogram", color="white", fontsize=10)
-        self.hist_canvas.draw_idle()
+        self._hist_pending = img
+        if self._hist_after_id is None:
+            self._hist_after_id = self.after(80, self._draw_histogram)
+
+    def _draw_histogram(self):
+        self._hist_after_id = None
+        img, self._hist_pending = self._hist_pending, None
+        if img is None:
+            return
+        with profiling.span("histogram", "display"):
+            rgb = np.asarray(img.convert("RGB")).reshape(-1, 3)
+            # R, G, B counts in one bincount: channel c lands in bins [256c, 256c + 256)
+            counts = np.bincount((rgb + np.array([0, 256, 512], dtype=np.uint16)).ravel(), minlength=768)
+            counts = counts.reshape(3, 256).astype(np.float64)
+            peak = counts.max()
+            if peak > 0:
+                counts /= peak
+            for line, ys in zip(self.hist_lines, counts):
+                line.set_ydata(ys)
+            self._blit_histogram()
+
+    def _on_hist_draw(self, event=None):
+        # a full redraw (first show, resize) invalidates the cached background
+        self._hist_bg = self.hist_canvas.copy_from_bbox(self.hist_ax.bbox)
+        for line in self.hist_lines:
+            self.hist_ax.draw_artist(line)
+
+    def _blit_histogram(self):
+        if self._hist_bg is None:
+            self.hist_canvas.draw_idle()
+            return
+        self.hist_canvas.restore_region(self._hist_bg)
+        for line in self.hist_lines:
+            self.hist_ax.draw_artist(line)
+        self.hist_canvas.blit(self.hist_ax.bbox)
 
     # =========================
     # UNDO/REDO
     # =========================
     def save_state(self):
         if self.current_image is not None:
-            img_bytes = BytesIO()
-            self.current_image.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-            self.undo_stack.append(img_bytes)
+            self.undo_stack.append(self.current_image, tag=self._recipe_cursor())
             self.redo_stack.clear()
             self._update_undo_redo_status()
 
+    def _clear_history(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
+
     def undo(self):
         if len(self.undo_stack) > 1:
             if self.current_image is not None:
-                img_bytes = BytesIO()
-                self.current_image.save(img_bytes, format="PNG")
-                img_bytes.seek(0)
-                self.redo_stack.append(img_bytes)
-            previous_state = self.undo_stack.pop()
-            self.current_image = Image.open(previous_state).convert("RGBA")
+                self.redo_stack.append(self.current_image, tag=self._recipe_cursor())
+            img, cursor = self.undo_stack.pop_tagged()
+            self.current_image = img.convert("RGBA")
+            if cursor is not None:
+                self._set_recipe_cursor(cursor)
             self.update_image_preview()
             self._update_undo_redo_status()
         else:
@@ -764,16 +901,88 @@ class AdvancedImageProcessor(tk.Tk):
     def redo(self):
         if self.redo_stack:
             if self.current_image is not None:
-                img_bytes = BytesIO()
-                self.current_image.save(img_bytes, format="PNG")
-                img_bytes.seek(0)
-                self.undo_stack.append(img_bytes)
-            next_state = self.redo_stack.pop()
-            self.current_image = Image.open(next_state).convert("RGBA")
+                self.undo_stack.append(self.current_image, tag=self._recipe_cursor())
+            img, cursor = self.redo_stack.pop_tagged()
+            self.current_image = img.convert("RGBA")
+            if cursor is not None:
+                self._set_recipe_cursor(cursor)
             self.update_image_preview()
             self._update_undo_redo_status()
         else:
             messagebox.showinfo("Info", "Nothing to redo")
+
+    # =========================
+    # RECIPE
+    # =========================
+    def _recipe_cursor(self):
+        return self.recipe.cursor if self.recipe is not None else 0
+
+    def _set_recipe_cursor(self, cursor):
+        if self.recipe is None:
+            return
+        self.recipe.cursor = min(cursor, len(self.recipe.steps))
+        self._sync_geometry_sliders()
+
+    def _record(self, step, arr=None):
+        """Add a committed edit to the recipe; ``arr`` (its result) is cached as that prefix."""
+        if self.recipe is None:
+            return
+        if step.op == "geometry" and self._trailing_geometry():
+            self.recipe.replace_last(step)
+        else:
+            self.recipe.push(step)
+        if arr is not None:
+            self.recipe.remember(arr, self._recipe_cache)
+        if step.op != "geometry":
+            # the geometry so far is baked into the recipe; sliders start over
+            self._set_geometry_sliders()
+
+    def _trailing_geometry(self):
+        last = self.recipe.last() if self.recipe is not None else None
+        return last is not None and last.op == "geometry"
+
+    def _sync_geometry_sliders(self):
+        if self._trailing_geometry():
+            args = self.recipe.last().args
+            self._set_geometry_sliders(args["transform"], args["perspective"])
+        else:
+            self._set_geometry_sliders()
+
+    def _set_geometry_sliders(self, transform=None, perspective=None):
+        self.transform_values = dict(transform or engine.DEFAULT_TRANSFORM)
+        for k in self.perspective_values:
+            self.perspective_values[k] = float((perspective or {}).get(k, 0.0))
+        for key, value in list(self.transform_values.items()) + list(self.perspective_values.items()):
+            if key in self.slider_widgets:
+                self.slider_widgets[key][2].set(value)
+                self._throttle_pending.pop(key, None)  # not a drag, no live preview
+
+    def _open_recipe(self, path):
+        def work(job):
+            loaded = Recipe.load(path)
+            return loaded, loaded.load_original(), loaded.render(cache=self._recipe_cache, cancel=job.is_cancelled)
+
+        def done(result):
+            loaded, original, arr = result
+            self.recipe = loaded
+            self.original_image = original
+            self.current_image = engine.to_image(arr)
+            self.viewer.reset()
+            self._clear_history()
+            self.save_state()
+            self.reset_all_sliders()
+            for key, value in loaded.adjustments.items():
+                if key in self.adjust_vars:
+                    self.adjust_vars[key].set(value)
+            self._sync_geometry_sliders()
+            self.update_image_preview()
+            self.status_label.config(text=f"Loaded recipe: {os.path.basename(path)} ({loaded.cursor} steps)")
+            self._update_toolbar_state(True)
+
+        self._show_loading_overlay("Replaying recipe...")
+        self.jobs.submit(work, on_done=done,
+                         on_error=lambda e: messagebox.showerror("Error", f"Failed to open recipe:\n{e}"),
+                         on_finally=self._hide_loading_overlay)
     def _update_undo_redo_status(self):
         undo_count = len(self.undo_stack) - 1
         redo_count = len(self.redo_stack)
@@ -782,9 +991,9 @@ class AdvancedImageProcessor(tk.Tk):
             base_status = self.status_label["text"].split(" | ")[0]
             status_parts.append(base_status)
         if undo_count > 0:
-            status_parts.append(f"Undo: {undo_count}/5")
+            status_parts.append(f"Undo: {undo_count}")
         if redo_count > 0:
-            status_parts.append(f"Redo: {redo_count}/5")
+            status_parts.append(f"Redo: {redo_count}")
         if status_parts:
             self.status_label.config(text=" | ".join(status_parts))
         self._update_toolbar_state()
@@ -811,58 +1020,30 @@ class AdvancedImageProcessor(tk.Tk):
             messagebox.showwarning("No Image", "Please open an image first.")
             return
 
-        try:
-            # Update status to show that it's processing
-            self.status_label.config(text="Enhancing image... please wait.")
-            self.status_label.update_idletasks()
-
-            # Convert the current image to bytes (in memory)
-            img_bytes = io.BytesIO()
-            self.original_image.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-
-            # Prepare request
-            url = "https://api.topazlabs.com/image/v1/enhance"
-            headers = {
-                "X-API-Key": API_KEY,
-                "accept": "image/jpeg"
-            }
-
-            # Prepare multipart/form-data body
-            files = {
-                "image": ("input.jpg", img_bytes, "image/jpeg")
-            }
-            data = {
-                "model": "Standard V2",
-                "face_enhancement": "true",
-                "face_enhancement_strength": "0.8",
-                "output_format": "jpeg"
-            }
-
-            # Send POST request
-            response = requests.post(url, headers=headers, files=files, data=data)
+        # Update status to show that it's processing
+        self.status_label.config(text="Enhancing image... please wait.")
+        source = self.original_image
 
-            # Handle response
-            if response.status_code == 200:
-                # Read the enhanced image directly from memory
-                enhanced_image = Image.open(io.BytesIO(response.content)).convert("RGB")
+        def work(job):
+            data = self.remote.enhance(remote.image_bytes(source, "PNG"), API_KEY)
+            return Image.open(io.BytesIO(data)).convert("RGB")
 
-                # Replace current image in memory
-                self.save_state()
-                self.current_image = enhanced_image.copy()
+        def done(enhanced_image):
+            # Replace current image in memory
+            self.save_state()
+            self.current_image = enhanced_image
+            self._record(Step.from_image(enhanced_image, "enhance"))
 
-                # Refresh UI
-                self.reset_all_sliders()
-                self.update_image_preview()
-                self.status_label.config(text="✅ Image enhanced successfully!")
+            # Refresh UI
+            self.reset_all_sliders()
+            self.update_image_preview()
+            self.status_label.config(text="✅ Image enhanced successfully!")
 
-            else:
-                messagebox.showerror("Error", f"Enhancement failed:\n{response.text}")
-                self.status_label.config(text="❌ Enhancement failed.")
+        def failed(e):
+            messagebox.showerror("Error", f"Enhancement failed:\n{e}")
+            self.status_label.config(text="❌ Enhancement failed.")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred:\n{e}")
-            self.status_label.config(text="❌ Error during enhancement.")
+        self.jobs.submit(work, channel="enhance", on_done=done, on_error=failed)
     
     def remove_background(self):
 
@@ -873,46 +1054,31 @@ class AdvancedImageProcessor(tk.Tk):
             messagebox.showwarning("No Image", "Please open an image first.")
             return
 
-        try:
-            # Update status to show that it's processing
-            self.status_label.config(text="Removing background... please wait.")
-            self.status_label.update_idletasks()
-
-            # Convert the current image to bytes (in memory)
-            img_bytes = io.BytesIO()
-            self.original_image.save(img_bytes, format="PNG")
-            img_bytes.seek(0)
-
-            # Send the image to remove.bg API
-            response = requests.post(
-                "https://api.remove.bg/v1.0/removebg",
-                files={"image_file": ("image.png", img_bytes, "image/png")},
-                data={"size": "auto"},
-                headers={"X-Api-Key": API_KEY},
-            )
+        # Update status to show that it's processing
+        self.status_label.config(text="Removing background... please wait.")
+        source = self.original_image
 
-            # Handle response
-            if response.status_code == requests.codes.ok:
-                # Load the processed image directly from memory
-                result_image = Image.open(io.BytesIO(response.content)).convert("RGBA")
-                
-                self.save_state()
-                self.current_image = result_image.copy()
+        def work(job):
+            data = self.remote.remove_background(remote.image_bytes(source, "PNG"), API_KEY)
+            return Image.open(io.BytesIO(data)).convert("RGBA")
 
-                # Reset sliders, refresh preview
-                self.reset_all_sliders()
-                self.update_image_preview()
+        def done(result_image):
+            self.save_state()
+            self.current_image = result_image
+            self._record(Step.from_image(result_image, "remove_background"))
 
-                # Update status label
-                self.status_label.config(text="✅ Background removed successfully!")
+            # Reset sliders, refresh preview
+            self.reset_all_sliders()
+            self.update_image_preview()
 
-            else:
-                messagebox.showerror("Error", f"Failed to remove background:\n{response.text}")
-                self.status_label.config(text="❌ Background removal failed.")
+            # Update status label
+            self.status_label.config(text="✅ Background removed successfully!")
 
-        except Exception as e:
-            messagebox.showerror("Error", f"An error occurred:\n{e}")
-            self.status_label.config(text="❌ Error during background removal.")
+        def failed(e):
+            messagebox.showerror("Error", f"Failed to remove background:\n{e}")
+            self.status_label.config(text="❌ Background removal failed.")
+
+        self.jobs.submit(work, channel="remove_bg", on_done=done, on_error=failed)
             
     def apply_artistic_filter(self):
         selected_filter = self.filter_var.get().lower().replace(" ", "")
@@ -922,114 +1088,98 @@ class AdvancedImageProcessor(tk.Tk):
         confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply '{selected_filter}'?")
         if not confirm:
             return
-        try:
-            # Show loading overlay while processing
-            self._show_loading_overlay(f"Applying '{selected_filter}' filter...")
-            self.status_label.config(text=f"Applying Picsart effect: {selected_filter}...")
-            self.status_label.update_idletasks()
-
-            # Convert the current image in memory to binary data (JPG)
-            img_buffer = BytesIO()
-            img_to_send = self.current_image.convert("RGB")
-            img_to_send.save(img_buffer, format="JPEG")
-            img_buffer.seek(0)
-
-            url = "https://api.picsart.io/tools/1.0/effects/ai"
-
-            # Prepare multipart form-data payload
-            files = {
-                "image": ("image.jpg", img_buffer, "image/jpeg"),
-            }
-            data = {
-                "effect_name": selected_filter,  # The chosen AI effect (like 'cartoon', 'pastel', etc.)
-                "format": "PNG"
-            }
-            headers = {
-            "accept": "application/json",
-            "X-Picsart-API-key": "paat-sqWPSobBXjxFi8v6AFxA5NbTMmv",
-            }
-            # Send request to Picsart API
-            response = requests.post(url, files=files, data=data, headers=headers, timeout=120)
-            response.raise_for_status()
-            result = response.json()
-
-            # The API returns a URL for the processed image
-            if "data" in result and "url" in result["data"]:
-                image_url = result["data"]["url"]
-            else:
-                raise Exception(f"Unexpected response format:\n{result}")
 
-            # Download the processed image
-            img_response = requests.get(image_url, timeout=60)
-            img_response.raise_for_status()
+        # Show loading overlay while processing
+        self._show_loading_overlay(f"Applying '{selected_filter}' filter...")
+        self.status_label.config(text=f"Applying Picsart effect: {selected_filter}...")
+        source = self.current_image
+
+        def work(job):
+            # The chosen AI effect (like 'cartoon', 'pastel', etc.)
+            data = self.remote.artistic_effect(
+                remote.image_bytes(source.convert("RGB"), "JPEG"),
+                "paat-sqWPSobBXjxFi8v6AFxA5NbTMmv",
+                selected_filter,
+            )
+            return Image.open(BytesIO(data)).convert("RGB")
 
-            # Open and display the image
-            processed_img = Image.open(BytesIO(img_response.content)).convert("RGB")
+        def done(processed_img):
             self.current_image = processed_img
+            self._record(Step.from_image(processed_img, f"artistic:{selected_filter}"))
             self.save_state()
             self.update_image_preview()
             self.status_label.config(text=f"Applied '{selected_filter}' effect successfully.")
             self._update_toolbar_state(True)
 
-        except Exception as e:
+        def failed(e):
             messagebox.showerror("Error", f"Failed to apply filter:\n{e}")
             self.status_label.config(text="Filter application failed.")
 
-        finally:
-            self._hide_loading_overlay()
+        self.jobs.submit(work, on_done=done, on_error=failed, on_finally=self._hide_loading_overlay)
 
     def generate_ai_image(self):
         prompt = simpledialog.askstring("AI Image Generation with Pollinations", "Enter your image prompt:")
         if not prompt:
             return
-        try:
-            self._show_loading_overlay("Generating with Pollinations...")
-            self.status_label.config(text="Generating AI image...")
-            self.status_label.update_idletasks()
-
-            base_url = "https://image.pollinations.ai/prompt/"
-            prompt_encoded = requests.utils.quote(prompt)
-            url = f"{base_url}{prompt_encoded}?width=512&height=512&model=flux"
-            response = requests.get(url, timeout=60)
-            response.raise_for_status()
+        self._show_loading_overlay("Generating with Pollinations...")
+        self.status_label.config(text="Generating AI image...")
 
-            img_data = BytesIO(response.content)
-            img = Image.open(img_data).convert("RGB")
+        def work(job):
+            data = self.remote.generate(prompt, width=512, height=512, model="flux")
+            return Image.open(BytesIO(data)).convert("RGB")
 
+        def done(img):
             self.original_image = img
             self.current_image = img.copy()
-            self.undo_stack.clear()
-            self.redo_stack.clear()
+            self.recipe = Recipe(base=img)
+            self.viewer.reset()
+            self._clear_history()
             self.save_state()
             self.reset_all_sliders()
             self.update_image_preview()
             self.status_label.config(text=f"AI generated image from: '{prompt}'")
             self._update_toolbar_state(True)
-        except Exception as e:
+
+        def failed(e):
             messagebox.showerror("Error", f"Failed to generate image:\n{e}")
             self.status_label.config(text="AI image generation failed.")
-        finally:
-            self._hide_loading_overlay()
+
+        self.jobs.submit(work, on_done=done, on_error=failed, on_finally=self._hide_loading_overlay)
 
     def open_image(self):
         path = filedialog.askopenfilename(
-            filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif;*.tiff")]
+            filetypes=[("Image files", "*.png;*.jpg;*.jpeg;*.bmp;*.gif;*.tiff"),
+                       ("BALR recipe", "*" + SIDECAR_SUFFIX)]
         )
         if not path:
             return
-        try:
-            img = Image.open(path).convert("RGBA")
+        if path.endswith(SIDECAR_SUFFIX):
+            self._open_recipe(path)
+            return
+
+        def work(job):
+            # decode and hash on the worker: both take a while on large files
+            with Image.open(path) as f:
+                img = f.convert("RGBA")
+            return img, cached_digest(path)
+
+        def done(result):
+            img, digest = result
             self.original_image = img
             self.current_image = img.copy()
-            self.undo_stack.clear()
-            self.redo_stack.clear()
+            self.recipe = Recipe(source=path, source_digest=digest)
+            self.viewer.reset()
+            self._clear_history()
             self.save_state()
             self.reset_all_sliders()
             self.update_image_preview()
             self.status_label.config(text=f"Loaded: {os.path.basename(path)} ({img.width}x{img.height})")
             self._update_toolbar_state(True)
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to open image:\n{e}")
+
+        self._show_loading_overlay("Opening image...")
+        self.jobs.submit(work, on_done=done,
+                         on_error=lambda e: messagebox.showerror("Error", f"Failed to open image:\n{e}"),
+                         on_finally=self._hide_loading_overlay)
 
     def save_image(self):
         if self.current_image is None:
@@ -1041,377 +1191,194 @@ class AdvancedImageProcessor(tk.Tk):
         )
         if not path:
             return
-        try:
-            self._show_loading_overlay("Saving image...")
-            img = self.apply_all_adjustments()
+        source = self.current_image
+        params = self._adjustment_params()
+        snapshot = None
+        if self.recipe is not None:
+            if self.recipe.source and same_file(path, self.recipe.source):
+                # saving over the original: keep its pixels, the sidecar gets them as a PNG
+                self.recipe.detach(self.original_image)
+            # sidecar next to the export: the steps so far plus the slider values
+            self.recipe.adjustments = params.to_dict()
+            snapshot = Recipe(self.recipe.source, self.recipe.base, self.recipe.steps,
+                              self.recipe.cursor, self.recipe.adjustments, self.recipe.source_digest)
+            snapshot.base_token = self.recipe.base_token
+
+        def render_and_save(job):
+            if snapshot is not None:
+                snapshot.save(sidecar_path(path))
+            if source.width * source.height > tiles.LARGE_IMAGE_PIXELS:
+                # stream through memory-mapped tiles instead of full-size copies
+                tiled = tiles.TiledImage.from_image(source)
+                out = tiles.render_tiled(tiled, params, cancel=job.is_cancelled)
+                tiled.close()
+                out.save(path)
+                out.close()
+                return
+            result = engine.apply_all_adjustments(engine.to_array(source), params, cancel=job.is_cancelled)
+            img = engine.to_image(result)
             if path.lower().endswith(".jpg") or path.lower().endswith(".jpeg"):
                 img = img.convert("RGB")
             img.save(path)
-            messagebox.showinfo("Success", f"Image saved to:\n{path}")
+
+        self._show_loading_overlay("Saving image...")
+        self.jobs.submit(
+            render_and_save,
+            on_done=lambda _: messagebox.showinfo("Success", f"Image saved to:\n{path}"),
+            on_error=lambda e: messagebox.showerror("Error", f"Failed to save image:\n{e}"),
+            on_finally=self._hide_loading_overlay,
+        )
+
+    def save_preset(self):
+        path = filedialog.asksaveasfilename(
+            defaultextension=".json",
+            filetypes=[("BALR preset", "*.json")]
+        )
+        if not path:
+            return
+        try:
+            self._current_preset().save(path)
+            self.status_label.config(text=f"Preset saved: {os.path.basename(path)}")
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to save image:\n{e}")
-        finally:
-            self._hide_loading_overlay()
+            messagebox.showerror("Error", f"Failed to save preset:\n{e}")
 
     # =========================
     # ADJUSTMENTS PIPELINE
     # =========================
+    def _adjustment_params(self):
+        return engine.AdjustmentParams.from_dict({k: v.get() for k, v in self.adjust_vars.items()})
+
+    def _current_preset(self):
+        return engine.Preset(
+            adjustments=self._adjustment_params(),
+            transform=dict(self.transform_values),
+            perspective=dict(self.perspective_values),
+        )
+
     def apply_all_adjustments(self):
         if self.current_image is None:
             return None
-        img = self.current_image.copy()
-
-        # Exposure
-        exposure = float(self.exposure_var.get())
-        if exposure != 0:
-            factor = np.power(2, exposure / 100)
-            img = ImageEnhance.Brightness(img).enhance(factor)
-
-        # Highlights/Shadows
-        highlights = float(self.highlights_var.get())
-        shadows = float(self.shadows_var.get())
-        if highlights != 0 or shadows != 0:
-            img = self.adjust_highlights_shadows(img, highlights, shadows)
-
-        # Contrast/Brightness
-        contrast = float(self.contrast_var.get())
-        brightness = float(self.brightness_var.get())
-        if contrast != 0:
-            img = ImageEnhance.Contrast(img).enhance(1 + (contrast / 100))
-        if brightness != 0:
-            img = ImageEnhance.Brightness(img).enhance(1 + (brightness / 100))
-
-        # Blacks/Whites
-        blacks = float(self.blacks_var.get())
-        whites = float(self.whites_var.get())
-        if blacks != 0 or whites != 0:
-            img = self.adjust_levels(img, blacks, whites)
-
-        # Color
-        hue_shift = float(self.hue_var.get())
-        tint = float(self.tint_var.get())
-        vibrance = float(self.vibrance_var.get())
-        saturation = float(self.saturation_var.get())
-        temperature = float(self.temperature_var.get())
-
-        if hue_shift != 0:
-            img = self.adjust_hue(img, hue_shift)
-        if tint != 0:
-            img = self.adjust_tint(img, tint)
-        if vibrance != 0:
-            img = self.adjust_vibrance(img, vibrance)
-        if saturation != 0:
-            img = ImageEnhance.Color(img).enhance(1 + (saturation / 100))
-        if temperature != 0:
-            img = self.adjust_temperature(img, temperature)
-
-        # Filters
-        blur = float(self.blur_var.get())
-        noise = float(self.noise_var.get())
-        vignette = float(self.vignette_var.get())
-
-        if blur > 0:
-            img = img.filter(ImageFilter.GaussianBlur(radius=blur))
-        if noise > 0:
-            img = self.add_noise(img, noise)
-        if vignette > 0:
-            img = self.add_vignette(img, vignette / 100)
-
-        return img
+        result = engine.apply_all_adjustments(engine.to_array(self.current_image), self._adjustment_params())
+        return engine.to_image(result)
 
     def update_perspective(self, key, value):
         self.perspective_values[key] = float(value)
         self.apply_perspective(preview=True)
 
+    def preview_perspective(self, key, value):
+        self.perspective_values[key] = float(value)
+        self._preview_geometry()
+
     def apply_perspective(self, preview=False):
-        if self.original_image is None:
+        self._commit_geometry(save=not preview)
+
+    def _preview_geometry(self):
+        # while dragging only the display proxy is warped, with the scaled matrix
+        if self.current_image is None:
             return
-        img = np.array(self.original_image.convert("RGB"))
-        h, w = img.shape[:2]
-        src_pts = np.float32([[0, 0], [w, 0], [0, h], [w, h]])
-        tl_x = self.perspective_values["Top Left X"];     tl_y = self.perspective_values["Top Left Y"]
-        tr_x = self.perspective_values["Top Right X"];    tr_y = self.perspective_values["Top Right Y"]
-        bl_x = self.perspective_values["Bottom Left X"];  bl_y = self.perspective_values["Bottom Left Y"]
-        br_x = self.perspective_values["Bottom Right X"]; br_y = self.perspective_values["Bottom Right Y"]
-        dst_pts = np.float32([
-            [0 + tl_x, 0 + tl_y],
-            [w + tr_x, 0 + tr_y],
-            [0 + bl_x, h + bl_y],
-            [w + br_x, h + br_y],
-        ])
-        M = cv2.getPerspectiveTransform(src_pts, dst_pts)
-        warped = cv2.warpPerspective(img, M, (w, h))
-        result = Image.fromarray(warped).convert("RGBA")
-        self.current_image = result
-        self.update_image_preview(result)
-        if not preview:
-            self.save_state()
+        source = self._geometry_source()
+        transform, perspective = dict(self.transform_values), dict(self.perspective_values)
+        version = self._image_version
 
-    # =========================
-    # ADJUSTMENT HELPERS
-    # =========================
-    def adjust_temperature(self, img, temperature):
-        img_array = np.array(img.convert("RGB"), dtype=np.float32)
-        if temperature > 0:
-            img_array[:, :, 0] = np.clip(img_array[:, :, 0] + temperature * 2.55, 0, 255)
-            img_array[:, :, 1] = np.clip(img_array[:, :, 1] + temperature * 1.27, 0, 255)
-        else:
-            img_array[:, :, 2] = np.clip(img_array[:, :, 2] - temperature * 2.55, 0, 255)
-        return Image.fromarray(img_array.astype("uint8"), mode="RGB").convert("RGBA")
-
-    def adjust_hue(self, img, shift_degrees):
-        img_hsv = img.convert("HSV")
-        img_array = np.array(img_hsv, dtype=np.uint8)
-        shift_pil_units = int(shift_degrees * (255 / 360)) % 256
-        hue_channel = img_array[:, :, 0]
-        new_hue = (hue_channel.astype(np.int16) + shift_pil_units) % 256
-        img_array[:, :, 0] = new_hue.astype(np.uint8)
-        return Image.fromarray(img_array, mode="HSV").convert("RGBA")
-
-    def adjust_tint(self, img, tint_value):
-        img_rgb = img.convert("RGB")
-        img_array = np.array(img_rgb, dtype=np.int16)
-        adj_factor = tint_value / 100.0 * 50
-        img_array[:, :, 0] = np.clip(img_array[:, :, 0] + adj_factor, 0, 255)
-        img_array[:, :, 2] = np.clip(img_array[:, :, 2] + adj_factor, 0, 255)
-        img_array[:, :, 1] = np.clip(img_array[:, :, 1] - adj_factor, 0, 255)
-        return Image.fromarray(img_array.astype("uint8"), mode="RGB").convert("RGBA")
-
-    def adjust_vibrance(self, img, vibrance_value):
-        if vibrance_value == 0:
-            return img
-        img_rgb = img.convert("RGB")
-        factor = vibrance_value / 100.0 * 0.5
-        img_list = img_rgb.getdata()
-
-        def adjust_vibrance_pixel(r, g, b, f):
-            h, s, v = colorsys.rgb_to_hsv(r / 255.0, g / 255.0, b / 255.0)
-            adjustment = f * (1 - s) ** 1.5
-            new_s = np.clip(s + adjustment, 0, 1)
-            r_out, g_out, b_out = colorsys.hsv_to_rgb(h, new_s, v)
-            return int(r_out * 255), int(g_out * 255), int(b_out * 255)
-
-        new_img_list = [adjust_vibrance_pixel(r, g, b, factor) for r, g, b in img_list]
-        new_img = Image.new("RGB", img_rgb.size)
-        new_img.putdata(new_img_list)
-        return new_img.convert("RGBA")
-
-    def adjust_highlights_shadows(self, img, highlights, shadows):
-        img_array = np.array(img.convert("RGB")) / 255.0
-        luminance = 0.2126 * img_array[:, :, 0] + 0.7152 * img_array[:, :, 1] + 0.0722 * img_array[:, :, 2]
-        if shadows != 0:
-            shadow_mask = 1 / (1 + np.exp((luminance - 0.25) / 0.1))
-            shadow_adj = (shadows / 100.0) * shadow_mask * 0.5
-            for i in range(3):
-                img_array[:, :, i] = np.clip(img_array[:, :, i] + shadow_adj, 0, 1)
-        if highlights != 0:
-            highlight_mask = 1 / (1 + np.exp((0.75 - luminance) / 0.1))
-            highlight_adj = (highlights / 100.0) * highlight_mask * 0.5
-            for i in range(3):
-                img_array[:, :, i] = np.clip(img_array[:, :, i] + highlight_adj, 0, 1)
-        return Image.fromarray((img_array * 255).astype(np.uint8), mode="RGB").convert("RGBA")
-
-    def adjust_levels(self, img, blacks, whites):
-        img_array = np.array(img)
-        if blacks != 0:
-            adjustment = blacks / 100 * 50
-            img_array = np.where(img_array < 128, np.clip(img_array + adjustment, 0, 255), img_array)
-        if whites != 0:
-            adjustment = whites / 100 * 50
-            img_array = np.where(img_array > 128, np.clip(img_array + adjustment, 0, 255), img_array)
-        return Image.fromarray(img_array.astype("uint8"), mode=img.mode)
-
-    def add_noise(self, img, amount):
-        arr = np.array(img)
-        noise = np.random.normal(0, amount, arr.shape).astype(np.int16)
-        noisy = np.clip(arr.astype(np.int16) + noise, 0, 255).astype(np.uint8)
-        return Image.fromarray(noisy, mode=img.mode)
-
-    def add_vignette(self, img, strength):
-        width, height = img.size
-        x = np.linspace(-1, 1, width)
-        y = np.linspace(-1, 1, height)
-        X, Y = np.meshgrid(x, y)
-        radius = np.sqrt(X ** 2 + Y ** 2)
-        vignette = 1 - (radius * strength)
-        vignette = np.clip(vignette, 0, 1)
-        img_array = np.array(img).astype(float)
-        for i in range(min(3, img_array.shape[2])):  # apply ke RGB saja
-            img_array[:, :, i] *= vignette
-        return Image.fromarray(img_array.astype("uint8"), mode=img.mode)
+        def render(job):
+            _, arr, scale = source(job)
+            return engine.to_image(engine.apply_geometry(arr, transform, perspective, scale))
+
+        def show(img):
+            if version == self._image_version:
+                self.update_image_preview(img, preview=True)
+
+        self.jobs.submit(render, channel="preview", on_done=show)
+
+    def _commit_geometry(self, save=False):
+        # transform + perspective as one full-resolution warp, off the Tk thread
+        if self.current_image is None:
+            return
+        source = self._geometry_source()
+        transform, perspective = dict(self.transform_values), dict(self.perspective_values)
+        version = self._image_version
+
+        def commit(warped):
+            if version != self._image_version:
+                return
+            self.current_image = engine.to_image(warped)
+            self._record(Step("geometry", {"transform": transform, "perspective": perspective}), warped)
+            self.update_image_preview()
+            if save:
+                self.save_state()
+
+        # a newer commit from any geometry slider supersedes this one
+        self.jobs.submit(lambda job: engine.apply_geometry(source(job)[0], transform, perspective),
+                         channel="geometry", on_done=commit)
 
     # =========================
     # MORPH / FILTERS
     # =========================
-    def apply_morphology(self, operation):
-        if self.current_image is None:
-            return
-        img_array = np.array(self.current_image.convert("RGB"))
+    def _morph_kernel_size(self):
         kernel_size = int(self.kernel_size_var.get())
         if kernel_size < 1:
             kernel_size = 1
         if kernel_size % 2 == 0:
             kernel_size += 1
             self.kernel_size_var.set(kernel_size)
-        kernel = np.ones((kernel_size, kernel_size), np.uint8)
+        return kernel_size
 
-        confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply '{operation}'?")
-        if not confirm:
+    def preview_morphology(self, operation=None):
+        # live on the proxy, kernel scaled to it; nothing is committed here
+        if operation is not None:
+            self.morph_op = operation
+        if self.current_image is None or self.morph_op is None:
             return
+        proxy = self._get_preview_proxy()
+        op, shape = self.morph_op, self.morph_shape_var.get()
+        kernel_size = self._morph_kernel_size()
+        scaled = max(1, int(round(kernel_size * proxy["scale"])))
+        version = self._image_version
+        self.morph_status.config(text=f"Previewing {op} ({shape}, {kernel_size}px)")
+
+        def show(img):
+            if version == self._image_version:
+                self.update_image_preview(img, preview=True)
+
+        self.jobs.submit(lambda job: engine.to_image(engine.apply_morphology(proxy["array"], op, scaled, shape)),
+                         channel="preview", on_done=show)
+
+    def cancel_morphology(self, refresh=True):
+        self.morph_op = None
+        self.morph_status.config(text="Pick an operation to preview")
+        self.jobs.cancel("preview")
+        if refresh:
+            self.update_image_preview()
 
-        self.save_state()
-        result = np.zeros_like(img_array)
-        for i in range(3):
-            channel = img_array[:, :, i]
-            if operation == "erosion":
-                result[:, :, i] = cv2.erode(channel, kernel, iterations=1)
-            elif operation == "dilation":
-                result[:, :, i] = cv2.dilate(channel, kernel, iterations=1)
-            elif operation == "opening":
-                result[:, :, i] = cv2.morphologyEx(channel, cv2.MORPH_OPEN, kernel)
-            elif operation == "closing":
-                result[:, :, i] = cv2.morphologyEx(channel, cv2.MORPH_CLOSE, kernel)
-            elif operation == "gradient":
-                result[:, :, i] = cv2.morphologyEx(channel, cv2.MORPH_GRADIENT, kernel)
-            elif operation == 'mean':
-                result[:,:,i] = cv2.blur(channel, (kernel_size, kernel_size))
-            elif operation == 'median':
-                ksize = kernel_size if kernel_size % 2 == 1 else kernel_size + 1
-                result[:,:,i] = cv2.medianBlur(channel, ksize)
-            elif operation == 'max':
-                kernel = np.ones((kernel_size, kernel_size), np.uint8)
-                result[:,:,i] = cv2.dilate(channel, kernel)
-            elif operation == 'min':
-                kernel = np.ones((kernel_size, kernel_size), np.uint8)
-                result[:,:,i] = cv2.erode(channel, kernel)
-
-        self.current_image = Image.fromarray(result, mode="RGB").convert("RGBA")
-        self.update_image_preview()
-        self._update_toolbar_state()
-
-    def apply_filter(self, filter_name):
+    def apply_morphology(self):
+        if self.current_image is None or self.morph_op is None:
+            return
+        op = self.morph_op
+        title = f"Applying {op.capitalize()}..."
+        kernel_size, shape = self._morph_kernel_size(), self.morph_shape_var.get()
+        self._run_job(title, engine.apply_morphology, op, kernel_size, shape,
+                      on_commit=lambda: self.cancel_morphology(refresh=False),
+                      step=Step("morphology", {"operation": op, "kernel_size": kernel_size, "shape": shape}))
+
+    def apply_filter(self, filter_name, title="Processing..."):
         if self.current_image is None:
             return
-        img = self.current_image
         confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply '{filter_name}'?")
         if not confirm:
             return
 
-        self.save_state()
-        if filter_name == "grayscale":
-            img = ImageOps.grayscale(img).convert("RGBA")
-        elif filter_name == "sepia":
-            img = self.apply_sepia(img)
-        elif filter_name == "edge":
-            img = img.filter(ImageFilter.FIND_EDGES)
-        elif filter_name == "emboss":
-            img = img.filter(ImageFilter.EMBOSS)
-        elif filter_name == "sharpen":
-            img = img.filter(ImageFilter.SHARPEN)
-        elif filter_name == 'sobel':
-            img = self.apply_sobel(img)
-        elif filter_name == 'prewitt':
-            img = self.apply_prewitt(img)
-        elif filter_name == 'laplacian':
-            img = self.apply_laplacian(img)
-
-        self.current_image = img
-        self.update_image_preview()
-        self._update_toolbar_state()
-
-    def apply_sobel(self, img):
-        # Convert to grayscale first
-        img_gray = img.convert('L')
-        img_array = np.array(img_gray, dtype=np.float32)
-
-        # Apply Sobel operators
-        sobel_x = cv2.Sobel(img_array, cv2.CV_64F, 1, 0, ksize=3)
-        sobel_y = cv2.Sobel(img_array, cv2.CV_64F, 0, 1, ksize=3)
-
-        # Calculate magnitude
-        magnitude = np.sqrt(sobel_x**2 + sobel_y**2)
-
-        # Normalize to 0-255
-        magnitude = cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX)
-
-        # Convert back to PIL Image
-        return Image.fromarray(magnitude.astype(np.uint8)).convert('RGBA')
-
-    def apply_prewitt(self, img):
-        # Convert to grayscale first
-        img_gray = img.convert('L')
-        img_array = np.array(img_gray, dtype=np.float32)
-
-        # Prewitt kernels
-        kernel_x = np.array([[-1, 0, 1], [-1, 0, 1], [-1, 0, 1]])
-        kernel_y = np.array([[-1, -1, -1], [0, 0, 0], [1, 1, 1]])
-
-        # Apply Prewitt operators
-        prewitt_x = cv2.filter2D(img_array, cv2.CV_64F, kernel_x)
-        prewitt_y = cv2.filter2D(img_array, cv2.CV_64F, kernel_y)
-
-        # Calculate magnitude
-        magnitude = np.sqrt(prewitt_x**2 + prewitt_y**2)
-
-        # Normalize to 0-255
-        magnitude = cv2.normalize(magnitude, None, 0, 255, cv2.NORM_MINMAX)
-
-        # Convert back to PIL Image
-        return Image.fromarray(magnitude.astype(np.uint8)).convert('RGBA')
-
-    def apply_laplacian(self, img):
-        # Convert to grayscale first
-        img_gray = img.convert('L')
-        img_array = np.array(img_gray, dtype=np.float32)
-
-        # Apply Laplacian
-        laplacian = cv2.Laplacian(img_array, cv2.CV_64F, ksize=3)
-
-        # Take absolute value and normalize
-        laplacian = np.absolute(laplacian)
-        laplacian = cv2.normalize(laplacian, None, 0, 255, cv2.NORM_MINMAX)
-
-        # Convert back to PIL Image
-        return Image.fromarray(laplacian.astype(np.uint8)).convert('RGBA')
-    
-    def apply_sepia(self, img):
-        img_array = np.array(img.convert("RGB"))
-        sepia_filter = np.array([[0.393, 0.769, 0.189],
-                                 [0.349, 0.686, 0.168],
-                                 [0.272, 0.534, 0.131]])
-        sepia_img = img_array.dot(sepia_filter.T)
-        sepia_img = np.clip(sepia_img, 0, 255).astype(np.uint8)
-        return Image.fromarray(sepia_img, mode="RGB").convert("RGBA")
+        self._run_job(title, engine.apply_filter, filter_name, step=Step("filter", {"name": filter_name}))
 
     def update_transform(self, transform_type, value):
         self.transform_values[transform_type] = float(value)
         self.apply_transforms()
 
+    def preview_transform(self, transform_type, value):
+        self.transform_values[transform_type] = float(value)
+        self._preview_geometry()
+
     def apply_transforms(self):
-        if self.original_image is None:
-            return
-        img = self.original_image.copy()
-        width, height = img.size
-
-        resize_factor = self.transform_values["resize"] / 100.0
-        if resize_factor != 1.0:
-            new_width = int(width * resize_factor)
-            new_height = int(height * resize_factor)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        rotate_angle = self.transform_values["rotate"]
-        if rotate_angle != 0:
-            img = img.rotate(rotate_angle, expand=True, resample=Image.Resampling.BICUBIC)
-
-        scale_x = self.transform_values["scale_x"] / 100.0
-        scale_y = self.transform_values["scale_y"] / 100.0
-        if scale_x != 1.0 or scale_y != 1.0:
-            new_width = int(img.width * scale_x)
-            new_height = int(img.height * scale_y)
-            img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-
-        self.current_image = img
-        self.update_image_preview()
+        self._commit_geometry()
 
     # =========================
     # INTERACTIVE TOOLS
@@ -1475,6 +1442,7 @@ class AdvancedImageProcessor(tk.Tk):
 
             if rx2 - rx1 > 10 and ry2 - ry1 > 10:
                 self.current_image = self.current_image.crop((rx1, ry1, rx2, ry2))
+                self._record(Step("crop", {"box": [rx1, ry1, rx2, ry2]}), engine.to_array(self.current_image))
                 self.update_image_preview()
                 crop_window.destroy()
                 self._update_toolbar_state()
@@ -1498,15 +1466,16 @@ class AdvancedImageProcessor(tk.Tk):
         draw_window.geometry("900x700")
         draw_window.configure(bg="#1b2230")
 
-        working_img = self.current_image.convert("RGBA").copy()
-        preview_img = working_img.copy()
-        preview_img.thumbnail((800, 600), Image.Resampling.LANCZOS)
+        working_img = self.current_image
+        # the window works on a preview-size composite; full res only in _apply_direct_drawing
+        base_preview = engine.to_image(self._get_pyramid().fit((800, 600))).copy()
+        preview_img = base_preview.copy()
         self.draw_preview_img = preview_img
         self.draw_preview_tk = ImageTk.PhotoImage(preview_img)
 
         canvas = tk.Canvas(draw_window, bg="#273449", cursor="crosshair", highlightthickness=0)
         canvas.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
-        canvas.create_image(450, 350, image=self.draw_preview_tk, anchor=tk.CENTER)
+        img_item = canvas.create_image(450, 350, image=self.draw_preview_tk, anchor=tk.CENTER)
 
         toolbar = ttk.Frame(draw_window)
         toolbar.pack(fill=tk.X, pady=5)
@@ -1516,12 +1485,15 @@ class AdvancedImageProcessor(tk.Tk):
         self.brush_size = tk.IntVar(value=3)
         self.text_to_add = tk.StringVar(value="Sample Text")
         self.text_size = tk.IntVar(value=36)
+        self.fill_tolerance = tk.IntVar(value=0)
 
         for tool in ["freehand", "line", "rectangle", "circle", "text", "fill"]:
             ttk.Radiobutton(toolbar, text=tool.title(), variable=self.drawing_tool, value=tool).pack(side=tk.LEFT, padx=4)
 
         ttk.Label(toolbar, text="Brush:").pack(side=tk.LEFT, padx=(8, 0))
         ttk.Spinbox(toolbar, from_=1, to=50, textvariable=self.brush_size, width=4).pack(side=tk.LEFT, padx=4)
+        ttk.Label(toolbar, text="Tolerance:").pack(side=tk.LEFT, padx=(8, 0))
+        ttk.Spinbox(toolbar, from_=0, to=255, textvariable=self.fill_tolerance, width=4).pack(side=tk.LEFT, padx=4)
 
         color_swatch = tk.Canvas(toolbar, width=28, height=18, highlightthickness=1)
         color_swatch.create_rectangle(0, 0, 28, 18, fill=self.draw_color, outline="black")
@@ -1533,68 +1505,79 @@ class AdvancedImageProcessor(tk.Tk):
         ttk.Label(toolbar, text="Text size:").pack(side=tk.LEFT, padx=(6, 0))
         ttk.Spinbox(toolbar, from_=8, to=200, textvariable=self.text_size, width=5).pack(side=tk.LEFT, padx=4)
 
+        # strokes are recorded as vectors in full-res coordinates and drawn
+        # onto a preview-size layer; Apply replays them once at full size
+        annotation = annotate.Annotation(working_img.size)
+        preview_layer = Image.new("RGBA", preview_img.size, (0, 0, 0, 0))
+        scale = preview_img.width / working_img.width
+
         ttk.Button(toolbar, text="Apply", style="Accent.TButton",
-                   command=lambda: self._apply_direct_drawing(working_img, draw_window)
+                   command=lambda: self._apply_direct_drawing(draw_window, annotation)
                    ).pack(side=tk.RIGHT, padx=6)
         ttk.Button(toolbar, text="Cancel", style="Accent.TButton", command=draw_window.destroy).pack(side=tk.RIGHT)
 
-        draw_layer = Image.new("RGBA", working_img.size, (0, 0, 0, 0))
-        draw = ImageDraw.Draw(draw_layer)
-
-        scale_x = working_img.width / preview_img.width
-        scale_y = working_img.height / preview_img.height
-
-        self._draw_layer = draw_layer
-        self._working_img = working_img
         self.last_point = None
         self._refresh_pending = False
         self._temp_shape = None
+        self._stroke = None
 
         def canvas_to_image_coords(x, y):
             offset_x = (canvas.winfo_width() - preview_img.width) // 2
             offset_y = (canvas.winfo_height() - preview_img.height) // 2
-            return int((x - offset_x) * scale_x), int((y - offset_y) * scale_y)
+            return int((x - offset_x) / scale), int((y - offset_y) / scale)
 
-        def refresh_preview_debounced():
+        def composite_dirty(box):
+            # re-composite just the preview pixels under a preview-space box (x0, y0, x1, y1)
+            x0, y0 = max(0, box[0]), max(0, box[1])
+            x1, y1 = min(preview_img.width, box[2]), min(preview_img.height, box[3])
+            if x1 <= x0 or y1 <= y0:
+                return
+            rect = (x0, y0, x1, y1)
+            preview_img.paste(Image.alpha_composite(base_preview.crop(rect), preview_layer.crop(rect)), (x0, y0))
+
+        def refresh_preview_debounced(box=None):
+            if box is not None:
+                composite_dirty(box)
             if self._refresh_pending:
                 return
             self._refresh_pending = True
 
             def _update():
-                merged = Image.alpha_composite(working_img, draw_layer)
-                preview = merged.copy()
-                preview.thumbnail((800, 600), Image.Resampling.LANCZOS)
-                self.draw_preview_tk = ImageTk.PhotoImage(preview)
-                canvas.delete("all")
-                canvas.create_image(canvas.winfo_width() / 2, canvas.winfo_height() / 2,
-                                    image=self.draw_preview_tk, anchor=tk.CENTER)
+                self.draw_preview_tk.paste(preview_img)
+                canvas.coords(img_item, canvas.winfo_width() / 2, canvas.winfo_height() / 2)
                 self._refresh_pending = False
 
-            canvas.after(50, _update)
+            canvas.after(30, _update)
+
+        def record(cmd):
+            annotation.add(cmd)
+            box = annotate.draw_command(preview_layer, cmd, scale)
+            if box is not None:
+                refresh_preview_debounced(box)
 
         def on_press(e):
             self.last_point = (e.x, e.y)
             tool = self.drawing_tool.get()
+            point = canvas_to_image_coords(e.x, e.y)
             if tool == "text":
-                ix, iy = canvas_to_image_coords(e.x, e.y)
-                font = self._get_font(self.text_size.get())
-                draw.text((ix, iy), self.text_to_add.get(), fill=self.draw_color, font=font)
-                refresh_preview_debounced()
+                record(annotate.Command("text", [point], self.draw_color,
+                                        text=self.text_to_add.get(), size=self.text_size.get()))
             elif tool == "fill":
-                ix, iy = canvas_to_image_coords(e.x, e.y)
-                self._bucket_fill(draw_layer, ix, iy, self.draw_color)
-                refresh_preview_debounced()
+                record(annotate.Command("fill", [point], self.draw_color, tolerance=self.fill_tolerance.get()))
+            elif tool == "freehand":
+                self._stroke = annotation.add(annotate.Command("stroke", [point], self.draw_color,
+                                                               width=self.brush_size.get()))
 
         def on_drag(e):
             tool = self.drawing_tool.get()
             if not self.last_point:
                 return
-            if tool == "freehand":
-                x1, y1 = canvas_to_image_coords(*self.last_point)
-                x2, y2 = canvas_to_image_coords(e.x, e.y)
-                draw.line((x1, y1, x2, y2), fill=self.draw_color, width=self.brush_size.get())
+            if tool == "freehand" and self._stroke is not None:
+                self._stroke.points.append(canvas_to_image_coords(e.x, e.y))
                 self.last_point = (e.x, e.y)
-                refresh_preview_debounced()
+                # only the newest segment is rasterised
+                start = len(self._stroke.points) - 1
+                refresh_preview_debounced(annotate.draw_command(preview_layer, self._stroke, scale, start))
             elif tool in ("rectangle", "circle", "line"):
                 if self._temp_shape:
                     canvas.delete(self._temp_shape)
@@ -1613,19 +1596,15 @@ class AdvancedImageProcessor(tk.Tk):
 
         def on_release(e):
             tool = self.drawing_tool.get()
-            if tool in ("rectangle", "circle", "line"):
-                x1, y1 = canvas_to_image_coords(*self.last_point)
-                x2, y2 = canvas_to_image_coords(e.x, e.y)
-                if tool == "rectangle":
-                    draw.rectangle([x1, y1, x2, y2], outline=self.draw_color, width=self.brush_size.get())
-                elif tool == "circle":
-                    draw.ellipse([x1, y1, x2, y2], outline=self.draw_color, width=self.brush_size.get())
-                elif tool == "line":
-                    draw.line([x1, y1, x2, y2], fill=self.draw_color, width=self.brush_size.get())
-                refresh_preview_debounced()
+            if tool in ("rectangle", "circle", "line") and self.last_point:
+                kind = "ellipse" if tool == "circle" else tool
+                record(annotate.Command(kind, [canvas_to_image_coords(*self.last_point),
+                                               canvas_to_image_coords(e.x, e.y)],
+                                        self.draw_color, width=self.brush_size.get()))
                 if self._temp_shape:
                     canvas.delete(self._temp_shape)
             self.last_point = None
+            self._stroke = None
 
         canvas.bind("<ButtonPress-1>", on_press)
         canvas.bind("<B1-Motion>", on_drag)
@@ -1640,83 +1619,171 @@ class AdvancedImageProcessor(tk.Tk):
                 swatch_widget.delete("all")
                 swatch_widget.create_rectangle(0, 0, 28, 18, fill=self.draw_color, outline="black")
 
-    def _get_font(self, size):
-        candidates = ["arial.ttf", "DejaVuSans.ttf", "LiberationSans-Regular.ttf"]
-        for f in candidates:
-            try:
-                return ImageFont.truetype(f, size)
-            except Exception:
-                continue
-        return ImageFont.load_default()
-
-    def _apply_direct_drawing(self, working_img, window):
-        if hasattr(self, "_draw_layer"):
-            merged = Image.alpha_composite(working_img.convert("RGBA"), self._draw_layer.convert("RGBA"))
-            self.current_image = merged
-            self.update_image_preview()
-            self.save_state()
-            self._update_toolbar_state()
-            window.destroy()
-
-    def _bucket_fill(self, img, x, y, color):
-        pixels = np.array(img)  # (h, w, 4)
-        h, w = pixels.shape[:2]
-        if not (0 <= x < w and 0 <= y < h):
+    def _apply_direct_drawing(self, window, annotation):
+        window.destroy()
+        if not annotation.commands:
             return
-        target = pixels[y, x].copy()
-        fill_rgb = [int(color[i:i + 2], 16) for i in (1, 3, 5)]
-        fill = np.array(fill_rgb + [255], dtype=np.uint8)
-        if np.all(target == fill):
-            return
-        mask = np.zeros((h, w), dtype=bool)
-        stack = [(x, y)]
-        while stack:
-            cx, cy = stack.pop()
-            if 0 <= cx < w and 0 <= cy < h and not mask[cy, cx] and np.all(pixels[cy, cx] == target):
-                mask[cy, cx] = True
-                stack.extend([(cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)])
-        pixels[mask] = fill
-        img.paste(Image.fromarray(pixels, "RGBA"))
+        # the only full-resolution rasterisation: replay the command list once
+        self._run_job("Applying drawing...",
+                      lambda arr: engine.to_array(annotation.composite(engine.to_image(arr))), save="after",
+                      step=Step("annotate", {"annotation": annotation.to_dict()}))
 
     def reflect(self, direction):
         if self.current_image is None:
             return
         self.save_state()
-        if direction == "horizontal":
-            self.current_image = ImageOps.mirror(self.current_image)
-        elif direction == "vertical":
-            self.current_image = ImageOps.flip(self.current_image)
+        result = engine.reflect(engine.to_array(self.current_image), direction)
+        self.current_image = engine.to_image(result)
+        self._record(Step("reflect", {"direction": direction}), result)
         self.update_image_preview()
         self._update_toolbar_state()
 
+    # =========================
+    # PREVIEW PROXY
+    # =========================
+    @property
+    def current_image(self):
+        return self._current_image
+
+    @current_image.setter
+    def current_image(self, img):
+        # every edit lands here, so bump the version and drop the stale proxy
+        self._current_image = img
+        self._image_version = getattr(self, "_image_version", 0) + 1
+        self._preview_proxy = None
+        self._pyramid = None
+
+    def _preview_box(self):
+        try:
+            max_display_width = max(100, self.center_frame.winfo_width() - 40)
+            max_display_height = max(100, self.center_frame.winfo_height() - 40)
+        except Exception:
+            max_display_width = 800
+            max_display_height = 600
+        return max_display_width, max_display_height
+
+    def _get_pyramid(self):
+        """Mipmap pyramid of current_image, built once per image version."""
+        if self._pyramid is None:
+            self._pyramid = Pyramid(engine.to_array(self.current_image))
+        return self._pyramid
+
+    def _get_preview_proxy(self):
+        """Display-sized RGBA array of current_image, built once per image version."""
+        box = self._preview_box()
+        proxy = self._preview_proxy
+        if proxy is None or (proxy["scale"] < 1 and (box[0] > proxy["box"][0] or box[1] > proxy["box"][1])):
+            pyramid = self._get_pyramid()
+            arr = pyramid.fit(box)
+            proxy = {
+                "box": box,
+                "array": arr,
+                "scale": arr.shape[1] / pyramid.width,
+            }
+            self._preview_proxy = proxy
+        return proxy
+
+    def _geometry_source(self):
+        """
+        Called on the Tk thread; returns ``source(job)``, which a worker
+        calls for (full, proxy, scale) of the image the geometry sliders
+        warp: the current image, or while the last recipe step is a
+        geometry step being tweaked, the image before it (so warps never
+        compound). That prefix is replayed on the worker when it isn't cached.
+        """
+        box = self._preview_box()
+        if self._trailing_geometry():
+            prefix = self.recipe.prefix(self.recipe.cursor - 1)
+
+            def source(job):
+                # usually a cache hit: the prefix was cached when it was committed
+                arr = prefix.render(cache=self._recipe_cache, cancel=job.is_cancelled)
+                cached = self._geometry_pyramid
+                if cached is None or cached[0] is not arr:
+                    cached = (arr, Pyramid(arr))
+                    self._geometry_pyramid = cached
+                return self._fit_geometry(cached[1], box)
+        else:
+            pyramid = self._get_pyramid()
+
+            def source(job):
+                return self._fit_geometry(pyramid, box)
+        return source
+
+    @staticmethod
+    def _fit_geometry(pyramid, box):
+        proxy = pyramid.fit(box)
+        return pyramid.level(0), proxy, proxy.shape[1] / pyramid.width
+
+    def _viewer_pyramid(self):
+        return self._get_pyramid() if self.current_image is not None else None
+
+    def _roi_renderer(self, scale):
+        # zoomed view: adjustments run on the visible crop only, with the
+        # whole-image contrast pivot taken from the proxy
+        params = self._adjustment_params().scaled(scale)
+        luma_mean = tiles.global_luma_mean(self._get_preview_proxy()["array"], params)
+
+        def render(arr, frame, cancel):
+            return engine.apply_all_adjustments(arr, params, cancel=cancel, luma_mean=luma_mean, frame=frame)
+
+        return render, tiles.pipeline_halo(params)
+
     def _adjust_preview(self, value=None):
+        # slider feedback runs on the proxy; full resolution only in save_image
         if self.current_image is None:
             return
-        img = self.apply_all_adjustments()
-        self.update_image_preview(img)
+        if self.viewer.zoomed:
+            # zoomed in, the viewer re-renders the visible region at pyramid resolution
+            self.viewer.preview = None
+            self.viewer.refresh()
+            return
+        proxy = self._get_preview_proxy()
+        params = self._adjustment_params().scaled(proxy["scale"])
+        version = self._image_version
+        source_key = ("proxy", version, proxy["box"])
+
+        def render(job):
+            result = engine.apply_all_adjustments(proxy["array"], params, self._stage_cache, source_key,
+                                                  cancel=job.is_cancelled)
+            return engine.to_image(result)
+
+        def show(img):
+            if version == self._image_version:
+                self.update_image_preview(img)
 
-    def update_image_preview(self, img=None):
+        # a newer slider tick cancels the render still in flight
+        self.jobs.submit(render, channel="preview", on_done=show)
+
+    def update_image_preview(self, img=None, preview=False):
         if img is None:
             img = self.current_image
         if img is None:
             return
-        try:
-            max_display_width = max(100, self.center_frame.winfo_width() - 40)
-            max_display_height = max(100, self.center_frame.winfo_height() - 40)
-        except Exception:
-            max_display_width = 800
-            max_display_height = 600
+        box = self._preview_box()
 
-        display_img = img.copy()
-        display_img.thumbnail((max_display_width, max_display_height), Image.Resampling.LANCZOS)
-        self.preview_image_tk = ImageTk.PhotoImage(display_img)
-        self.image_label.configure(image=self.preview_image_tk)
+        with profiling.span("update_image_preview", "display"):
+            if img is self.current_image:
+                # nearest pyramid level + a small resize; no full-size copy per refresh
+                with profiling.span("pyramid fit", "display"):
+                    display_img = engine.to_image(self._get_pyramid().fit(box))
+            else:
+                with profiling.span("thumbnail", "display"):
+                    display_img = img.copy()
+                    display_img.thumbnail(box, Image.Resampling.LANCZOS)
+            # a tool preview stays up while zoomed in; the viewer shows its visible region
+            self.viewer.preview = img if preview else None
+            if self.viewer.zoomed and self.current_image is not None:
+                self.viewer.refresh()
+            else:
+                self.viewer.show(display_img)
 
-        self._update_histogram(img)
+            self._update_histogram(display_img)
 
     def reset_image(self):
         if self.original_image is not None:
             self.current_image = self.original_image.copy()
+            self._set_recipe_cursor(0)
             self.reset_all_sliders()
             self.update_image_preview()
             self._update_toolbar_state()
@@ -1730,20 +1797,20 @@ class AdvancedImageProcessor(tk.Tk):
                 entry.insert(0, str(default))
             except Exception:
                 pass
-        for var in [
-            self.exposure_var, self.highlights_var, self.shadows_var, self.contrast_var,
-            self.brightness_var, self.blacks_var, self.whites_var, self.hue_var, self.tint_var,
-            self.saturation_var, self.temperature_var, self.vibrance_var, self.blur_var,
-            self.noise_var, self.vignette_var
-        ]:
-            var.set(0)
+        defaults = engine.AdjustmentParams().to_dict()
+        for key, var in self.adjust_vars.items():
+            var.set(defaults[key])
         for k in self.perspective_values:
             self.perspective_values[k] = 0.0
 
     # =========================
     # FREQUENCY DOMAIN
     # =========================
-    def _apply_fft(self):
+    def _full_spectrum(self, arr, version, color):
+        # forward DFT once per image version; runs on a worker
+        return self._spectra.get(("full", version), arr, color)
+
+    def _apply_fft(self, title="Computing FFT..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
@@ -1752,17 +1819,11 @@ class AdvancedImageProcessor(tk.Tk):
         if not confirm:
             return
         
-        img_gray = self.current_image.convert("L")
-        arr = np.array(img_gray)
-        f = np.fft.fft2(arr)
-        fshift = np.fft.fftshift(f)
-        magnitude_spectrum = 20 * np.log(np.abs(fshift) + 1)
-        mag_img = Image.fromarray(np.uint8(magnitude_spectrum / np.max(magnitude_spectrum) * 255))
-        self.current_image = mag_img.convert("RGBA")
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        version, color = self._image_version, self.freq_color_var.get()
+        self._run_job(title, lambda arr: self._full_spectrum(arr, version, color).magnitude(), save=None,
+                      step=Step("frequency", {"mode": "magnitude", "color": color}))
 
-    def _apply_ifft(self):
+    def _apply_ifft(self, title="Computing Inverse FFT..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
@@ -1770,100 +1831,72 @@ class AdvancedImageProcessor(tk.Tk):
         confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply 'inverse fourier transform'?")
         if not confirm:
             return
-        img_gray = self.current_image.convert("L")
-        arr = np.array(img_gray)
-        f = np.fft.fft2(arr)
-        fshift = np.fft.fftshift(f)
-        ishift = np.fft.ifftshift(fshift)
-        img_back = np.fft.ifft2(ishift)
-        img_back = np.abs(img_back)
-        result = Image.fromarray(np.uint8(img_back))
-        self.current_image = result.convert("RGBA")
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
-
-    def _apply_high_pass(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "No image loaded!")
-            return
-
-        confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply 'High Pass'?")
-        if not confirm:
+        version, color = self._image_version, self.freq_color_var.get()
+        self._run_job(title, lambda arr: self._full_spectrum(arr, version, color).inverse(), save=None,
+                      step=Step("frequency", {"mode": "inverse", "color": color}))
+
+    def _freq_cutoff(self, scale=1.0):
+        # slider is % of Nyquist at full size; a proxy sees the same detail at 1/scale the frequency
+        return float(self.freq_radius_var.get()) / 100 * 0.5 / scale
+
+    def preview_pass_filter(self, mode=None):
+        # re-filters the cached proxy spectrum; only the inverse DFT runs per tick
+        if mode is not None:
+            self.freq_mode = mode
+        if self.current_image is None or self.freq_mode is None:
             return
-        
-        img_gray = self.current_image.convert("L")
-        arr = np.array(img_gray)
-        h, w = arr.shape
-        f = np.fft.fft2(arr)
-        fshift = np.fft.fftshift(f)
-
-        mask = np.ones((h, w), np.uint8)
-        r = max(1, min(h, w) // 20)
-        crow, ccol = h // 2, w // 2
-        mask[crow - r:crow + r, ccol - r:ccol + r] = 0
-
-        fshift = fshift * mask
-        img_back = np.fft.ifft2(np.fft.ifftshift(fshift))
-        img_back = np.abs(img_back)
-        result = Image.fromarray(np.uint8(np.clip(img_back, 0, 255)))
-        self.save_state()
-        self.current_image = result.convert("RGBA")
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        proxy = self._get_preview_proxy()
+        version = self._image_version
+        key = ("proxy", version, proxy["box"])
+        color, shape, high = self.freq_color_var.get(), self.freq_shape_var.get(), self.freq_mode == "high"
+        cutoff = self._freq_cutoff(proxy["scale"])
+        self.freq_status.config(text=f"Previewing {self.freq_mode} pass ({shape}, "
+                                     f"{float(self.freq_radius_var.get()):.0f}%)")
+
+        def render(job):
+            spectrum = self._spectra.get(key, proxy["array"], color)
+            return engine.to_image(spectrum.filter(cutoff, shape, high))
+
+        def show(img):
+            if version == self._image_version:
+                self.update_image_preview(img, preview=True)
+
+        self.jobs.submit(render, channel="preview", on_done=show)
+
+    def cancel_pass_filter(self, refresh=True):
+        self.freq_mode = None
+        self.freq_status.config(text="Pick a filter to preview")
+        self.jobs.cancel("preview")
+        if refresh:
+            self.update_image_preview()
 
-    def _apply_low_pass(self):
-        if self.current_image is None:
-            messagebox.showwarning("Warning", "No image loaded!")
+    def apply_pass_filter(self):
+        if self.current_image is None or self.freq_mode is None:
             return
-
-        confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply 'low pass'?")
-        if not confirm:
-            return
-        img_gray = self.current_image.convert("L")
-        arr = np.array(img_gray)
-        h, w = arr.shape
-        f = np.fft.fft2(arr)
-        fshift = np.fft.fftshift(f)
-
-        mask = np.zeros((h, w), np.uint8)
-        r = max(1, min(h, w) // 20)
-        crow, ccol = h // 2, w // 2
-        mask[crow - r:crow + r, ccol - r:ccol + r] = 1
-
-        fshift = fshift * mask
-        img_back = np.fft.ifft2(np.fft.ifftshift(fshift))
-        img_back = np.abs(img_back)
-        result = Image.fromarray(np.uint8(np.clip(img_back, 0, 255)))
-        self.current_image = result.convert("RGBA")
-        self.save_state()
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        version = self._image_version
+        color, shape, high = self.freq_color_var.get(), self.freq_shape_var.get(), self.freq_mode == "high"
+        cutoff = self._freq_cutoff()
+        title = "Applying High Pass..." if high else "Applying Low Pass..."
+        self._run_job(title, lambda arr: self._full_spectrum(arr, version, color).filter(cutoff, shape, high),
+                      on_commit=lambda: self.cancel_pass_filter(refresh=False),
+                      step=Step("frequency", {"mode": "filter", "cutoff": cutoff, "shape": shape,
+                                              "high": high, "color": color}))
 
     # =========================
     # SLIDER HELPER
     # =========================
-    def _add_slider_with_entry(self, parent, label, key, min_val, max_val, default, command):
-        """Bikin baris kontrol: Label + Slider + Entry, sinkron + debounce."""
+    def _add_slider_with_entry(self, parent, label, key, min_val, max_val, default, command, live=None):
+        """
+        Bikin baris kontrol: Label + Slider + Entry, sinkron + debounce.
+        ``command`` runs once the value settles; ``live`` (optional) runs while
+        dragging, at most once per frame.
+        """
         frame = ttk.Frame(parent)
         frame.pack(fill=tk.X, padx=10, pady=6)
         ttk.Label(frame, text=label).pack(anchor="w")
 
         key_to_var = {
-            "exposure": self.exposure_var,
-            "highlights": self.highlights_var,
-            "shadows": self.shadows_var,
-            "contrast": self.contrast_var,
-            "brightness": self.brightness_var,
-            "blacks": self.blacks_var,
-            "whites": self.whites_var,
-            "hue": self.hue_var,
-            "tint": self.tint_var,
-            "saturation": self.saturation_var,
-            "temperature": self.temperature_var,
-            "vibrance": self.vibrance_var,
-            "blur": self.blur_var,
-            "noise": self.noise_var,
-            "vignette": self.vignette_var,
+            **self.adjust_vars,
             "resize": tk.DoubleVar(value=self.transform_values["resize"]),
             "rotate": tk.DoubleVar(value=self.transform_values["rotate"]),
             "scale_x": tk.DoubleVar(value=self.transform_values["scale_x"]),
@@ -1902,6 +1935,8 @@ class AdvancedImageProcessor(tk.Tk):
             v = max(min(v, max_val), min_val)
             entry.delete(0, tk.END)
             entry.insert(0, f"{int(v) if float(v).is_integer() else v}")
+            if live is not None:
+                self._throttle(key, lambda: live(var.get()))
 
         var.trace_add("write", _on_var_change)
 
@@ -1923,11 +1958,25 @@ class AdvancedImageProcessor(tk.Tk):
         self.slider_widgets[key] = (slider, entry, var, default)
         return var
 
+    def _throttle(self, key, fn, ms=33):
+        """Run ``fn`` at most every ``ms`` (~30 fps); the latest call wins."""
+        self._throttle_pending[key] = fn
+        if key in self._throttle_after_ids:
+            return
+
+        def fire():
+            del self._throttle_after_ids[key]
+            pending = self._throttle_pending.pop(key, None)
+            if pending is not None:
+                pending()
+
+        self._throttle_after_ids[key] = self.after(ms, fire)
+
     # =========================
     # ENHANCEMENT
     # =========================
 
-    def _sharpen_image(self):
+    def _sharpen_image(self, title="Sharpening..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
@@ -1936,26 +1985,18 @@ class AdvancedImageProcessor(tk.Tk):
         if not confirm:
             return
         
-        img_sharp = self.current_image.filter(ImageFilter.SHARPEN)
-        self.current_image = img_sharp.convert("RGBA")
-        self.save_state()
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        self._run_job(title, engine.sharpen, save="after", step=Step("sharpen"))
 
-    def _denoise_image(self):
+    def _denoise_image(self, title="Denoising..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
         confirm = messagebox.askyesno("Apply Filter", f"Are you sure you want to apply 'denoise'?")
         if not confirm:
             return
-        img_denoised = self.current_image.filter(ImageFilter.GaussianBlur(radius=1.5))
-        self.current_image = img_denoised.convert("RGBA")
-        self.save_state()
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        self._run_job(title, engine.denoise, save="after", step=Step("denoise"))
 
-    def _boost_detail(self):
+    def _boost_detail(self, title="Boosting Detail..."):
         if self.current_image is None:
             messagebox.showwarning("Warning", "No image loaded!")
             return
@@ -1963,22 +2004,43 @@ class AdvancedImageProcessor(tk.Tk):
         if not confirm:
             return
         
-        img_detail = self.current_image.filter(ImageFilter.DETAIL)
-        self.current_image = img_detail.convert("RGBA")
-        self.save_state()
-        self.update_image_preview(self.current_image)
-        self._update_toolbar_state()
+        self._run_job(title, engine.boost_detail, save="after", step=Step("boost_detail"))
 
     # =========================
     # OVERLAY (global method)
     # =========================
-    def _with_overlay(self, fn, *args, title="Processing..."):
-        try:
-            self._show_loading_overlay(title)
-            self.update_idletasks()
-            return fn(*args)
-        finally:
-            self._hide_loading_overlay()
+    def _run_job(self, title, fn, *args, save="before", on_commit=None, step=None):
+        """
+        Run ``fn(array, *args)`` on a worker behind the overlay, then commit
+        the result on the Tk thread. ``save`` is when the undo snapshot is
+        taken: "before", "after" or None. ``step`` is the recipe Step that
+        reproduces the edit.
+        """
+        source = self.current_image
+        version = self._image_version
+
+        def commit(result):
+            if version != self._image_version:
+                return  # image changed underneath us; drop the stale result
+            if save == "before":
+                self.save_state()
+            self.current_image = engine.to_image(result)
+            if step is not None:
+                self._record(step, result)
+            if save == "after":
+                self.save_state()
+            if on_commit is not None:
+                on_commit()
+            self.update_image_preview()
+            self._update_toolbar_state()
+
+        self._show_loading_overlay(title)
+        self.jobs.submit(
+            lambda job: fn(engine.to_array(source), *args),
+            on_done=commit,
+            on_error=lambda e: messagebox.showerror("Error", f"{title.rstrip('.')} failed:\n{e}"),
+            on_finally=self._hide_loading_overlay,
+        )
 
     def _show_loading_overlay(self, text="Processing..."):
         if self._overlay is not None:
@@ -2090,7 +2152,11 @@ class AdvancedImageProcessor(tk.Tk):
     # MAIN LOOP
     # =========================
     def run(self):
-        self.mainloop()
+        try:
+            self.mainloop()
+        finally:
+            self.jobs.shutdown()
+            self.remote.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,112 @@
+"""
+Per-stage timing spans, exportable as a Chrome trace.
+
+Code wraps a stage in ``with profiling.span("vibrance", "pipeline"):`` and
+the span is recorded as one complete event (name, category, thread, start,
+duration, args) in a bounded ring buffer. Recording costs two perf_counter
+calls per span, so it stays on for whole sessions; set ``BALR_TRACE=0`` to
+turn it off.
+
+``tracer.export(path)`` writes the buffer in the Trace Event format that
+chrome://tracing and https://ui.perfetto.dev open; ``tracer.summary()``
+gives the latest and mean duration of each span for the editor's timing
+HUD. Nothing here touches Tk.
+"""
+import json
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "cat", "args", "start")
+
+    def __init__(self, tracer, name, cat, args):
+        self.tracer = tracer
+        self.name = name
+        self.cat = cat
+        self.args = args      # may be filled in while the span is open
+        self.start = None
+
+    def __enter__(self):
+        if self.tracer.enabled:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.start is not None:
+            if exc_type is not None:
+                self.args["error"] = exc_type.__name__
+            self.tracer.record(self.name, self.cat, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    """
+    Ring buffer of the last ``max_events`` spans, from any thread.
+    ``window`` is how many recent durations per name ``summary`` averages.
+    """
+
+    def __init__(self, enabled=True, max_events=200000, window=20):
+        self.enabled = enabled
+        self.window = window
+        self.origin = time.perf_counter()
+        self._events = deque(maxlen=max_events)
+        self._recent = OrderedDict()   # (cat, name) -> deque of durations (s)
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, cat="app", **args):
+        return _Span(self, name, cat, args)
+
+    def record(self, name, cat, start, end, args=None):
+        """Add a span that ran from ``start`` to ``end`` (perf_counter seconds)."""
+        thread = threading.current_thread()
+        with self._lock:
+            self._events.append((name, cat, thread.ident, start, end - start, args or None))
+            self._threads[thread.ident] = thread.name
+            recent = self._recent.get((cat, name))
+            if recent is None:
+                recent = self._recent[(cat, name)] = deque(maxlen=self.window)
+            recent.append(end - start)
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+            self._recent.clear()
+
+    def summary(self):
+        """``[(cat, name, last_ms, mean_ms), ...]`` in the order the spans first ran."""
+        with self._lock:
+            return [(cat, name, d[-1] * 1000, sum(d) / len(d) * 1000)
+                    for (cat, name), d in self._recent.items()]
+
+    def to_chrome(self):
+        """The recorded spans as a Trace Event Format dict."""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        trace = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                 for tid, name in threads.items()]
+        for name, cat, tid, start, dur, args in events:
+            event = {"name": name, "cat": cat, "ph": "X", "pid": pid, "tid": tid,
+                     "ts": round((start - self.origin) * 1e6, 1), "dur": round(dur * 1e6, 1)}
+            if args:
+                event["args"] = {k: v if isinstance(v, (int, float, str, bool)) or v is None else str(v)
+                                 for k, v in args.items()}
+            trace.append(event)
+        return {"traceEvents": trace, "displayTimeUnit": "ms"}
+
+    def export(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome(), f)
+
+
+tracer = Tracer(enabled=os.environ.get("BALR_TRACE", "1") != "0")
+
+
+def span(name, cat="app", **args):
+    """A span on the process-wide tracer."""
+    return tracer.span(name, cat, **args)
@@ -0,0 +1,67 @@
+"""
+Mipmap pyramid for display.
+
+Level 0 is the full RGBA image, each further level halves it with area
+resampling. Levels are built lazily and kept, so fitting the same image to
+a new window size only resizes a level that is at most twice the target.
+Levels may be requested from several worker threads at once.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+
+class Pyramid:
+    def __init__(self, arr):
+        arr.setflags(write=False)
+        self.levels = [arr]
+        self._lock = threading.Lock()
+
+    @property
+    def width(self):
+        return self.levels[0].shape[1]
+
+    @property
+    def height(self):
+        return self.levels[0].shape[0]
+
+    def level(self, index):
+        """Level ``index`` (clamped to the last 1-pixel level), built on demand."""
+        if len(self.levels) <= index:
+            with self._lock:
+                while len(self.levels) <= index:
+                    prev = self.levels[-1]
+                    h, w = prev.shape[:2]
+                    if w == 1 and h == 1:
+                        break
+                    nxt = cv2.resize(prev, ((w + 1) // 2, (h + 1) // 2), interpolation=cv2.INTER_AREA)
+                    nxt.setflags(write=False)
+                    self.levels.append(nxt)
+        return self.levels[min(index, len(self.levels) - 1)]
+
+    def level_for_scale(self, scale):
+        """Index of the smallest level that is still at least ``scale`` x full size."""
+        if scale >= 1:
+            return 0
+        return max(0, int(np.floor(np.log2(1.0 / scale))))
+
+    def fit(self, box):
+        """
+        The image shrunk to fit ``box`` = (max_w, max_h), keeping the aspect
+        ratio and never enlarging (like PIL's thumbnail). Read-only.
+        """
+        scale = min(1.0, box[0] / self.width, box[1] / self.height)
+        size = (max(1, round(self.width * scale)), max(1, round(self.height * scale)))
+        return self.resize(size)
+
+    def resize(self, size):
+        """The whole image at ``size`` = (w, h), resampled from the nearest level."""
+        scale = max(size[0] / self.width, size[1] / self.height)
+        src = self.level(self.level_for_scale(scale))
+        if (src.shape[1], src.shape[0]) == tuple(size):
+            return src
+        interp = cv2.INTER_AREA if size[0] <= src.shape[1] else cv2.INTER_LINEAR
+        out = cv2.resize(src, tuple(size), interpolation=interp)
+        out.setflags(write=False)
+        return out
@@ -0,0 +1,323 @@
+"""
+Non-destructive edit recipe.
+
+A Recipe is the original image plus the ordered list of operations the
+editor committed on top of it (filters, morphology, crops, geometry, ...),
+each a Step with a registered op name and JSON-able arguments. Only the
+first ``cursor`` steps are active, so undo/redo just move the cursor.
+
+Rendering replays the active steps over the original, but only as far as
+asked (``upto``) and starting from the longest prefix already in the cache:
+every prefix has a chained digest of its steps, so tweaking step 5 of 8
+re-runs steps 5..8 and nothing before. Results that can't be recomputed
+(remote AI output) are kept as "image" steps holding the pixels.
+
+A recipe is saved as a JSON sidecar next to the exported image
+(``photo.jpg`` -> ``photo.balr.json``); "image" steps and an in-memory
+original are written as PNGs beside it. Re-render one without the editor:
+
+    python recipe.py photo.balr.json out.jpg
+"""
+import argparse
+import copy
+import hashlib
+import json
+import os
+import threading
+import uuid
+from dataclasses import dataclass, field
+
+from PIL import Image
+
+import annotate
+import engine
+import frequency
+
+SIDECAR_SUFFIX = ".balr.json"
+
+
+def sidecar_path(image_path):
+    return os.path.splitext(image_path)[0] + SIDECAR_SUFFIX
+
+
+def file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+_digests = {}   # path -> ((st_mtime_ns, st_size), sha256)
+_digests_lock = threading.Lock()
+
+
+def cached_digest(path):
+    """
+    ``file_digest`` memoized on the file's mtime and size: a replay only
+    stats the source, and hashes it again only after it changed.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _digests_lock:
+        hit = _digests.get(path)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    digest = file_digest(path)
+    with _digests_lock:
+        _digests[path] = (stamp, digest)
+    return digest
+
+
+def same_file(a, b):
+    return os.path.normcase(os.path.abspath(a)) == os.path.normcase(os.path.abspath(b))
+
+
+def _frequency(arr, mode, cutoff=0.05, shape="ideal", high=False, color=True):
+    spectrum = frequency.Spectrum(arr, color)
+    if mode == "magnitude":
+        return spectrum.magnitude()
+    if mode == "inverse":
+        return spectrum.inverse()
+    return spectrum.filter(cutoff, shape, high)
+
+
+def _annotate(arr, annotation):
+    layer = annotate.Annotation.from_dict(annotation)
+    return engine.to_array(layer.composite(engine.to_image(arr)))
+
+
+# op name -> fn(arr, **args) returning a new RGBA array (never modifying arr)
+OPS = {
+    "filter": lambda arr, name: engine.apply_filter(arr, name),
+    "morphology": lambda arr, operation, kernel_size, shape="rect":
+        engine.apply_morphology(arr, operation, kernel_size, shape),
+    "geometry": lambda arr, transform, perspective: engine.apply_geometry(arr, transform, perspective),
+    "reflect": lambda arr, direction: engine.reflect(arr, direction),
+    "crop": lambda arr, box: engine.crop(arr, box),
+    "auto_enhance": lambda arr: engine.auto_enhance(arr),
+    "gamma": lambda arr, gamma: engine.gamma_correction(arr, gamma),
+    "threshold": lambda arr, value: engine.global_threshold(arr, value),
+    "adaptive_threshold": lambda arr: engine.adaptive_threshold(arr),
+    "smoothing": lambda arr, kernel_size: engine.smoothing(arr, kernel_size),
+    "sharpen": lambda arr: engine.sharpen(arr),
+    "denoise": lambda arr: engine.denoise(arr),
+    "boost_detail": lambda arr: engine.boost_detail(arr),
+    "frequency": _frequency,
+    "annotate": _annotate,
+}
+
+
+@dataclass
+class Step:
+    op: str
+    args: dict = field(default_factory=dict)
+    # pixels of an "image" step (a result that can't be recomputed)
+    image: object = field(default=None, repr=False, compare=False)
+
+    @classmethod
+    def from_image(cls, img, label="image"):
+        return cls("image", {"label": label, "token": uuid.uuid4().hex}, img.convert("RGBA"))
+
+    def run(self, arr):
+        if self.op == "image":
+            return engine.to_array(self.image)
+        if self.op not in OPS:
+            raise ValueError(f"Unknown recipe op: {self.op}")
+        return OPS[self.op](arr, **self.args)
+
+    def digest(self, parent):
+        h = hashlib.sha256(parent.encode("utf-8"))
+        h.update(self.op.encode("utf-8"))
+        h.update(json.dumps(self.args, sort_keys=True).encode("utf-8"))
+        return h.hexdigest()
+
+
+class Recipe:
+    def __init__(self, source=None, base=None, steps=None, cursor=None, adjustments=None, source_digest=None):
+        """
+        ``source`` is the original image's path; ``base`` an in-memory
+        original (a generated image) used when there is no path.
+        ``source_digest`` is the sha256 of the source file, checked before
+        every replay so edits are never re-applied over a changed file. If
+        not given it is taken on the first load or save (hashing a large
+        file is slow, so never do either on the UI thread).
+        """
+        self.source = os.path.abspath(source) if source else None
+        self.source_digest = source_digest
+        self.base = base.convert("RGBA") if base is not None else None
+        self.base_token = uuid.uuid4().hex
+        self.steps = list(steps or [])
+        self.cursor = len(self.steps) if cursor is None else cursor
+        self.adjustments = adjustments or engine.AdjustmentParams().to_dict()
+
+    # ---------- editing ----------
+    @property
+    def active(self):
+        return self.steps[:self.cursor]
+
+    def push(self, step):
+        """Append after the cursor, dropping any undone steps past it."""
+        del self.steps[self.cursor:]
+        self.steps.append(step)
+        self.cursor = len(self.steps)
+        return step
+
+    def replace_last(self, step):
+        """Swap the last active step (a slider being re-tweaked)."""
+        self.steps[self.cursor - 1] = step
+        del self.steps[self.cursor:]
+        return step
+
+    def last(self):
+        return self.steps[self.cursor - 1] if self.cursor else None
+
+    def prefix(self, upto):
+        """A copy holding only the first ``upto`` steps, safe to render on a worker while this one is edited."""
+        clone = copy.copy(self)
+        clone.steps = self.steps[:upto]
+        clone.cursor = upto
+        clone.adjustments = dict(self.adjustments)
+        return clone
+
+    # ---------- rendering ----------
+    def _root(self):
+        if self.source:
+            try:
+                mtime = os.path.getmtime(self.source)
+            except OSError:
+                mtime = 0
+            return f"{self.source}:{mtime}"
+        return self.base_token
+
+    def keys(self, upto=None):
+        """Chained digest of each prefix: keys()[i] identifies the output of steps[:i + 1]."""
+        upto = self.cursor if upto is None else upto
+        keys, parent = [], self._root()
+        for step in self.steps[:upto]:
+            parent = step.digest(parent)
+            keys.append(parent)
+        return keys
+
+    def detach(self, original):
+        """
+        Hold the original's pixels in memory instead of reading the source
+        file, which is about to be overwritten. Cache keys stay the same.
+        """
+        self.base_token = self._root()
+        self.base = original.convert("RGBA")
+        self.source = self.source_digest = None
+
+    def load_original(self):
+        if self.source:
+            digest = cached_digest(self.source)
+            if self.source_digest is None:
+                self.source_digest = digest
+            elif digest != self.source_digest:
+                raise ValueError(f"{self.source} has changed since the recipe was saved")
+            with Image.open(self.source) as img:
+                return img.convert("RGBA")
+        return self.base
+
+    def render(self, upto=None, cache=None, cancel=None):
+        """
+        RGBA array after the first ``upto`` steps (default: the cursor),
+        resuming from the longest prefix found in ``cache`` (a StageCache)
+        and caching every step it runs. May return a cached, read-only array.
+        """
+        upto = self.cursor if upto is None else upto
+        keys = self.keys(upto)
+        start, arr = 0, None
+        if cache is not None:
+            for i in range(upto, 0, -1):
+                arr = cache.get(("recipe", keys[i - 1]))
+                if arr is not None:
+                    start = i
+                    break
+        if arr is None:
+            arr = engine.to_array(self.load_original())
+        for i in range(start, upto):
+            if cancel is not None and cancel():
+                raise engine.Cancelled()
+            arr = self.steps[i].run(arr)
+            if cache is not None:
+                cache.put(("recipe", keys[i]), arr)
+        return arr
+
+    def remember(self, arr, cache):
+        """Cache ``arr`` as the output of the active steps (the editor already computed it)."""
+        if self.cursor:
+            cache.put(("recipe", self.keys()[-1]), arr)
+
+    def export(self, cache=None, cancel=None):
+        """Active steps, then the non-destructive slider adjustments."""
+        arr = self.render(cache=cache, cancel=cancel)
+        params = engine.AdjustmentParams.from_dict(self.adjustments)
+        return engine.apply_all_adjustments(arr, params, cancel=cancel)
+
+    # ---------- sidecar ----------
+    def save(self, path):
+        """Write the sidecar JSON; pixels it can't reference by path go beside it as PNGs."""
+        folder = os.path.dirname(os.path.abspath(path))
+        stem = os.path.basename(path)[:-len(SIDECAR_SUFFIX)] if path.endswith(SIDECAR_SUFFIX) \
+            else os.path.splitext(os.path.basename(path))[0]
+        data = {
+            "version": 1,
+            "source": self.source,
+            "source_sha256": self.source_digest or (cached_digest(self.source) if self.source else None),
+            "cursor": self.cursor,
+            "adjustments": dict(self.adjustments),
+            "steps": [],
+        }
+        if self.source is None:
+            name = f"{stem}.original.png"
+            self.base.save(os.path.join(folder, name))
+            data["base"] = name
+        for step in self.steps:
+            entry = {"op": step.op, "args": copy.deepcopy(step.args)}
+            if step.op == "image":
+                name = f"{stem}.{step.args['token'][:12]}.png"
+                step.image.save(os.path.join(folder, name))
+                entry["file"] = name
+            data["steps"].append(entry)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        folder = os.path.dirname(os.path.abspath(path))
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        def read_png(name):
+            with Image.open(os.path.join(folder, name)) as img:
+                return img.convert("RGBA")
+
+        steps = []
+        for entry in data.get("steps", []):
+            step = Step(entry["op"], entry.get("args", {}))
+            if step.op == "image":
+                step.image = read_png(entry["file"])
+            steps.append(step)
+        base = read_png(data["base"]) if data.get("base") else None
+        return cls(data.get("source"), base, steps, data.get("cursor"), data.get("adjustments"),
+                   data.get("source_sha256"))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-render a BALR edit recipe.")
+    parser.add_argument("recipe", help="sidecar .balr.json")
+    parser.add_argument("output", help="output image path")
+    args = parser.parse_args(argv)
+
+    arr = Recipe.load(args.recipe).export()
+    img = engine.to_image(arr)
+    if args.output.lower().endswith((".jpg", ".jpeg", ".bmp")):
+        img = img.convert("RGB")
+    img.save(args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
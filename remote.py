@@ -0,0 +1,287 @@
+"""
+HTTP client for the remote AI endpoints (Topaz, remove.bg, Picsart, Pollinations).
+
+One pooled ``requests.Session`` is shared by every call: keep-alive, retries
+with exponential backoff on connection errors / 429 / 5xx, a (connect, read)
+timeout on every request, and results streamed into memory in chunks. With a
+ResultCache, repeat calls (same bytes, endpoint and parameters) are answered
+from disk. Nothing here touches Tk; the editor runs these calls on its
+JobRunner.
+
+Base URLs can be overridden per service (``base_urls=``) or through the
+``BALR_<SERVICE>_URL`` environment variables, e.g. to point at a local stub:
+
+    BALR_PICSART_URL=http://127.0.0.1:8000 python main.py
+"""
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+from PIL import Image
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+import profiling
+
+DEFAULT_BASE_URLS = {
+    "topaz": "https://api.topazlabs.com",
+    "removebg": "https://api.remove.bg",
+    "picsart": "https://api.picsart.io",
+    "pollinations": "https://image.pollinations.ai",
+}
+
+CHUNK_SIZE = 64 * 1024
+
+
+class RemoteError(Exception):
+    """A remote endpoint answered with an error status or an unexpected body."""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get("BALR_CACHE_DIR") or os.path.join(base, "balr", "remote")
+
+
+class ResultCache:
+    """
+    Content-addressed disk cache for remote results.
+
+    Entries are keyed by sha256 of the endpoint, its parameters and the
+    uploaded bytes; API keys are not part of the key. Least recently used
+    files are evicted once the directory grows past ``max_bytes`` (a hit
+    refreshes the file's mtime).
+    """
+
+    def __init__(self, directory=None, max_bytes=512 * 1024 * 1024):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+        self.nbytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def key(endpoint, params, data=b""):
+        h = hashlib.sha256()
+        h.update(endpoint.encode("utf-8"))
+        h.update(b"\0")
+        h.update(json.dumps(params, sort_keys=True).encode("utf-8"))
+        h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def get(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                with open(path, "rb") as f:
+                    data = f.read()
+                os.utime(path)
+            except OSError:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        path = self._path(key)
+        fd, tmp = tempfile.mkstemp(suffix=".tmp", dir=self.directory)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                self.nbytes -= os.path.getsize(path)
+            except OSError:
+                pass
+            os.replace(tmp, path)
+            self.nbytes += len(data)
+            if self.nbytes > self.max_bytes:
+                self._evict()
+
+    def discard(self, key):
+        path = self._path(key)
+        with self._lock:
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                return
+            self.nbytes -= size
+
+    def clear(self):
+        with self._lock:
+            for path, _, _ in self._entries():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self.nbytes = 0
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + ".bin")
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(".bin"):
+                path = os.path.join(self.directory, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield path, st.st_mtime, st.st_size
+
+    def _evict(self):
+        for path, _, size in sorted(self._entries(), key=lambda e: e[1]):
+            if self.nbytes <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self.nbytes -= size
+
+
+def decodes(data):
+    """True if ``data`` is a complete image PIL can decode (not an HTML error page or a cut-off body)."""
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            img.load()
+        return True
+    except Exception:
+        return False
+
+
+def image_bytes(img, fmt="PNG"):
+    """Encode a PIL image for upload."""
+    buf = io.BytesIO()
+    img.save(buf, format=fmt)
+    return buf.getvalue()
+
+
+class RemoteClient:
+    def __init__(self, base_urls=None, timeout=(10, 120), retries=3, backoff=0.5, pool_size=4, cache=None):
+        self.base_urls = dict(DEFAULT_BASE_URLS)
+        for service in self.base_urls:
+            env = os.environ.get(f"BALR_{service.upper()}_URL")
+            if env:
+                self.base_urls[service] = env
+        self.base_urls.update(base_urls or {})
+        self.timeout = timeout
+        self.cache = cache
+
+        # status and read-error retries only for idempotent requests (urllib3's
+        # default methods): the upload POSTs are billed per call, so they only
+        # retry when the connection was never made
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff,
+            status_forcelist=(429, 500, 502, 503, 504),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def close(self):
+        self.session.close()
+
+    # ---------- endpoints ----------
+    def enhance(self, data, api_key, model="Standard V2"):
+        """Topaz enhance; returns JPEG bytes."""
+        form = {
+            "model": model,
+            "face_enhancement": "true",
+            "face_enhancement_strength": "0.8",
+            "output_format": "jpeg",
+        }
+        return self._cached("topaz/enhance", form, data, lambda: self._fetch(
+            "POST", self._url("topaz", "/image/v1/enhance"),
+            headers={"X-API-Key": api_key, "accept": "image/jpeg"},
+            files={"image": ("input.jpg", data, "image/jpeg")},
+            data=form,
+        ))
+
+    def remove_background(self, data, api_key, size="auto"):
+        """remove.bg; returns PNG bytes."""
+        return self._cached("removebg", {"size": size}, data, lambda: self._fetch(
+            "POST", self._url("removebg", "/v1.0/removebg"),
+            headers={"X-Api-Key": api_key},
+            files={"image_file": ("image.png", data, "image/png")},
+            data={"size": size},
+        ))
+
+    def artistic_effect(self, data, api_key, effect_name):
+        """Picsart AI effect; returns the processed image bytes."""
+        def fetch():
+            resp = self.session.post(
+                self._url("picsart", "/tools/1.0/effects/ai"),
+                headers={"accept": "application/json", "X-Picsart-API-key": api_key},
+                files={"image": ("image.jpg", data, "image/jpeg")},
+                data={"effect_name": effect_name, "format": "PNG"},
+                timeout=self.timeout,
+            )
+            self._check(resp)
+            result = resp.json()
+            if "data" not in result or "url" not in result["data"]:
+                raise RemoteError(f"Unexpected response format:\n{result}")
+            # result image is served from a CDN; same session, so it is pooled too
+            return self._fetch("GET", result["data"]["url"])
+
+        return self._cached("picsart/effects", {"effect_name": effect_name}, data, fetch)
+
+    def generate(self, prompt, width=512, height=512, model="flux"):
+        """Pollinations text-to-image; returns the image bytes."""
+        params = {"width": width, "height": height, "model": model}
+        url = self._url("pollinations", "/prompt/" + requests.utils.quote(prompt))
+        return self._cached("pollinations", dict(params, prompt=prompt), b"",
+                            lambda: self._fetch("GET", url, params=params))
+
+    # ---------- internals ----------
+    def _url(self, service, path):
+        return self.base_urls[service].rstrip("/") + path
+
+    def _cached(self, endpoint, params, data, fetch):
+        with profiling.span(endpoint, "remote", upload_bytes=len(data)) as span:
+            key = self.cache.key(endpoint, params, data) if self.cache is not None else None
+            if key is not None:
+                hit = self.cache.get(key)
+                if hit is not None and not decodes(hit):
+                    self.cache.discard(key)  # a bad entry from an older version; fetch again
+                    hit = None
+                span.args["cache_hit"] = hit is not None
+                if hit is not None:
+                    return hit
+            result = fetch()
+            # a 200 can still carry an error page or a truncated body; never cache one
+            if not decodes(result):
+                raise RemoteError(f"{endpoint} returned {len(result)} bytes that are not a valid image")
+            if key is not None:
+                self.cache.put(key, result)
+            return result
+
+    def _check(self, resp):
+        if resp.status_code != 200:
+            raise RemoteError(f"HTTP {resp.status_code}: {resp.text[:500]}", resp.status_code)
+
+    def _fetch(self, method, url, **kwargs):
+        with profiling.span(f"HTTP {method}", "remote", url=url.split("?")[0]) as span:
+            with self.session.request(method, url, stream=True, timeout=self.timeout, **kwargs) as resp:
+                span.args["status"] = resp.status_code
+                self._check(resp)
+                buf = io.BytesIO()
+                for chunk in resp.iter_content(CHUNK_SIZE):
+                    buf.write(chunk)
+                span.args["bytes"] = buf.tell()
+                return buf.getvalue()
@@ -0,0 +1,17 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def rgba():
+    """``rgba(w, h, seed=0)``: an opaque RGBA uint8 array of random noise."""
+    def make(w, h, seed=0):
+        arr = np.random.default_rng(seed).integers(0, 256, (h, w, 4), dtype=np.uint8)
+        arr[..., 3] = 255
+        return arr
+    return make
@@ -0,0 +1,35 @@
+"""Batch mode folder handling and exit status."""
+import numpy as np
+import pytest
+from PIL import Image
+
+import batch
+import engine
+
+
+@pytest.fixture
+def folder(tmp_path, rgba):
+    src = tmp_path / "in"
+    src.mkdir()
+    for i in range(2):
+        Image.fromarray(rgba(40, 30, seed=i)).save(src / f"img{i}.png")
+    return src
+
+
+def test_refuses_to_write_into_the_input_folder(folder):
+    before = (folder / "img0.png").read_bytes()
+    with pytest.raises(ValueError):
+        batch.run_batch(str(folder), str(folder / "."), engine.Preset(), workers=1, log=lambda msg: None)
+    assert (folder / "img0.png").read_bytes() == before
+
+
+def test_failed_files_fail_the_run(folder, tmp_path):
+    (folder / "broken.png").write_bytes(b"not an image")
+    preset = tmp_path / "preset.json"
+    engine.Preset(adjustments=engine.AdjustmentParams(contrast=20)).save(str(preset))
+    out = tmp_path / "out"
+    assert batch.main([str(folder), str(out), "--preset", str(preset), "--workers", "1"]) == 1
+    assert sorted(p.name for p in out.iterdir()) == ["img0.png", "img1.png"]
+    done, failed, _, _ = batch.run_batch(str(folder), str(out), engine.Preset(), workers=1, log=lambda msg: None)
+    assert (done, failed) == (2, 1)
+    np.testing.assert_array_equal(np.array(Image.open(out / "img1.png")), np.array(Image.open(folder / "img1.png")))
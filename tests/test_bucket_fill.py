@@ -0,0 +1,64 @@
+"""Scanline bucket fill against the old pixel-stack flood fill."""
+import numpy as np
+import pytest
+
+import engine
+
+
+def legacy_bucket_fill(pixels, x, y, color):
+    """The old exact-match fill, one pixel at a time. Returns True if anything changed."""
+    h, w = pixels.shape[:2]
+    if not (0 <= x < w and 0 <= y < h):
+        return False
+    target = pixels[y, x].copy()
+    fill = np.array([int(color[i:i + 2], 16) for i in (1, 3, 5)] + [255], dtype=np.uint8)
+    if np.all(target == fill):
+        return False
+    mask = np.zeros((h, w), dtype=bool)
+    stack = [(x, y)]
+    while stack:
+        cx, cy = stack.pop()
+        if 0 <= cx < w and 0 <= cy < h and not mask[cy, cx] and np.all(pixels[cy, cx] == target):
+            mask[cy, cx] = True
+            stack.extend([(cx + 1, cy), (cx - 1, cy), (cx, cy + 1), (cx, cy - 1)])
+    pixels[mask] = fill
+    return True
+
+
+def _regions(w=90, h=70, seed=0):
+    """A few colors in blobs, so fills stop at region borders."""
+    rng = np.random.default_rng(seed)
+    palette = np.array([[0, 0, 0, 0], [255, 255, 255, 255], [10, 200, 30, 255]], np.uint8)
+    small = rng.integers(0, len(palette), (h // 5 + 1, w // 5 + 1))
+    return palette[np.kron(small, np.ones((5, 5), int))[:h, :w]]
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("point", [(0, 0), (45, 35), (89, 69), (12, 50)])
+def test_exact_fill_matches_old_fill(seed, point):
+    pixels = _regions(seed=seed)
+    ref = pixels.copy()
+    changed = legacy_bucket_fill(ref, *point, "#ff8000")
+    box = engine.bucket_fill(pixels, *point, "#ff8000")
+    np.testing.assert_array_equal(pixels, ref)
+    assert (box is not None) == changed
+    if box is not None:
+        x0, y0, x1, y1 = box
+        outside = np.ones(pixels.shape[:2], bool)
+        outside[y0:y1, x0:x1] = False
+        np.testing.assert_array_equal(pixels[outside], _regions(seed=seed)[outside])
+
+
+def test_fill_with_seed_color_changes_nothing():
+    pixels = np.full((20, 20, 4), (255, 128, 0, 255), np.uint8)
+    assert engine.bucket_fill(pixels, 5, 5, "#ff8000") is None
+    assert engine.bucket_fill(pixels, 50, 5, "#00ff00") is None
+
+
+def test_tolerance_grows_the_region():
+    pixels = np.zeros((10, 30, 4), np.uint8)
+    pixels[..., 3] = 255
+    pixels[:, 10:20, :3] = 8
+    pixels[:, 20:, :3] = 40
+    engine.bucket_fill(pixels, 0, 0, "#ff0000", tolerance=10)
+    assert (pixels[:, :20, 0] == 255).all() and (pixels[:, 20:, 0] == 40).all()
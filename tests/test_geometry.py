@@ -0,0 +1,39 @@
+"""apply_geometry against the PIL path it replaced."""
+import numpy as np
+import pytest
+from PIL import Image
+
+import engine
+
+
+@pytest.mark.parametrize("size", [(149, 111), (101, 75), (200, 100), (64, 63), (63, 64)])
+@pytest.mark.parametrize("angle", [90, 180, 270, -90, 30, 45, -17.5, 135])
+def test_rotate_size_matches_pil(rgba, size, angle):
+    arr = rgba(*size)
+    out = engine.apply_geometry(arr, dict(engine.DEFAULT_TRANSFORM, rotate=angle))
+    ref = np.array(Image.fromarray(arr).rotate(angle, expand=True))
+    assert out.shape == ref.shape
+
+
+@pytest.mark.parametrize("size", [(149, 111), (101, 75), (64, 63)])
+@pytest.mark.parametrize("angle", [90, 180, 270, -90])
+def test_quarter_turns_are_lossless(rgba, size, angle):
+    arr = rgba(*size)
+    out = engine.apply_geometry(arr, dict(engine.DEFAULT_TRANSFORM, rotate=angle))
+    ref = np.array(Image.fromarray(arr).rotate(angle, expand=True))
+    np.testing.assert_array_equal(out, ref)
+
+
+def test_resize_and_scale_sizes(rgba):
+    arr = rgba(101, 75)
+    t = dict(engine.DEFAULT_TRANSFORM, resize=50, scale_x=150, scale_y=80)
+    out = engine.apply_geometry(arr, t)
+    w, h = int(101 * 0.5), int(75 * 0.5)
+    assert out.shape[:2] == (int(h * 0.8), int(w * 1.5))
+
+
+def test_identity_is_a_copy(rgba):
+    arr = rgba(40, 30)
+    out = engine.apply_geometry(arr, dict(engine.DEFAULT_TRANSFORM))
+    np.testing.assert_array_equal(out, arr)
+    assert out is not arr
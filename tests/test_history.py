@@ -0,0 +1,34 @@
+"""SnapshotStack spilling, budgets and tags."""
+import numpy as np
+from PIL import Image
+
+from history import SnapshotStack
+
+
+def _images(n, size=(32, 24)):
+    return [Image.fromarray(np.full(size[::-1] + (4,), i, np.uint8)) for i in range(n)]
+
+
+def test_spilled_snapshots_round_trip(tmp_path):
+    for compress in (False, True):
+        stack = SnapshotStack(ram_budget=0, compress=compress, spill_dir=str(tmp_path))
+        images = _images(4)
+        for img in images:
+            stack.append(img)
+        assert stack.disk_bytes > 0
+        for img in reversed(images):
+            np.testing.assert_array_equal(np.array(stack.pop()), np.array(img))
+        assert stack.disk_bytes == 0 and stack.ram_bytes == 0
+
+
+def test_tags_are_dropped_with_their_snapshots(tmp_path):
+    images = _images(6)
+    nbytes = np.array(images[0]).nbytes
+    stack = SnapshotStack(ram_budget=0, disk_budget=2 * nbytes, spill_dir=str(tmp_path))
+    for i, img in enumerate(images):
+        stack.append(img, tag=i)
+    assert len(stack) == 3
+    for i in (5, 4, 3):
+        img, tag = stack.pop_tagged()
+        assert tag == i
+        assert np.array(img)[0, 0, 0] == i
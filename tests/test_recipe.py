@@ -0,0 +1,83 @@
+"""Recipe replay and sidecar round-trips."""
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+import engine
+import recipe
+from recipe import Recipe, Step, sidecar_path
+
+
+@pytest.fixture
+def source(tmp_path, rgba):
+    path = str(tmp_path / "photo.png")
+    Image.fromarray(rgba(100, 80)).save(path)
+    return path
+
+
+def _edited(path):
+    recipe = Recipe(source=path)
+    recipe.push(Step("crop", {"box": [5, 5, 95, 75]}))
+    recipe.push(Step("morphology", {"operation": "dilation", "kernel_size": 3}))
+    recipe.push(Step("geometry", {"transform": dict(engine.DEFAULT_TRANSFORM, rotate=90), "perspective": {}}))
+    recipe.push(Step.from_image(Image.new("RGBA", (40, 30), (10, 20, 30, 255)), "remote"))
+    recipe.push(Step("reflect", {"direction": "horizontal"}))
+    recipe.adjustments["vibrance"] = 30.0
+    return recipe
+
+
+def test_sidecar_round_trip(tmp_path, source):
+    recipe = _edited(source)
+    recipe.cursor = 3
+    sidecar = str(tmp_path / "out.balr.json")
+    recipe.save(sidecar)
+    loaded = Recipe.load(sidecar)
+    assert [s.op for s in loaded.steps] == [s.op for s in recipe.steps]
+    assert loaded.cursor == 3
+    assert loaded.adjustments == recipe.adjustments
+    np.testing.assert_array_equal(loaded.export(), recipe.export())
+    loaded.cursor = recipe.cursor = len(recipe.steps)
+    np.testing.assert_array_equal(loaded.render(), recipe.render())
+
+
+def test_cached_prefix_matches_full_replay(source):
+    recipe = _edited(source)
+    cache = engine.StageCache()
+    recipe.render(cache=cache)
+    recipe.replace_last(Step("reflect", {"direction": "vertical"}))
+    np.testing.assert_array_equal(recipe.render(cache=cache), recipe.render())
+
+
+def test_changed_source_is_refused(source):
+    path = source
+    recipe = _edited(path)
+    recipe.save(sidecar_path(path))
+    engine.to_image(recipe.export()).save(path)
+    with pytest.raises(ValueError):
+        Recipe.load(sidecar_path(path)).export()
+
+
+def test_saving_over_the_source_keeps_the_original(source):
+    path = source
+    recipe = _edited(path)
+    expected = recipe.export()
+    recipe.detach(recipe.load_original())
+    recipe.save(sidecar_path(path))
+    engine.to_image(expected).save(path)
+    np.testing.assert_array_equal(Recipe.load(sidecar_path(path)).export(), expected)
+
+
+def test_replay_hashes_the_source_only_when_it_changes(source, monkeypatch):
+    hashed = []
+    monkeypatch.setattr(recipe, "file_digest", lambda path: hashed.append(path) or f"sha-{len(hashed)}")
+    edited = _edited(source)
+    assert hashed == []
+    edited.export()
+    edited.export()
+    assert len(hashed) == 1
+    os.utime(source, ns=(0, 0))
+    with pytest.raises(ValueError):
+        edited.export()
+    assert len(hashed) == 2
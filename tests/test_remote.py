@@ -0,0 +1,98 @@
+"""RemoteClient result caching against a local HTTP stub (no network)."""
+import http.server
+import io
+import threading
+
+import pytest
+from PIL import Image
+
+import remote
+
+
+def _png():
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 10, 10)).save(buf, "PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def server():
+    bodies = {"/prompt/good": _png(), "/prompt/html": b"<html>quota exceeded</html>",
+              "/prompt/cut": _png()[:60], "/prompt/busy": None}
+    hits = []
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?")[0]
+            hits.append(path)
+            self._reply(bodies[path])
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            hits.append(self.path)
+            self._reply(None)
+
+        def _reply(self, body):
+            if body is None:
+                body = b"busy"
+                self.send_response(503)
+            else:
+                self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = http.server.HTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}", hits
+    srv.shutdown()
+
+
+def _client(url, tmp_path, retries=0):
+    return remote.RemoteClient(base_urls={"pollinations": url, "removebg": url}, retries=retries,
+                               backoff=0, cache=remote.ResultCache(str(tmp_path)))
+
+
+def test_valid_result_is_cached(server, tmp_path):
+    url, hits = server
+    client = _client(url, tmp_path)
+    first = client.generate("good")
+    assert client.generate("good") == first
+    assert hits == ["/prompt/good"]
+
+
+@pytest.mark.parametrize("prompt", ["html", "cut"])
+def test_invalid_body_is_not_cached(server, tmp_path, prompt):
+    url, hits = server
+    client = _client(url, tmp_path)
+    for _ in range(2):
+        with pytest.raises(remote.RemoteError):
+            client.generate(prompt)
+    assert len(hits) == 2
+    assert client.cache.nbytes == 0
+
+
+def test_corrupt_cache_entry_is_evicted(server, tmp_path):
+    url, hits = server
+    client = _client(url, tmp_path)
+    params = {"width": 512, "height": 512, "model": "flux", "prompt": "good"}
+    key = client.cache.key("pollinations", params, b"")
+    client.cache.put(key, b"<html>stale</html>")
+    assert remote.decodes(client.generate("good"))
+    assert hits == ["/prompt/good"]
+    assert remote.decodes(client.cache.get(key))
+
+
+def test_server_errors_retry_gets_but_not_uploads(server, tmp_path):
+    url, hits = server
+    client = _client(url, tmp_path, retries=2)
+    with pytest.raises(remote.RemoteError):
+        client.generate("busy")
+    assert hits == ["/prompt/busy"] * 3
+    del hits[:]
+    with pytest.raises(remote.RemoteError):
+        client.remove_background(b"upload", "key")
+    assert hits == ["/v1.0/removebg"]
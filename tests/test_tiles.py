@@ -0,0 +1,43 @@
+"""Tiled rendering against a whole-image render."""
+import numpy as np
+import pytest
+
+import engine
+import tiles
+
+# noise is random per call, so it is left out
+CASES = {
+    "pointwise": engine.AdjustmentParams(exposure=20, contrast=25, brightness=-10, blacks=10, whites=-5,
+                                         hue=15, tint=5, vibrance=30, saturation=-20, temperature=12,
+                                         gamma=1.3),
+    "highlights_shadows": engine.AdjustmentParams(highlights=-30, shadows=40, contrast=20),
+    "blur": engine.AdjustmentParams(blur=3.5, contrast=10),
+    "vignette": engine.AdjustmentParams(vignette=60, exposure=-15),
+}
+
+
+@pytest.fixture
+def image(rgba):
+    w, h = 301, 217
+    arr = rgba(w, h, seed=1)
+    arr[..., 0] = (np.arange(w) * 255 // w).astype(np.uint8)
+    return arr
+
+
+@pytest.mark.parametrize("name", sorted(CASES))
+@pytest.mark.parametrize("tile", [64, 100])
+def test_tiled_matches_whole_image(image, name, tile):
+    arr = image
+    params = CASES[name]
+    whole = engine.apply_all_adjustments(arr, params)
+    tiled = tiles.render_tiled(arr, params, dst=np.empty_like(arr), tile=tile)
+    np.testing.assert_array_equal(tiled, whole)
+
+
+def test_tiled_image_round_trip(image, tmp_path):
+    arr = image
+    tiled = tiles.TiledImage.from_array(arr, directory=str(tmp_path))
+    out = tiles.render_tiled(tiled, CASES["pointwise"], tile=64)
+    np.testing.assert_array_equal(np.asarray(out.to_image()), engine.apply_all_adjustments(arr, CASES["pointwise"]))
+    out.close()
+    tiled.close()
@@ -0,0 +1,54 @@
+"""Fused tone LUT against the per-step code it replaced."""
+import cv2
+import numpy as np
+import pytest
+from PIL import Image, ImageEnhance
+
+import engine
+
+
+def _enhance(arr, enhancer, factor):
+    return np.array(enhancer(Image.fromarray(arr)).enhance(factor))
+
+
+def legacy_tone(arr, p):
+    """The old chain: PIL enhancers for exposure/contrast/brightness, np.where levels, gamma LUT."""
+    img = arr
+    if p.exposure != 0:
+        img = _enhance(img, ImageEnhance.Brightness, np.power(2, p.exposure / 100))
+    if p.contrast != 0:
+        img = _enhance(img, ImageEnhance.Contrast, 1 + (p.contrast / 100))
+    if p.brightness != 0:
+        img = _enhance(img, ImageEnhance.Brightness, 1 + (p.brightness / 100))
+    if p.blacks != 0:
+        adjustment = p.blacks / 100 * 50
+        img = np.where(img < 128, np.clip(img + adjustment, 0, 255), img).astype(np.uint8)
+    if p.whites != 0:
+        adjustment = p.whites / 100 * 50
+        img = np.where(img > 128, np.clip(img + adjustment, 0, 255), img).astype(np.uint8)
+    if p.gamma != 1.0:
+        table = np.array([(i / 255.0) ** (1.0 / p.gamma) * 255 for i in np.arange(256)]).astype("uint8")
+        img = cv2.LUT(img, table)
+    return img
+
+
+TONE_CASES = [
+    dict(exposure=35),
+    dict(exposure=-40, contrast=30),
+    dict(contrast=-25, brightness=15),
+    dict(blacks=20, whites=-30),
+    dict(exposure=10, contrast=40, brightness=-10, blacks=-15, whites=25),
+    dict(gamma=1.8),
+    dict(exposure=-20, contrast=15, gamma=0.6),
+]
+
+
+@pytest.mark.parametrize("values", TONE_CASES)
+def test_fused_lut_within_one_level_of_old_chain(rgba, values):
+    arr = rgba(160, 120)
+    params = engine.AdjustmentParams(**values)
+    out = engine.apply_tone(arr, params)
+    ref = legacy_tone(arr, params)
+    diff = np.abs(out[..., :3].astype(np.int16) - ref[..., :3])
+    assert diff.max() <= 1
+    np.testing.assert_array_equal(out[..., 3], arr[..., 3])
@@ -0,0 +1,19 @@
+"""Vectorized vibrance against the per-pixel colorsys loop it replaced."""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+import engine
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks"))
+from bench_vibrance import legacy_vibrance, synthetic_image  # noqa: E402
+
+
+@pytest.mark.parametrize("vibrance", [-60, 25, 80])
+def test_vibrance_within_one_level_of_per_pixel_loop(vibrance):
+    arr = synthetic_image(0.002, seed=3)
+    out = engine.adjust_vibrance(arr, vibrance)
+    ref = legacy_vibrance(arr, vibrance)
+    assert np.abs(out[..., :3].astype(np.int16) - ref[..., :3]).max() <= 1
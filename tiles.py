@@ -0,0 +1,153 @@
+"""
+Tiled, memory-mapped image backend for images too large to process in RAM.
+
+A TiledImage keeps its RGBA pixels in a memory-mapped temp file. The
+adjustment pipeline streams over it tile by tile: pointwise stages see just
+the tile, neighbourhood stages (blur) get a halo of extra rows/columns that
+is cropped off again, and the two stages that depend on the whole image use
+global information instead of the tile's own: contrast pivots on a mean
+gray gathered in a histogram pass, and the vignette is placed by the tile's
+offset in the full frame. Peak RAM is a few tiles, whatever the image size.
+"""
+import math
+import os
+import tempfile
+import weakref
+
+import numpy as np
+from PIL import Image
+
+import engine
+
+TILE_SIZE = 1024
+
+# above this many pixels batch/save go through the tiled renderer
+LARGE_IMAGE_PIXELS = 64 * 1000 * 1000
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class TiledImage:
+    """RGBA uint8 pixels in a memory-mapped file, ``array`` is the (h, w, 4) memmap."""
+
+    def __init__(self, height, width, directory=None):
+        fd, self.path = tempfile.mkstemp(suffix=".rgba", prefix="balr-tiles-", dir=directory)
+        os.close(fd)
+        self._finalizer = weakref.finalize(self, _remove, self.path)
+        self.array = np.memmap(self.path, dtype=np.uint8, mode="w+", shape=(height, width, 4))
+
+    @property
+    def height(self):
+        return self.array.shape[0]
+
+    @property
+    def width(self):
+        return self.array.shape[1]
+
+    @classmethod
+    def from_array(cls, arr, directory=None):
+        tiled = cls(arr.shape[0], arr.shape[1], directory)
+        for y0 in range(0, arr.shape[0], TILE_SIZE):
+            tiled.array[y0:y0 + TILE_SIZE] = arr[y0:y0 + TILE_SIZE]
+        return tiled
+
+    @classmethod
+    def from_image(cls, img, directory=None, band_rows=TILE_SIZE):
+        """Copy a PIL image in, converting to RGBA one band of rows at a time."""
+        tiled = cls(img.height, img.width, directory)
+        for y0 in range(0, img.height, band_rows):
+            band = img.crop((0, y0, img.width, min(img.height, y0 + band_rows)))
+            tiled.array[y0:y0 + band.height] = np.asarray(band.convert("RGBA"))
+        return tiled
+
+    @classmethod
+    def open(cls, path, directory=None):
+        """
+        Decode ``path`` into a new TiledImage. Pillow still holds the decoded
+        file in its own mode, but the RGBA copy and everything after it live
+        on disk.
+        """
+        with Image.open(path) as img:
+            return cls.from_image(img, directory)
+
+    def to_image(self):
+        """Zero-copy PIL view of the pixels (valid while this TiledImage lives)."""
+        return Image.frombuffer("RGBA", (self.width, self.height), self.array, "raw", "RGBA", 0, 1)
+
+    def save(self, path):
+        img = self.to_image()
+        if path.lower().endswith((".jpg", ".jpeg", ".bmp")):
+            img = img.convert("RGB")
+        img.save(path)
+
+    def flush(self):
+        self.array.flush()
+
+    def close(self):
+        self.array = None
+        self._finalizer()
+
+
+def tile_boxes(height, width, tile=TILE_SIZE):
+    """(y0, y1, x0, x1) of every tile, row by row."""
+    for y0 in range(0, height, tile):
+        for x0 in range(0, width, tile):
+            yield y0, min(height, y0 + tile), x0, min(width, x0 + tile)
+
+
+def pipeline_halo(params):
+    """Extra pixels a tile needs on each side for its neighbourhood stages."""
+    if params.blur > 0:
+        return int(math.ceil(3 * params.blur)) + 2
+    return 0
+
+
+def global_luma_mean(src, params, tile=TILE_SIZE):
+    """
+    Mean gray of the contrast stage's input over the whole image, or None
+    when contrast is off. One streaming pass of per-channel histograms.
+    """
+    if params.contrast == 0:
+        return None
+    split = params.highlights != 0 or params.shadows != 0
+    hists = np.zeros((3, 256), np.float64)
+    for y0, y1, x0, x1 in tile_boxes(src.shape[0], src.shape[1], tile):
+        block = np.array(src[y0:y1, x0:x1])
+        if split:
+            # contrast runs after exposure and highlights/shadows
+            engine.apply_tone(block, params, post=False, out=block)
+            engine.adjust_highlights_shadows(block, params.highlights, params.shadows, out=block)
+        hists += engine.channel_histograms(block)
+    return engine.tone_luma_mean(hists, params, pre=not split)
+
+
+def render_tiled(src, params, dst=None, tile=TILE_SIZE, cancel=None):
+    """
+    Run the adjustment pipeline over ``src`` (TiledImage or array) tile by
+    tile into ``dst`` (a new TiledImage by default). Returns ``dst``.
+    """
+    src_arr = src.array if isinstance(src, TiledImage) else src
+    height, width = src_arr.shape[:2]
+    if dst is None:
+        dst = TiledImage(height, width)
+    dst_arr = dst.array if isinstance(dst, TiledImage) else dst
+
+    luma_mean = global_luma_mean(src_arr, params, tile)
+    halo = pipeline_halo(params)
+    for y0, y1, x0, x1 in tile_boxes(height, width, tile):
+        if cancel is not None and cancel():
+            raise engine.Cancelled()
+        hy0, hy1 = max(0, y0 - halo), min(height, y1 + halo)
+        hx0, hx1 = max(0, x0 - halo), min(width, x1 + halo)
+        block = np.array(src_arr[hy0:hy1, hx0:hx1])  # stages run in place, never on src
+        for _, _, fn in engine.pipeline_stages(params, luma_mean, frame=(height, width, hy0, hx0)):
+            block = fn(block)
+        dst_arr[y0:y1, x0:x1] = block[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+    if isinstance(dst, TiledImage):
+        dst.flush()
+    return dst
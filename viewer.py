@@ -0,0 +1,252 @@
+"""
+Zoomable, pannable image canvas for the editor's center panel.
+
+In fit mode it just shows the image it is given, centered. Once zoomed in,
+it renders only what is visible: the viewport is mapped to the nearest
+pyramid level, that region (plus a halo for neighbourhood stages) goes
+through the caller's render function on a worker, and the result is
+scaled to the screen. Panning moves the last frame immediately and
+re-renders behind it.
+
+While a tool shows a preview (``preview`` is set, a whole-image PIL image
+such as a proxy-size filter result), zoom mode cuts the visible region out
+of that image instead of rendering the current one.
+
+Mouse: wheel zooms around the cursor, left-drag pans, double-click toggles
+fit / 100%.
+"""
+import math
+import tkinter as tk
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+import profiling
+
+MAX_ZOOM = 32.0
+ZOOM_STEP = 1.25
+
+
+class ZoomViewer:
+    def __init__(self, parent, jobs, get_pyramid, make_renderer, on_fit=None, bg="#0f1826"):
+        """
+        ``get_pyramid()`` returns the current image's Pyramid (or None).
+        ``make_renderer(scale)`` is called on the Tk thread and returns
+        ``(render, halo)``: ``render(arr, frame, cancel)`` runs on a worker
+        over a crop at ``scale`` x full size, ``frame`` being
+        (level_h, level_w, y0, x0) of the crop; ``halo`` is the margin in
+        pixels that render needs around the visible area. ``on_fit()`` is
+        called when the user zooms back out to fit mode.
+        """
+        self.jobs = jobs
+        self.get_pyramid = get_pyramid
+        self.make_renderer = make_renderer
+        self.on_fit = on_fit
+        self.canvas = tk.Canvas(parent, bg=bg, highlightthickness=0, cursor="crosshair")
+        self.zoom = None          # display px per image px; None = fit to window
+        self.preview = None       # tool preview shown instead of the current image
+        self.center = (0.0, 0.0)  # image coords at the middle of the viewport
+        self._photo = None
+        self._item = None
+        self._label = None
+        self._drag = None
+        self._refresh_id = None
+
+        self.canvas.bind("<MouseWheel>", self._on_wheel)
+        self.canvas.bind("<Button-4>", lambda e: self._zoom_at(e.x, e.y, ZOOM_STEP))
+        self.canvas.bind("<Button-5>", lambda e: self._zoom_at(e.x, e.y, 1 / ZOOM_STEP))
+        self.canvas.bind("<ButtonPress-1>", self._on_press)
+        self.canvas.bind("<B1-Motion>", self._on_drag)
+        self.canvas.bind("<ButtonRelease-1>", self._on_release)
+        self.canvas.bind("<Double-Button-1>", self._on_double)
+
+    # ---------- public ----------
+    @property
+    def zoomed(self):
+        return self.zoom is not None
+
+    def show(self, img):
+        """Fit mode: show a display-sized PIL image centered."""
+        vw, vh = self._viewport()
+        self._put(img, vw / 2, vh / 2, anchor=tk.CENTER)
+        self._set_label(None)
+
+    def refresh(self):
+        """Zoom mode: render the visible region of the current image (or the preview)."""
+        self._refresh_id = None
+        pyramid = self.get_pyramid()
+        if not self.zoomed or pyramid is None:
+            return
+        vw, vh = self._viewport()
+        self._clamp_center(pyramid, vw, vh)
+        if self.preview is not None:
+            self.jobs.cancel("viewer")
+            self._show_preview(pyramid, vw, vh)
+            return
+        z = self.zoom
+        cx, cy = self.center
+        x0f, y0f = cx - vw / (2 * z), cy - vh / (2 * z)
+        x1f, y1f = cx + vw / (2 * z), cy + vh / (2 * z)
+
+        level = pyramid.level(pyramid.level_for_scale(z))
+        lh, lw = level.shape[:2]
+        ls = lw / pyramid.width
+        lx0, ly0 = max(0, int(math.floor(x0f * ls))), max(0, int(math.floor(y0f * ls)))
+        lx1, ly1 = min(lw, int(math.ceil(x1f * ls))), min(lh, int(math.ceil(y1f * ls)))
+        if lx1 <= lx0 or ly1 <= ly0:
+            return
+
+        render, halo = self.make_renderer(ls)
+        hx0, hy0 = max(0, lx0 - halo), max(0, ly0 - halo)
+        hx1, hy1 = min(lw, lx1 + halo), min(lh, ly1 + halo)
+        out_w = max(1, round((lx1 - lx0) / ls * z))
+        out_h = max(1, round((ly1 - ly0) / ls * z))
+        # where level pixel (lx0, ly0) lands on the canvas
+        px = (lx0 / ls - cx) * z + vw / 2
+        py = (ly0 / ls - cy) * z + vh / 2
+        view = (z, self.center)
+
+        def work(job):
+            roi = np.array(level[hy0:hy1, hx0:hx1])
+            roi = render(roi, (lh, lw, hy0, hx0), job.is_cancelled)
+            roi = roi[ly0 - hy0:ly1 - hy0, lx0 - hx0:lx1 - hx0]
+            step = z / ls
+            interp = cv2.INTER_NEAREST if step >= 2 else (cv2.INTER_AREA if step < 1 else cv2.INTER_LINEAR)
+            return Image.fromarray(cv2.resize(roi, (out_w, out_h), interpolation=interp))
+
+        def done(img):
+            if (self.zoom, self.center) == view and self.preview is None:
+                self._put(img, px, py, anchor=tk.NW)
+
+        self.jobs.submit(work, channel="viewer", on_done=done)
+        self._set_label(f"{z * 100:.0f}%")
+
+    def reset(self):
+        """Back to fit mode (e.g. a new image was opened)."""
+        self.zoom = None
+        self.preview = None
+        self.jobs.cancel("viewer")
+
+    # ---------- internals ----------
+    def _show_preview(self, pyramid, vw, vh):
+        img = self.preview
+        s = img.width / pyramid.width
+        if abs(img.height - pyramid.height * s) > 1:
+            # not a proxy of this image (a geometry warp changes the frame): show it whole
+            fitted = img.copy()
+            fitted.thumbnail((vw, vh))
+            self._put(fitted, vw / 2, vh / 2, anchor=tk.CENTER)
+            self._set_label("Preview")
+            return
+        # the visible region in preview pixels, scaled up to the zoom
+        z = self.zoom
+        cx, cy = self.center
+        x0 = max(0, int(math.floor((cx - vw / (2 * z)) * s)))
+        y0 = max(0, int(math.floor((cy - vh / (2 * z)) * s)))
+        x1 = min(img.width, int(math.ceil((cx + vw / (2 * z)) * s)))
+        y1 = min(img.height, int(math.ceil((cy + vh / (2 * z)) * s)))
+        if x1 <= x0 or y1 <= y0:
+            return
+        size = (max(1, round((x1 - x0) / s * z)), max(1, round((y1 - y0) / s * z)))
+        region = img.crop((x0, y0, x1, y1)).resize(size, Image.Resampling.BILINEAR)
+        self._put(region, (x0 / s - cx) * z + vw / 2, (y0 / s - cy) * z + vh / 2, anchor=tk.NW)
+        self._set_label(f"{z * 100:.0f}%")
+
+    def _to_fit(self):
+        self.reset()
+        if self.on_fit is not None:
+            self.on_fit()
+
+    def _viewport(self):
+        return max(1, self.canvas.winfo_width()), max(1, self.canvas.winfo_height())
+
+    def _fit_zoom(self, pyramid):
+        vw, vh = self._viewport()
+        return min(1.0, vw / pyramid.width, vh / pyramid.height)
+
+    def _clamp_center(self, pyramid, vw, vh):
+        cx, cy = self.center
+        half_w, half_h = vw / (2 * self.zoom), vh / (2 * self.zoom)
+        if 2 * half_w >= pyramid.width:
+            cx = pyramid.width / 2
+        else:
+            cx = min(max(cx, half_w), pyramid.width - half_w)
+        if 2 * half_h >= pyramid.height:
+            cy = pyramid.height / 2
+        else:
+            cy = min(max(cy, half_h), pyramid.height - half_h)
+        self.center = (cx, cy)
+
+    def _put(self, img, x, y, anchor):
+        with profiling.span("PhotoImage", "display", size=f"{img.width}x{img.height}"):
+            self._photo = ImageTk.PhotoImage(img)
+        if self._item is None:
+            self._item = self.canvas.create_image(x, y, image=self._photo, anchor=anchor)
+        else:
+            self.canvas.itemconfigure(self._item, image=self._photo, anchor=anchor)
+            self.canvas.coords(self._item, x, y)
+        if self._label is not None:
+            self.canvas.tag_raise(self._label)
+
+    def _set_label(self, text):
+        if text is None:
+            if self._label is not None:
+                self.canvas.delete(self._label)
+                self._label = None
+            return
+        if self._label is None:
+            self._label = self.canvas.create_text(10, 10, anchor=tk.NW, fill="white", font=("Segoe UI", 10, "bold"))
+        self.canvas.itemconfigure(self._label, text=text)
+        self.canvas.tag_raise(self._label)
+
+    def _schedule_refresh(self, delay=30):
+        if self._refresh_id is None:
+            self._refresh_id = self.canvas.after(delay, self.refresh)
+
+    def _zoom_at(self, x, y, factor):
+        pyramid = self.get_pyramid()
+        if pyramid is None:
+            return
+        fit = self._fit_zoom(pyramid)
+        vw, vh = self._viewport()
+        if not self.zoomed:
+            self.zoom = fit
+            self.center = (pyramid.width / 2, pyramid.height / 2)
+        # keep the image point under the cursor fixed
+        ix = (x - vw / 2) / self.zoom + self.center[0]
+        iy = (y - vh / 2) / self.zoom + self.center[1]
+        new_zoom = min(MAX_ZOOM, self.zoom * factor)
+        if new_zoom <= fit:
+            self._to_fit()
+            return
+        self.zoom = new_zoom
+        self.center = (ix - (x - vw / 2) / new_zoom, iy - (y - vh / 2) / new_zoom)
+        self._schedule_refresh()
+
+    def _on_wheel(self, event):
+        self._zoom_at(event.x, event.y, ZOOM_STEP if event.delta > 0 else 1 / ZOOM_STEP)
+
+    def _on_press(self, event):
+        self._drag = (event.x, event.y)
+
+    def _on_drag(self, event):
+        if not self.zoomed or self._drag is None:
+            return
+        dx, dy = event.x - self._drag[0], event.y - self._drag[1]
+        self._drag = (event.x, event.y)
+        # move the last frame right away, re-render behind it
+        if self._item is not None:
+            self.canvas.move(self._item, dx, dy)
+        self.center = (self.center[0] - dx / self.zoom, self.center[1] - dy / self.zoom)
+        self._schedule_refresh()
+
+    def _on_release(self, event):
+        self._drag = None
+
+    def _on_double(self, event):
+        pyramid = self.get_pyramid()
+        if self.zoomed or pyramid is None:
+            self._to_fit()
+        else:
+            self._zoom_at(event.x, event.y, 1.0 / self._fit_zoom(pyramid))